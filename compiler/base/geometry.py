@@ -21,8 +21,12 @@ from .vector import vector
 class geometry:
     """
     A specific path, shape, or text geometry. Base class for shared
-    items.
+    items. Rectangles and instances are created by the million on
+    large designs, so they have slots instead of a __dict__.
     """
+    __slots__ = ("name", "lpp", "layerNumber", "layerPurpose",
+                 "width", "height", "offset", "boundary")
+
     def __init__(self, lpp=None):
         """ By default, everything has no size. """
         self.width = 0
@@ -164,6 +168,9 @@ class instance(geometry):
     An instance of a module with a specified location, rotation,
     spice pins, and spice nets
     """
+    __slots__ = ("mod", "gds", "rotate", "mirror", "connected",
+                 "inst_array", "spice_pins", "spice_nets")
+
     def __init__(self, name, mod, offset=[0, 0], mirror="R0", rotate=0):
         """Initializes an instance to represent a module"""
         super().__init__()
@@ -178,6 +185,8 @@ class instance(geometry):
         self.mirror = mirror
         # track if the instance's spice pin connections have been made
         self.connected = False
+        # The instance_array that places this instance, if any
+        self.inst_array = None
 
         # deepcopy because this instance needs to
         # change attributes in these spice objects
@@ -202,46 +211,49 @@ class instance(geometry):
 
         debug.info(4, "creating instance: " + self.name)
 
-    def get_blockages(self, lpp, top=False):
-        """ Retrieve blockages of all modules in this instance.
-        Apply the transform of the instance placement to give absolute blockages."""
-        angle = math.radians(float(self.rotate))
+    def get_transform(self):
+        """
+        Return the [u[0], u[1], v[0], v[1], x, y] transform of the instance
+        placement. A point (px, py) of the module is placed at
+        (px * u[0] + py * v[0] + x, px * u[1] + py * v[1] + y).
+        """
+        angle = float(self.rotate)
         mirr = 1
         if self.mirror == "R90":
-            angle += math.radians(90.0)
+            angle += 90.0
         elif self.mirror == "R180":
-            angle += math.radians(180.0)
+            angle += 180.0
         elif self.mirror == "R270":
-            angle += math.radians(270.0)
+            angle += 270.0
         elif self.mirror == "MX":
             mirr = -1
         elif self.mirror == "MY":
             mirr = -1
-            angle += math.radians(180.0)
+            angle += 180.0
         elif self.mirror == "XY":
             mirr = 1
-            angle += math.radians(180.0)
-
-        new_blockages = []
-        if self.mod.is_library_cell:
-            # Writes library cell blockages as shapes instead of a large metal blockage
-            blockages = []
-            blockages = self.mod.gds.getBlockages(lpp)
-            for b in blockages:
-                new_blockages.append(self.transform_coords(b, self.offset, mirr, angle))
-        else:
-            blockages = self.mod.get_blockages(lpp)
-            for b in blockages:
-                new_blockages.append(self.transform_coords(b, self.offset, mirr, angle))
-        return new_blockages
+            angle += 180.0
+
+        angle = math.radians(angle)
+        (cos, sin) = (math.cos(angle), math.sin(angle))
+        # Keep the right angles exact
+        if abs(cos) < 1e-9 or abs(sin) < 1e-9:
+            (cos, sin) = (round(cos), round(sin))
+        return (cos, sin, -mirr * sin, mirr * cos, self.offset.x, self.offset.y)
+
+    def get_blockages(self, lpp, top=False):
+        """ Retrieve blockages of all modules in this instance.
+        Apply the transform of the instance placement to give absolute blockages."""
+        blockages = self.mod.get_inst_blockage_arrays(lpp)
+        transforms = np.array([self.get_transform()], dtype=np.float64)
+        return self.mod.get_blockage_list(self.mod.transform_blockages(blockages, transforms))
 
     def gds_write_file(self, new_layout):
-        """Recursively writes all the sub-modules in this instance"""
+        """
+        Writes a reference to the module of this instance. The module
+        itself is written by hierarchy_layout.gds_write_structures.
+        """
         debug.info(4, "writing instance: " + self.name)
-        # make sure to write out my module/structure
-        # (it will only be written the first time though)
-        self.mod.gds_write_file(self.gds)
-        # now write an instance of my module/structure
         new_layout.addInstance(self.gds,
                                self.mod.cell_name,
                                offsetInMicrons=self.offset,
@@ -449,6 +461,167 @@ class instance(geometry):
         return "( inst: " + self.name + " @" + str(self.offset) + " mod=" + self.mod.cell_name + " " + self.mirror + " R=" + str(self.rotate) + ")"
 
 
+class instance_array(geometry):
+    """
+    The GDS output of a rows x cols array of instances of a module placed
+    with a regular pitch. Every other row can be mirrored on the x axis and
+    every other column on the y axis like the cells of a bitcell array.
+    The instances are still added to the module and keep the spice
+    connections and the placement of each element, so this only writes
+    them as one GDS AREF for each combination of row and column mirroring
+    instead of one SREF per element. An element that is placed again
+    through its instance breaks the array, which is then written as one
+    SREF per element.
+    """
+    # (u[0], u[1], v[0], v[1]) of each mirror of the elements
+    mirror_vectors = {"": (1, 0, 0, 1),
+                      "MX": (1, 0, 0, -1),
+                      "MY": (-1, 0, 0, 1),
+                      "XY": (-1, 0, 0, -1)}
+
+    def __init__(self, name, insts, offset=[0, 0], pitch=None, mirror_rows=None, mirror_cols=None):
+        """
+        Place the instances indexed by (row, col). The rows with a parity of
+        mirror_rows are mirrored on the x axis and the columns with a
+        parity of mirror_cols on the y axis. None doesn't mirror any.
+        """
+        super().__init__()
+        self.name = name
+        self.insts = insts
+        self.rows = 1 + max(row for (row, col) in insts)
+        self.cols = 1 + max(col for (row, col) in insts)
+        debug.check(len(insts) == self.rows * self.cols,
+                    "Instance array {} is not full.".format(name))
+        self.mod = insts[0, 0].mod
+        debug.check(all(inst.mod is self.mod for inst in insts.values()),
+                    "Instance array {} has more than one module.".format(name))
+        self.gds = self.mod.gds
+        if pitch is None:
+            pitch = [self.mod.width, self.mod.height]
+        self.pitch = vector(pitch)
+        self.mirror_rows = mirror_rows
+        self.mirror_cols = mirror_cols
+        self.offset = vector(offset).snap_to_grid()
+        self.width = round_to_grid(self.cols * self.pitch.x)
+        self.height = round_to_grid(self.rows * self.pitch.y)
+        self.compute_boundary(self.offset, "", 0)
+
+        self.place_elements()
+
+        debug.info(4, "creating instance array: " + self.name)
+
+    def get_element_placement(self, row, col):
+        """ Return the offset and mirror of an element. """
+        (x, y) = (self.offset.x + col * self.pitch.x, self.offset.y + row * self.pitch.y)
+        dir_x = self.mirror_rows is not None and row % 2 == self.mirror_rows
+        dir_y = self.mirror_cols is not None and col % 2 == self.mirror_cols
+        # A mirrored element is moved by a pitch to stay in its place
+        if dir_x:
+            y += self.pitch.y
+        if dir_y:
+            x += self.pitch.x
+        if dir_x and dir_y:
+            mirror = "XY"
+        elif dir_x:
+            mirror = "MX"
+        elif dir_y:
+            mirror = "MY"
+        else:
+            mirror = ""
+        return (vector(x, y), mirror)
+
+    def place_elements(self):
+        """ Place every element at its position in the array. """
+        for row in range(self.rows):
+            for col in range(self.cols):
+                inst = self.insts[row, col]
+                (offset, mirror) = self.get_element_placement(row, col)
+                inst.place(offset=offset, mirror=mirror)
+                inst.inst_array = self
+
+    def translate(self, offset):
+        """
+        Translate the array like translate_all translates its instances.
+        The elements are instances of the module, so they are translated
+        with the other instances.
+        """
+        self.offset = vector(self.offset - offset)
+        self.compute_boundary(self.offset, "", 0)
+
+    def get_transforms(self):
+        """
+        Return the [u[0], u[1], v[0], v[1], x, y] transform of every element
+        by row and then column. The transforms are taken from the instances,
+        so an element that was placed again is where its instance is.
+        """
+        transforms = [self.insts[row, col].get_transform() for row in range(self.rows) for col in range(self.cols)]
+        return np.array(transforms, dtype=np.float64).reshape(-1, 6)
+
+    def get_array_transforms(self):
+        """ Return the transform of every element at its position in the array. """
+        transforms = np.zeros((self.rows * self.cols, 6), dtype=np.float64)
+        for row in range(self.rows):
+            for col in range(self.cols):
+                (offset, mirror) = self.get_element_placement(row, col)
+                offset.snap_to_grid()
+                transforms[row * self.cols + col] = self.mirror_vectors[mirror] + (offset.x, offset.y)
+        return transforms
+
+    def is_regular(self):
+        """ Return whether every element is still at its position in the array. """
+        return np.allclose(self.get_transforms(), self.get_array_transforms())
+
+    def get_aref_groups(self):
+        """
+        Return the first row, first column, number of rows, number of
+        columns and pitch multipliers of the elements with the same mirror.
+        Alternating mirrors need one group for the even and one for the
+        odd rows (or columns) with twice the pitch.
+        """
+        if self.mirror_rows is None:
+            row_groups = [(0, self.rows, 1)]
+        else:
+            row_groups = [(start, len(range(start, self.rows, 2)), 2) for start in range(min(2, self.rows))]
+        if self.mirror_cols is None:
+            col_groups = [(0, self.cols, 1)]
+        else:
+            col_groups = [(start, len(range(start, self.cols, 2)), 2) for start in range(min(2, self.cols))]
+        return [(row, col, rows, cols, row_step, col_step)
+                for (row, rows, row_step) in row_groups
+                for (col, cols, col_step) in col_groups]
+
+    def gds_write_file(self, new_layout):
+        """
+        Writes an AREF of the module for each mirror of the elements or an
+        SREF for each element if one was placed outside of the array.
+        """
+        debug.info(4, "writing instance array: " + self.name)
+        if not self.is_regular():
+            debug.info(3, "instance array {} has moved elements".format(self.name))
+            for inst in self.insts.values():
+                inst.gds_write_file(new_layout)
+            return
+        for (row, col, rows, cols, row_step, col_step) in self.get_aref_groups():
+            inst = self.insts[row, col]
+            new_layout.addArray(self.gds,
+                                self.mod.cell_name,
+                                offsetInMicrons=inst.offset,
+                                columns=cols,
+                                rows=rows,
+                                columnPitch=col_step * self.pitch.x,
+                                rowPitch=row_step * self.pitch.y,
+                                mirror=inst.mirror,
+                                rotate=inst.rotate)
+
+    def __str__(self):
+        """ override print function output """
+        return "( inst array: " + self.name + " @" + str(self.offset) + " mod=" + self.mod.cell_name + " " + str(self.rows) + "x" + str(self.cols) + ")"
+
+    def __repr__(self):
+        """ override print function output """
+        return "( inst array: " + self.name + " @" + str(self.offset) + " mod=" + self.mod.cell_name + " " + str(self.rows) + "x" + str(self.cols) + ")"
+
+
 class path(geometry):
     """Represents a Path"""
 
@@ -532,6 +705,7 @@ class label(geometry):
 
 class rectangle(geometry):
     """Represents a rectangular shape"""
+    __slots__ = ("size",)
 
     def __init__(self, lpp, offset, width, height):
         """Initializes a rectangular shape for specified layer"""
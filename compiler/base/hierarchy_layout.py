@@ -9,6 +9,7 @@ import sys
 import os
 import re
 from math import sqrt
+import numpy as np
 from openram import debug
 from openram.gdsMill import gdsMill
 from openram import tech
@@ -59,6 +60,8 @@ class layout():
         self.inst_names = set()
         # Holds all other objects (labels, geometries, etc)
         self.objs = []
+        # Holds the arrays that place some of the instances
+        self.inst_arrays = []
         # This is a mapping of internal pin names to cell pin names
         # If the key is not found, the internal pin names is assumed
         self.pin_names = {}
@@ -66,6 +69,8 @@ class layout():
         self.pin_map = {}
         # List of modules we have already visited
         self.visited = []
+        # Blockage arrays of each layer and the state they were computed from
+        self.blockage_cache = {}
 
         self.gds_read()
 
@@ -454,6 +459,8 @@ class layout():
             # The instances have a precomputed boundary that we need to update.
             if inst.__class__.__name__ == "instance":
                 inst.compute_boundary(inst.offset, inst.mirror, inst.rotate)
+        for inst_array in self.inst_arrays:
+            inst_array.translate(offset)
         for pin_name in self.pin_map.keys():
             # All the pins are absolute coordinates that need to be updated.
             pin_list = self.pin_map[pin_name]
@@ -475,6 +482,16 @@ class layout():
         # debug.info(4, "instance list: " + ",".join(x.name for x in self.insts))
         return self.insts[-1]
 
+    def add_inst_array(self, name, insts, offset=[0, 0], pitch=None, mirror_rows=None, mirror_cols=None):
+        """
+        Places a (row, col) dict of instances of the same mod as an array
+        that is written to GDS as AREFs. The instances must have been added
+        with add_inst and are still used for everything else.
+        """
+        self.inst_arrays.append(geometry.instance_array(name, insts, offset, pitch, mirror_rows, mirror_cols))
+        debug.info(3, "adding instance array {}".format(self.inst_arrays[-1]))
+        return self.inst_arrays[-1]
+
     def get_inst(self, name):
         """ Retrieve an instance by name """
         for inst in self.insts:
@@ -1409,7 +1426,7 @@ class layout():
         if os.path.isfile(self.gds_file):
             debug.info(3, "opening {}".format(self.gds_file))
             self.gds = gdsMill.VlsiLayout(units=GDS["unit"])
-            reader = gdsMill.Gds2reader(self.gds)
+            reader = gdsMill.Gds2mmapReader(self.gds)
             reader.loadFromFile(self.gds_file, special_purposes)
         else:
             debug.info(3, "Creating layout structure {}".format(self.name))
@@ -1429,11 +1446,15 @@ class layout():
         self.visited = []
 
     def gds_write_file(self, gds_layout):
-        """Recursive GDS write function"""
-        # Visited means that we already prepared self.gds for this subtree
-        if self.name in self.visited:
-            return
+        """
+        Write the shapes of this module and the references to its
+        instances to the root structure of a layout.
+        """
         for i in self.insts:
+            # Instances of an array are written with the array
+            if i.inst_array is None:
+                i.gds_write_file(gds_layout)
+        for i in self.inst_arrays:
             i.gds_write_file(gds_layout)
         for i in self.objs:
             i.gds_write_file(gds_layout)
@@ -1468,31 +1489,49 @@ class layout():
                                   center=False)
                 debug.info(4, "Adding {0} boundary {1}".format(self.name, boundary))
 
-        self.visited.append(self.name)
+    def gds_write_structures(self, writer):
+        """
+        Recursively write the structures of this module and its children
+        that aren't in the file yet. Each structure is written as soon as
+        its subtree is written, so only the layout of one module is kept
+        in memory.
+        """
+        if writer.hasStructure(self.name):
+            return
+
+        children = {}
+        for i in self.insts:
+            if i.inst_array is None:
+                children.setdefault(id(i.mod), i.mod)
+        for i in self.inst_arrays:
+            children.setdefault(id(i.mod), i.mod)
+        for mod in children.values():
+            mod.gds_write_structures(writer)
+
+        if self.is_library_cell:
+            # The pins are only added to the library layout once
+            if self.name not in self.visited:
+                self.gds_write_file(self.gds)
+                self.visited.append(self.name)
+            writer.writeLayout(self.gds)
+        else:
+            debug.info(4, "Creating layout structure {}".format(self.name))
+            gds_layout = gdsMill.VlsiLayout(name=self.name, units=GDS["unit"])
+            self.gds_write_file(gds_layout)
+            writer.writeStructure(gds_layout.rootStructureName,
+                                  gds_layout.structures[gds_layout.rootStructureName])
 
     def gds_write(self, gds_name):
-        """Write the entire gds of the object to the file."""
+        """
+        Write the entire gds of the object to the file. The file is gzip
+        compressed if its name ends with .gz.
+        """
         debug.info(3, "Writing to {}".format(gds_name))
 
-        # If we already wrote a GDS, we need to reset and traverse it again in
-        # case we made changes.
-        if not self.is_library_cell and self.visited:
-            debug.info(3, "Creating layout structure {}".format(self.name))
-            self.gds = gdsMill.VlsiLayout(name=self.name, units=GDS["unit"])
-
         writer = gdsMill.Gds2writer(self.gds)
-        # MRG: 3/2/18 We don't want to clear the visited flag since
-        # this would result in duplicates of all instances being placed in self.gds
-        # which may have been previously processed!
-        # MRG: 10/4/18 We need to clear if we make changes and write a second GDS!
-        self.clear_visited()
-
-        # recursively create all the remaining objects
-        self.gds_write_file(self.gds)
-
-        # populates the xyTree data structure for gds
-        # self.gds.prepareForWrite()
-        writer.writeToFile(gds_name)
+        writer.openFile(gds_name)
+        self.gds_write_structures(writer)
+        writer.closeFile()
         debug.info(3, "Done writing to {}".format(gds_name))
 
     def get_boundary(self):
@@ -1512,16 +1551,116 @@ class layout():
         else:
             lpp = layer
 
-        blockages = []
-        for i in self.objs:
-            blockages += i.get_blockages(lpp)
-        for i in self.insts:
-            blockages += i.get_blockages(lpp)
-        # Must add pin blockages to non-top cells
+        return self.get_blockage_list(self.get_blockage_arrays(lpp, top_level))
+
+    def get_blockage_key(self, lpp, top_level=False):
+        """ Return a hashable key of the blockage cache. """
+        if isinstance(lpp[1], list):
+            return (lpp[0], tuple(lpp[1]), top_level)
+        return (lpp[0], lpp[1], top_level)
+
+    def get_blockage_arrays(self, lpp, top_level=False):
+        """
+        Return the blockages of this module and its instances as an array
+        of [llx, lly, urx, ury] rectangles and a list of arrays of polygons
+        with the same number of points. The arrays are cached until the
+        objects, instances or pins of the module or its children change.
+        """
+        pin_rects = []
         if not top_level:
-            blockages += self.get_pin_blockages(lpp)
+            pin_rects = [(ll[0], ll[1], ur[0], ur[1]) for (ll, ur) in self.get_pin_blockages(lpp)]
+
+        # Transform all the placements of the same module at once
+        placements = {}
+        for inst in self.insts:
+            placements.setdefault(id(inst.mod), (inst.mod, []))[1].append(inst.get_transform())
+        children = [mod.get_inst_blockage_arrays(lpp) for (mod, transforms) in placements.values()]
+        # The objects are compared by their geometry since they can be moved
+        # or replaced in place
+        signature = ([(obj.lpp, obj.offset[0], obj.offset[1], obj.width, obj.height) for obj in self.objs],
+                     list(placements.keys()),
+                     [transforms for (mod, transforms) in placements.values()],
+                     pin_rects)
+
+        key = self.get_blockage_key(lpp, top_level)
+        try:
+            (cached_signature, cached_children, blockages) = self.blockage_cache[key]
+            if cached_signature == signature and all(a is b for (a, b) in zip(cached_children, children)):
+                return blockages
+        except KeyError:
+            pass
+
+        rects = list(pin_rects)
+        polygons = []
+        for obj in self.objs:
+            for shape in obj.get_blockages(lpp):
+                if len(shape) == 2:
+                    ((x1, y1), (x2, y2)) = shape
+                    rects.append((min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+                else:
+                    polygons.append(np.array([shape], dtype=np.float64))
+        rects = [np.array(rects, dtype=np.float64).reshape(-1, 4)]
+
+        for ((mod, transforms), child) in zip(placements.values(), children):
+            (child_rects, child_polygons) = self.transform_blockages(child, np.array(transforms, dtype=np.float64))
+            rects.append(child_rects)
+            polygons.extend(child_polygons)
+
+        blockages = (np.concatenate(rects), self.merge_polygons(polygons))
+        self.blockage_cache[key] = (signature, children, blockages)
         return blockages
 
+    def get_inst_blockage_arrays(self, lpp):
+        """
+        Return the blockage arrays of an instance of this module in the
+        coordinates of the module.
+        """
+        if not self.is_library_cell:
+            return self.get_blockage_arrays(lpp)
+
+        # Library cells have their blockages as shapes in their own GDS
+        key = self.get_blockage_key(lpp)
+        try:
+            return self.blockage_cache[key][2]
+        except KeyError:
+            pass
+        shapes = self.gds.getLayerShapes(lpp)
+        polygons = [np.array(polygon, dtype=np.float64).reshape(1, -1, 2) for polygon in shapes.polygons]
+        blockages = (shapes.rects, self.merge_polygons(polygons))
+        self.blockage_cache[key] = (None, [], blockages)
+        return blockages
+
+    @staticmethod
+    def merge_polygons(polygons):
+        """ Merge arrays of polygons that have the same number of points. """
+        sizes = {}
+        for points in polygons:
+            sizes.setdefault(points.shape[1], []).append(points)
+        return [np.concatenate(batch) for batch in sizes.values()]
+
+    @staticmethod
+    def transform_blockages(blockages, transforms):
+        """
+        Transform blockage arrays by an array of [u[0], u[1], v[0], v[1], x, y]
+        transforms. The blockages of each transform follow each other.
+        """
+        (rects, polygons) = blockages
+        new_rects = gdsMill.transformRectangles(rects, transforms)
+        new_polygons = [gdsMill.transformPolygons(points, transforms) for points in polygons]
+        return (new_rects, new_polygons)
+
+    @staticmethod
+    def get_blockage_list(blockages):
+        """
+        Return blockage arrays as a list of [ll, ur] rectangles and
+        [coordinate 1, coordinate 2,...] polygons.
+        """
+        (rects, polygons) = blockages
+        blockage_list = rects.reshape(-1, 2, 2).tolist()
+        for points in polygons:
+            blockage_list.extend(points.tolist())
+        return blockage_list
+
     def get_pin_blockages(self, lpp):
         """ Return the pin shapes as blockages for non-top-level blocks. """
         # FIXME: We don't have a body contact in ptx, so just ignore it for now
@@ -1808,7 +1947,7 @@ class layout():
         # Load the gds file and read in all the shapes
         self.gds_write(gds_filename)
         layout = gdsMill.VlsiLayout(units=GDS["unit"])
-        reader = gdsMill.Gds2reader(layout)
+        reader = gdsMill.Gds2mmapReader(layout)
         reader.loadFromFile(gds_filename)
         top_name = layout.rootStructureName
 
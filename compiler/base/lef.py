@@ -7,7 +7,10 @@
 #
 import os
 import shutil
+import bisect
+import heapq
 from openram import debug
+from openram import tech
 from openram.base import vector
 from openram.base import pin_layout
 from openram.tech import layer_names
@@ -98,38 +101,104 @@ class lef:
         # minus the pin escape margin (hard coded to 4 x m3 pitch)
         # These are a pin_layout to use their geometric functions
         perimeter_margin = self.m3_pitch
-        self.blockages = {}
+        block = [self.to_grid(perimeter_margin),
+                 self.to_grid(perimeter_margin),
+                 self.to_grid(self.width - perimeter_margin),
+                 self.to_grid(self.height - perimeter_margin)]
+
+        # Remove the inflated pins from the blockage of their layer
+        cuts = {}
         for layer_name in self.lef_layers:
-            self.blockages[layer_name]=[]
+            cuts[layer_name] = []
+        for pin_name in self.pins:
+            for pin in self.get_pins(pin_name):
+                if pin.layer not in cuts:
+                    continue
+                (ll, ur) = pin.inflated_pin(multiple=2).rect
+                cuts[pin.layer].append([self.to_grid(ll.x),
+                                        self.to_grid(ll.y),
+                                        self.to_grid(ur.x),
+                                        self.to_grid(ur.y)])
+
+        grid = tech.drc["grid"]
+        self.blockages = {}
         for layer_name in self.lef_layers:
-            ll = vector(perimeter_margin, perimeter_margin)
-            ur = vector(self.width - perimeter_margin, self.height - perimeter_margin)
-            self.blockages[layer_name].append(pin_layout("",
-                                                         [ll, ur],
-                                                         layer_name))
+            self.blockages[layer_name] = []
+            for (x1, y1, x2, y2) in self.subtract_rects(block, cuts[layer_name]):
+                self.blockages[layer_name].append(pin_layout("",
+                                                             [vector(x1 * grid, y1 * grid),
+                                                              vector(x2 * grid, y2 * grid)],
+                                                             layer_name))
 
-        # For each pin, remove the blockage and add the pin
-        for pin_name in self.pins:
-            pins = self.get_pins(pin_name)
-            for pin in pins:
-                inflated_pin = pin.inflated_pin(multiple=2)
-                continue_fragmenting = True
-                while continue_fragmenting:
-                    continue_fragmenting = False
-                    old_blockages = list(self.blockages[pin.layer])
-                    for blockage in old_blockages:
-                        if blockage.overlaps(inflated_pin):
-                            intersection_pin = blockage.intersection(inflated_pin)
-                            # If it is zero area, don't split the blockage
-                            if not intersection_pin or intersection_pin.area() == 0:
-                                continue
-
-                            # Remove the old blockage and add the new ones
-                            self.blockages[pin.layer].remove(blockage)
-                            new_blockages = blockage.cut(intersection_pin)
-                            self.blockages[pin.layer].extend(new_blockages)
-                            # We split something so make another pass
-                            continue_fragmenting = True
+    def to_grid(self, value):
+        """ Convert a coordinate to integer grid units. """
+        return int(round(value / tech.drc["grid"]))
+
+    def subtract_rects(self, block, cuts):
+        """
+        Return the [x1, y1, x2, y2] rectangles that cover a block minus the
+        union of the cut rectangles. All coordinates are in integer grid
+        units so that the edges compare exactly.
+
+        A scanline sweeps the y coordinates of all the edges. Between two
+        consecutive y coordinates the free x intervals are the block minus
+        the cuts that span the slab. A free interval that is the same in
+        consecutive slabs grows into a single taller rectangle. Cuts leave
+        the scanline through a heap of their top edges, but the free
+        intervals of each slab are found again from all the active cuts,
+        so the sweep is O(N*K) for N cuts with at most K of them active.
+        """
+        (block_x1, block_y1, block_x2, block_y2) = block
+        if block_x1 >= block_x2 or block_y1 >= block_y2:
+            return []
+
+        # Only the parts of the cuts inside the block matter
+        clipped = []
+        for (x1, y1, x2, y2) in cuts:
+            (x1, y1) = (max(x1, block_x1), max(y1, block_y1))
+            (x2, y2) = (min(x2, block_x2), min(y2, block_y2))
+            if x1 < x2 and y1 < y2:
+                clipped.append((x1, y1, x2, y2))
+
+        # Cuts enter the scanline at their bottom and leave at their top
+        starts = sorted(clipped, key=lambda cut: cut[1])
+        ys = sorted(set([block_y1, block_y2] + [cut[1] for cut in clipped] + [cut[3] for cut in clipped]))
+        # Active cuts sorted by left edge and a heap of their top edges
+        active = []
+        tops = []
+        next_start = 0
+        # Bottom y of the rectangle of each free interval that is still growing
+        open_rects = {}
+        rects = []
+        for (y1, y2) in zip(ys[:-1], ys[1:]):
+            while next_start < len(starts) and starts[next_start][1] <= y1:
+                (cut_x1, cut_y1, cut_x2, cut_y2) = starts[next_start]
+                bisect.insort(active, (cut_x1, cut_x2, cut_y2))
+                heapq.heappush(tops, (cut_y2, cut_x1, cut_x2))
+                next_start += 1
+            while tops and tops[0][0] <= y1:
+                (cut_y2, cut_x1, cut_x2) = heapq.heappop(tops)
+                del active[bisect.bisect_left(active, (cut_x1, cut_x2, cut_y2))]
+
+            # The block minus the union of the active cuts (sorted by left edge)
+            free = []
+            x = block_x1
+            for (cut_x1, cut_x2, cut_y2) in active:
+                if cut_x1 > x:
+                    free.append((x, cut_x1))
+                x = max(x, cut_x2)
+            if x < block_x2:
+                free.append((x, block_x2))
+
+            free_set = set(free)
+            for interval in [interval for interval in open_rects if interval not in free_set]:
+                rects.append([interval[0], open_rects.pop(interval), interval[1], y1])
+            for interval in free:
+                open_rects.setdefault(interval, y1)
+
+        for (interval, y1) in open_rects.items():
+            rects.append([interval[0], y1, interval[1], block_y2])
+        return rects
 
     def lef_write_header(self):
         """ Header of LEF file """
@@ -7,16 +7,45 @@
 #
 import math
 from openram import debug
+from openram import tech
 from openram.tech import GDS, drc
 from openram.tech import layer, layer_indices
 from .vector import vector
 
 
+# The layer name of each lpp that has been looked up
+lpp_layer_names = {}
+
+
+def get_lpp_layer_name(lpp):
+    """
+    Return the name of the first valid pin layer that matches an lpp or
+    None if there is none. The names are cached since every pin created
+    from an lpp needs one.
+    """
+    key = tuple(lpp)
+    try:
+        return lpp_layer_names[key]
+    except KeyError:
+        pass
+
+    lpp_layer_names[key] = None
+    for layer_name in layer_indices.keys():
+        valid_lpp = layer[layer_name]
+        if not valid_lpp:
+            continue
+        if pin_layout.same_lpp(key, valid_lpp):
+            lpp_layer_names[key] = layer_name
+            break
+    return lpp_layer_names[key]
+
+
 class pin_layout:
     """
     A class to represent a rectangular design pin. It is limited to a
     single shape.
     """
+    __slots__ = ("name", "_rect", "_layer", "lpp", "_hash")
 
     def __init__(self, name, rect, layer_name_pp):
         self.name = name
@@ -31,22 +60,13 @@ class pin_layout:
         debug.check(self.width() > 0, "Zero width pin.")
         debug.check(self.height() > 0, "Zero height pin.")
 
-        # These are the valid pin layers
-        valid_layers = {x: layer[x] for x in layer_indices.keys()}
-
         # if it's a string, use the name
         if type(layer_name_pp) == str:
             self._layer = layer_name_pp
-        # else it is required to be a lpp
+        # else it is required to be a lpp of a valid pin layer
         else:
-            for (layer_name, lpp) in valid_layers.items():
-                if not lpp:
-                    continue
-                if self.same_lpp(layer_name_pp, lpp):
-                    self._layer = layer_name
-                    break
-
-            else:
+            self._layer = get_lpp_layer_name(layer_name_pp)
+            if self._layer is None:
                 try:
                     from openram.tech import layer_override
                     from openram.tech import layer_override_name
@@ -81,7 +101,8 @@ class pin_layout:
 
     def _recompute_hash(self):
         """ Recompute the hash for our hash cache """
-        self._hash = hash(repr(self))
+        (ll, ur) = self.rect
+        self._hash = hash((self.layer, ll.x, ll.y, ur.x, ur.y))
 
     def __str__(self):
         """ override print function output """
@@ -389,12 +410,11 @@ class pin_layout:
         return vector(0.5*(self.rect[0].x+self.rect[1].x),
                       self.rect[0].y)
 
-    def gds_write_file(self, newLayout):
-        """Writes the pin shape and label to GDS"""
-        debug.info(4, "writing pin (" + str(self.layer) + "):"
-                   + str(self.width()) + "x"
-                   + str(self.height()) + " @ " + str(self.ll()))
-
+    def get_gds_lpps(self):
+        """
+        Return the (layer, purpose) pairs of the pin shape, the
+        pin layer shape and the label as they are written to GDS.
+        """
         # Try to use the pin layer if it exists, otherwise
         # use the regular layer
         try:
@@ -405,24 +425,32 @@ class pin_layout:
 
         # Try to use a global pin purpose if it exists,
         # otherwise, use the regular purpose
-        try:
-            from openram.tech import pin_purpose as global_pin_purpose
-            pin_purpose = global_pin_purpose
-        except ImportError:
-            pass
-
-        try:
-            from openram.tech import label_purpose
-            try:
-                from openram.tech import layer_override_purpose
-                if pin_layer_num in layer_override_purpose:
-                    layer_num = layer_override_purpose[pin_layer_num][0]
-                    label_purpose = layer_override_purpose[pin_layer_num][1]
-            except:
-                pass
-        except ImportError:
+        if hasattr(tech, "pin_purpose"):
+            pin_purpose = tech.pin_purpose
+
+        if hasattr(tech, "label_purpose"):
+            label_purpose = tech.label_purpose
+            layer_override_purpose = getattr(tech, "layer_override_purpose", {})
+            if pin_layer_num in layer_override_purpose:
+                layer_num = layer_override_purpose[pin_layer_num][0]
+                label_purpose = layer_override_purpose[pin_layer_num][1]
+        else:
             label_purpose = purpose
 
+        return ((layer_num, purpose),
+                (pin_layer_num, pin_purpose),
+                (layer_num, label_purpose))
+
+    def gds_write_file(self, newLayout):
+        """Writes the pin shape and label to GDS"""
+        debug.info(4, "writing pin (" + str(self.layer) + "):"
+                   + str(self.width()) + "x"
+                   + str(self.height()) + " @ " + str(self.ll()))
+
+        ((layer_num, purpose),
+         (pin_layer_num, pin_purpose),
+         (layer_num, label_purpose)) = self.get_gds_lpps()
+
         newLayout.addBox(layerNumber=layer_num,
                          purposeNumber=purpose,
                          offsetInMicrons=self.ll(),
@@ -643,7 +671,8 @@ class pin_layout:
 
         return new_shapes
 
-    def same_lpp(self, lpp1, lpp2):
+    @staticmethod
+    def same_lpp(lpp1, lpp2):
         """
         Check if the layers and purposes are the same.
         Ignore if purpose is a None.
@@ -88,7 +88,7 @@ def _get_gds_reader(units, gds_filename):
     except KeyError:
         debug.info(4, "Creating VLSI layout from {}".format(gds_absname))
         cell_vlsi = gdsMill.VlsiLayout(units=units)
-        reader = gdsMill.Gds2reader(cell_vlsi)
+        reader = gdsMill.Gds2mmapReader(cell_vlsi)
         reader.loadFromFile(gds_absname, special_purposes)
 
         _GDS_READER_CACHE[k] = cell_vlsi
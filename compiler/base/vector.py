@@ -17,7 +17,12 @@ class vector():
     It needs to override several operators to support
     concise vector operations, output, and other more complex
     data structures like lists.
+    Vectors are created by the million on large designs, so they
+    have slots instead of a __dict__ and hash their coordinates on
+    demand.
     """
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y=0):
         """ init function support two init method"""
         # will take single input as a coordinate
@@ -28,7 +33,6 @@ class vector():
         else:
             self.x = float(x)
             self.y = float(y)
-        self._hash = hash((self.x,self.y))
 
     def __str__(self):
         """ override print function output """
@@ -50,7 +54,6 @@ class vector():
         else:
             self.x=float(value[0])
             self.y=float(value[1])
-        self._hash = hash((self.x,self.y))
 
     def __getitem__(self, index):
         """
@@ -99,12 +102,11 @@ class vector():
         Note: This assumes that you DON'T CHANGE THE VECTOR or it will
         break things.
         """
-        return self._hash
+        return hash((self.x,self.y))
 
     def snap_to_grid(self):
         self.x = self.snap_offset_to_grid(self.x)
         self.y = self.snap_offset_to_grid(self.y)
-        self._hash = hash((self.x,self.y))
         return self
 
     def snap_offset_to_grid(self, offset):
@@ -157,7 +159,7 @@ class vector():
     def __eq__(self, other):
         """Override the default Equals behavior"""
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self.x == other.x and self.y == other.y
         return False
 
     def __ne__(self, other):
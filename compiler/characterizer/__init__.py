@@ -15,11 +15,14 @@ from .linear_regression import *
 from .neural_network import *
 from .setup_hold import *
 from .functional import *
+from .functional_model import *
+from .sim_job import *
 from .simulation import *
 from .measurements import *
 from .model_check import *
 from .analytical_util import *
 from .fake_sram import *
+from .raw_waveforms import *
 
 debug.info(1, "Initializing characterizer...")
 OPTS.spice_exe = ""
@@ -276,6 +276,12 @@ def scale_input_datapoint(point, file_path):
     debug.info(3, "mins={}".format(mins))
     debug.info(3, "point={}".format(point))
 
+    return scale_point(point, maxs, mins)
+
+def scale_point(point, maxs, mins):
+    """
+    Scale a point with the given max/min values of each feature.
+    """
     scaled_point = []
     for feature, mx, mn in zip(point, maxs, mins):
         if mx == mn:
@@ -284,6 +290,20 @@ def scale_input_datapoint(point, file_path):
             scaled_point.append((feature-mn)/(mx-mn))
     return scaled_point
 
+def scale_points(points, maxs, mins):
+    """
+    Scale the rows of a matrix with the given max/min values of each feature.
+    """
+    points = np.asarray(points, dtype=float)
+    maxs = np.asarray(maxs[:points.shape[1]], dtype=float)
+    mins = np.asarray(mins[:points.shape[1]], dtype=float)
+    ranges = maxs - mins
+    # Features with a single value are scaled to 0
+    flat = ranges == 0
+    scaled_points = (points - mins) / np.where(flat, 1.0, ranges)
+    scaled_points[:, flat] = 0.0
+    return scaled_points
+
 def unscale_data(data, file_path, pos=None):
     if file_path:
         maxs,mins,avgs = get_max_min_from_file(file_path)
@@ -296,9 +316,15 @@ def unscale_data(data, file_path, pos=None):
         maxs,mins,avgs = maxs[-1],mins[-1],avgs[-1]
     else:
         maxs,mins,avgs = maxs[pos],mins[pos],avgs[pos]
+    return unscale_values(data, maxs, mins)
+
+def unscale_values(data, mx, mn):
+    """
+    Unscale values with the max/min values of their feature.
+    """
     unscaled_data = []
     for data_row in data:
-        unscaled_val = data_row*(maxs-mins) + mins
+        unscaled_val = data_row*(mx-mn) + mn
         unscaled_data.append(unscaled_val)
 
     return unscaled_data
@@ -0,0 +1,154 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+This file keeps characterization results in a persistent cache so that
+later runs can reuse them. Results are stored as JSON files (or pickle files
+for objects like trained models) named by a hash of everything that the
+result depends on.
+"""
+
+import os
+import time
+import json
+import pickle
+import hashlib
+import tempfile
+import threading
+from openram import debug
+from openram import OPTS
+
+# Hashes of unchanged files indexed by path
+file_hashes = {}
+# Number of hits and misses of each kind of result since they were logged
+stats = {}
+stats_lock = threading.Lock()
+
+
+def get_key(*parts):
+    """ Return the hash of the JSON encoding of the given parts. """
+
+    contents = json.dumps(parts, sort_keys=True)
+    return hashlib.sha256(contents.encode()).hexdigest()
+
+
+def get_file_hash(filename):
+    """
+    Return the hash of the contents of a file. Hashes are reused while the
+    size and modification time of the file don't change. Files modified in
+    the last second are always hashed since another write in the same clock
+    tick wouldn't change the modification time.
+    """
+
+    st = os.stat(filename)
+    stamp = (st.st_size, st.st_mtime_ns)
+    if filename in file_hashes and file_hashes[filename][0] == stamp:
+        return file_hashes[filename][1]
+    with open(filename, "rb") as f:
+        file_hash = hashlib.sha256(f.read()).hexdigest()
+    if time.time() - st.st_mtime > 1:
+        file_hashes[filename] = (stamp, file_hash)
+    return file_hash
+
+
+def get_path(kind, key, use_pickle=False):
+    """ Return the path of a cached result. """
+
+    if use_pickle:
+        extension = ".pickle"
+    else:
+        extension = ".json"
+    return os.path.join(OPTS.char_cache_path, kind, key + extension)
+
+
+def load(kind, key, use_pickle=False):
+    """ Return a cached result or None if it isn't in the cache. """
+
+    if not OPTS.char_cache_path:
+        return None
+    path = get_path(kind, key, use_pickle)
+    try:
+        if use_pickle:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        else:
+            with open(path, "r") as f:
+                result = json.load(f)
+        # Mark the result as recently used for eviction
+        os.utime(path)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        count(kind, 1)
+        return None
+    count(kind, 0)
+    debug.info(2, "Loaded cached {0} result from {1}".format(kind, path))
+    return result
+
+
+def store(kind, key, result, use_pickle=False):
+    """ Save a result in the cache. """
+
+    if not OPTS.char_cache_path:
+        return
+    path = get_path(kind, key, use_pickle)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so that other processes never read
+        # a partial result
+        (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(path))
+        if use_pickle:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f)
+        else:
+            with os.fdopen(fd, "w") as f:
+                json.dump(result, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        debug.warning("Unable to save {0} result to the cache: {1}".format(kind, e))
+        return
+    debug.info(2, "Saved {0} result to {1}".format(kind, path))
+
+
+def evict(kind, max_size):
+    """
+    Remove the least recently used results of a kind until their total size
+    is at most `max_size` bytes.
+    """
+
+    if not OPTS.char_cache_path:
+        return
+    try:
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path)
+                   for e in os.scandir(os.path.join(OPTS.char_cache_path, kind))
+                   if e.name.endswith((".json", ".pickle"))]
+    except OSError:
+        return
+    total_size = sum(size for (_, size, _) in entries)
+    for (_, size, path) in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # Another process may have removed it
+            pass
+        total_size -= size
+
+
+def count(kind, index):
+    """ Count a hit (index 0) or a miss (index 1) of a kind of result. """
+
+    with stats_lock:
+        stats.setdefault(kind, [0, 0])[index] += 1
+
+
+def log_stats(kind, name):
+    """ Log and reset the number of hits and misses of a kind of result. """
+
+    with stats_lock:
+        (hits, misses) = stats.pop(kind, (0, 0))
+    if hits + misses > 0:
+        debug.info(1, "{0} cache: {1} hits, {2} misses".format(name, hits, misses))
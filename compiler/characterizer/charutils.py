@@ -17,37 +17,90 @@ def relative_compare(value1, value2, error_tolerance=0.001):
     return (abs(value1 - value2) / abs(max(value1, value2)) <= error_tolerance)
 
 
-def parse_spice_list(filename, key):
+def parse_spice_list(filename, key, workspace=None):
     """Parses a hspice output.lis file for a key value"""
 
-    lower_key = key.lower()
+    return spice_results(workspace, filename).get(key)
 
-    if OPTS.spice_name == "xa" :
-        # customsim has a different output file name
-        full_filename="{0}xa.meas".format(OPTS.openram_temp)
-    elif OPTS.spice_name == "spectre":
-        full_filename = os.path.join(OPTS.openram_temp, "delay_stim.measure")
-    elif OPTS.spice_name in ["Xyce", "xyce"]:
-        full_filename = os.path.join(OPTS.openram_temp, "spice_stdout.log")
-    else:
-        # ngspice/hspice using a .lis file
-        full_filename = "{0}{1}.lis".format(OPTS.openram_temp, filename)
 
-    try:
-        f = open(full_filename, "r")
-    except IOError:
-        debug.error("Unable to open spice output file: {0}".format(full_filename),1)
-        debug.archive()
-
-    contents = f.read().lower()
-    f.close()
-    # val = re.search(r"{0}\s*=\s*(-?\d+.?\d*\S*)\s+.*".format(key), contents)
-    val = re.search(r"{0}\s*=\s*(-?\d+.?\d*[e]?[-+]?[0-9]*\S*)\s+.*".format(lower_key), contents)
-    if val != None:
-        debug.info(4, "Key = " + lower_key + " Val = " + val.group(1))
-        return convert_to_float(val.group(1))
-    else:
-        return "Failed"
+class spice_results():
+    """
+    Measurement results of a spice simulation. The output file of the
+    simulator is parsed once into a dictionary of measurement values so
+    that each measurement is a lookup instead of a search of the file.
+    """
+
+    # All simulators write the measurements as "name = value"
+    measure_re = re.compile(r"([^\s=]+)\s*=\s*(-?\d+.?\d*[e]?[-+]?[0-9]*\S*)\s")
+
+    def __init__(self, workspace=None, filename="timing", values=None):
+        # The values can be given if they were already parsed
+        if values is not None:
+            self.values = values
+            return
+
+        if workspace is None:
+            workspace = OPTS.openram_temp
+
+        parsers = {
+            "ngspice": self.parse_ngspice,
+            "hspice": self.parse_hspice,
+            "Xyce": self.parse_xyce,
+            "xyce": self.parse_xyce,
+            "spectre": self.parse_spectre,
+            "xa": self.parse_xa,
+        }
+        # ngspice is the default simulator
+        parser = parsers.get(OPTS.spice_name, self.parse_ngspice)
+        self.values = parser(workspace, filename)
+
+    def parse_ngspice(self, workspace, filename):
+        """ ngspice writes the measurements to the .lis file """
+        return self.parse_file("{0}{1}.lis".format(workspace, filename))
+
+    def parse_hspice(self, workspace, filename):
+        """ hspice writes the measurements to the .lis file """
+        return self.parse_file("{0}{1}.lis".format(workspace, filename))
+
+    def parse_xyce(self, workspace, filename):
+        """ Xyce prints the measurements to stdout """
+        return self.parse_file(os.path.join(workspace, "spice_stdout.log"))
+
+    def parse_spectre(self, workspace, filename):
+        """ spectre writes the measurements to the .measure file of the stimulus """
+        return self.parse_file(os.path.join(workspace, "delay_stim.measure"))
+
+    def parse_xa(self, workspace, filename):
+        """ customsim has a different output file name """
+        return self.parse_file("{0}xa.meas".format(workspace))
+
+    def parse_file(self, full_filename):
+        """ Return the first value of each measurement in the file """
+
+        try:
+            f = open(full_filename, "r")
+        except IOError:
+            debug.error("Unable to open spice output file: {0}".format(full_filename),1)
+            debug.archive()
+
+        contents = f.read().lower()
+        f.close()
+
+        values = {}
+        for match in self.measure_re.finditer(contents):
+            values.setdefault(match.group(1), match.group(2))
+        return values
+
+    def get(self, key):
+        """ Return the value of a measurement or "Failed" if it wasn't measured """
+
+        lower_key = key.lower()
+        val = self.values.get(lower_key)
+        if val != None:
+            debug.info(4, "Key = {0} Val = {1}".format(lower_key, val))
+            return convert_to_float(val)
+        else:
+            return "Failed"
 
 
 def round_time(time, time_precision=3):
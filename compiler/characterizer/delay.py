@@ -11,6 +11,7 @@ from openram import debug
 from openram import tech
 from openram import OPTS
 from .stimuli import *
+from .sim_job import *
 from .trim_spice import *
 from .charutils import *
 from .simulation import simulation
@@ -390,11 +391,12 @@ class delay(simulation):
             for i in range(self.word_size + self.num_spare_cols):
                 self.sf.write("CD{0}{1} {2}{0}_{1} 0 {3}f\n".format(port, i, self.dout_name, self.load))
 
-    def write_delay_stimulus(self):
+    def write_delay_stimulus(self, workspace=None):
         """
         Creates a stimulus file for simulations to probe a bitcell at a given clock period.
         Address and bit were previously set with set_probe().
         Input slew (in ns) and output capacitive load (in fF) are required for charaterization.
+        The simulation job is written to the output path unless a workspace is given.
         """
 
         self.check_arguments()
@@ -402,22 +404,20 @@ class delay(simulation):
         # obtains list of time-points for each rising clk edge
         self.create_test_cycles()
 
-        # creates and opens stimulus file for writing
-        self.delay_stim_sp = "delay_stim.sp"
-        temp_stim = path.join(self.output_path, self.delay_stim_sp)
-        self.sf = open(temp_stim, "w")
-
-        # creates and opens measure file for writing
-        self.delay_meas_sp = "delay_meas.sp"
-        temp_meas = path.join(self.output_path, self.delay_meas_sp)
-        self.mf = open(temp_meas, "w")
+        # creates the simulation job and opens its stimulus and measure files for writing
+        if workspace is None:
+            workspace = self.output_path
+        self.job = sim_job("delay", self.corner, workspace)
+        self.sf = self.job.sf
+        self.mf = self.job.mf
+        temp_meas = self.job.meas_file()
 
         if OPTS.spice_name == "spectre":
             self.sf.write("simulator lang=spice\n")
         self.sf.write("* Delay stimulus for period of {0}n load={1}fF slew={2}ns\n\n".format(self.period,
                                                                                              self.load,
                                                                                              self.slew))
-        self.stim = stimuli(self.sf, self.mf, self.corner)
+        self.stim = self.job.stim
         # include files in stimulus file
         self.stim.write_include(self.trim_sp_file)
 
@@ -453,23 +453,22 @@ class delay(simulation):
         self.sf.close()
         self.mf.close()
 
-    def write_power_stimulus(self, trim):
+    def write_power_stimulus(self, trim, workspace=None):
         """ Creates a stimulus file to measure leakage power only.
         This works on the *untrimmed netlist*.
+        The simulation job is written to the output path unless a workspace is given.
         """
         self.check_arguments()
 
-        # creates and opens stimulus file for writing
-        self.power_stim_sp = "power_stim.sp"
-        temp_stim = path.join(self.output_path, self.power_stim_sp)
-        self.sf = open(temp_stim, "w")
+        # creates the simulation job and opens its stimulus and measure files for writing
+        if workspace is None:
+            workspace = self.output_path
+        self.job = sim_job("power", self.corner, workspace)
+        self.sf = self.job.sf
         self.sf.write("* Power stimulus for period of {0}n\n\n".format(self.period))
-
-        # creates and opens measure file for writing
-        self.power_meas_sp = "power_meas.sp"
-        temp_meas = path.join(self.output_path, self.power_meas_sp)
-        self.mf = open(temp_meas, "w")
-        self.stim = stimuli(self.sf, self.mf, self.corner)
+        self.mf = self.job.mf
+        temp_meas = self.job.meas_file()
+        self.stim = self.job.stim
 
         # include UNTRIMMED files in stimulus file
         if trim:
@@ -814,7 +813,7 @@ class delay(simulation):
 
         self.write_delay_stimulus()
 
-        self.stim.run_sim(self.delay_stim_sp)
+        self.job.run()
 
         return self.check_measurements()
 
@@ -831,7 +830,7 @@ class delay(simulation):
             debug.info(2, "Checking write values for port {0}".format(port))
             write_port_dict = {}
             for measure in self.write_lib_meas:
-                write_port_dict[measure.name] = measure.retrieve_measure(port=port)
+                write_port_dict[measure.name] = measure.retrieve_measure(port=port, results=self.job.get_results())
 
             if not check_dict_values_is_float(write_port_dict):
                 debug.error("Failed to Measure Write Port Values:\n\t\t{0}".format(write_port_dict), 1)
@@ -853,7 +852,7 @@ class delay(simulation):
             # Check timing for read ports. Power is only checked if it was read correctly
             read_port_dict = {}
             for measure in self.read_lib_meas:
-                read_port_dict[measure.name] = measure.retrieve_measure(port=port)
+                read_port_dict[measure.name] = measure.retrieve_measure(port=port, results=self.job.get_results())
 
             if not self.check_valid_delays(read_port_dict):
                 return (False, {})
@@ -871,7 +870,7 @@ class delay(simulation):
     def check_sen_measure(self, port):
         """Checks that the sen occurred within a half-period"""
 
-        sen_val = self.sen_meas.retrieve_measure(port=port)
+        sen_val = self.sen_meas.retrieve_measure(port=port, results=self.job.get_results())
         debug.info(2, "s_en delay={0}ns".format(sen_val))
         if self.sen_meas.meta_add_delay:
             max_delay = self.period / 2
@@ -888,7 +887,7 @@ class delay(simulation):
         bl_vals = {}
         br_vals = {}
         for meas in self.bitline_volt_meas:
-            val = meas.retrieve_measure(port=port)
+            val = meas.retrieve_measure(port=port, results=self.job.get_results())
             if self.bl_name == meas.targ_name_no_port:
                 bl_vals[meas.meta_str] = val
             elif self.br_name == meas.targ_name_no_port:
@@ -899,7 +898,7 @@ class delay(simulation):
         dout_success = True
         bl_success = False
         for meas in self.dout_volt_meas:
-            val = meas.retrieve_measure(port=port)
+            val = meas.retrieve_measure(port=port, results=self.job.get_results())
             debug.info(2, "{0}={1}".format(meas.name, val))
             debug.check(type(val)==float, "Error retrieving numeric measurement: {0} {1}".format(meas.name, val))
 
@@ -927,7 +926,7 @@ class delay(simulation):
         success = False
         for polarity, meas_list in bit_measures.items():
             for meas in meas_list:
-                val = meas.retrieve_measure(port=port)
+                val = meas.retrieve_measure(port=port, results=self.job.get_results())
                 debug.info(2, "{0}={1}".format(meas.name, val))
                 if type(val) != float:
                     continue
@@ -973,7 +972,7 @@ class delay(simulation):
         debug.info(2, "Checking measures in Delay Path")
         value_dict = {}
         for meas in self.sen_path_meas + self.bl_path_meas:
-            val = meas.retrieve_measure()
+            val = meas.retrieve_measure(results=self.job.get_results())
             debug.info(2, '{0}={1}'.format(meas.name, val))
             if type(val) != float or val > self.period / 2:
                 debug.info(1, 'Failed measurement:{}={}'.format(meas.name, val))
@@ -987,17 +986,27 @@ class delay(simulation):
         """
 
         debug.info(1, "Performing leakage power simulations.")
-        self.write_power_stimulus(trim=False)
-        self.stim.run_sim(self.power_stim_sp)
-        leakage_power=parse_spice_list("timing", "leakage_power")
+        # The untrimmed and trimmed simulations are independent, so they can
+        # run at the same time in their own workspaces
+        if OPTS.num_threads > 1:
+            self.write_power_stimulus(trim=False, workspace=new_workspace("power"))
+            power_job = self.job
+            self.write_power_stimulus(trim=True, workspace=new_workspace("power"))
+            trim_power_job = self.job
+            run_jobs([power_job, trim_power_job])
+            leakage_power=power_job.parse("leakage_power")
+            trim_leakage_power=trim_power_job.parse("leakage_power")
+        else:
+            self.write_power_stimulus(trim=False)
+            leakage_power=self.job.run().parse("leakage_power")
+            self.write_power_stimulus(trim=True)
+            trim_leakage_power=self.job.run().parse("leakage_power")
+
         debug.check(leakage_power!="Failed", "Could not measure leakage power.")
         debug.info(1, "Leakage power of full array is {0} mW".format(leakage_power * 1e3))
         # debug
         # sys.exit(1)
 
-        self.write_power_stimulus(trim=True)
-        self.stim.run_sim(self.power_stim_sp)
-        trim_leakage_power=parse_spice_list("timing", "leakage_power")
         debug.check(trim_leakage_power!="Failed", "Could not measure leakage power.")
         debug.info(1, "Leakage power of trimmed array is {0} mW".format(trim_leakage_power * 1e3))
 
@@ -1086,30 +1095,64 @@ class delay(simulation):
         # Write ports are assumed non-critical to timing, so the first available is used
         self.targ_write_ports = [self.write_ports[0]]
         self.targ_read_ports = [port]
+        # Simulate one period per thread in each step of the search
+        num_periods = OPTS.num_threads
         while True:
             time_out -= 1
             if (time_out <= 0):
                 debug.error("Timed out, could not converge on minimum period.", 2)
 
-            self.period = target_period
-            debug.info(1, "MinPeriod Search Port {3}: {0}ns (ub: {1} lb: {2})".format(target_period,
-                                                                                      ub_period,
-                                                                                      lb_period,
-                                                                                      port))
-
-            if self.try_period(feasible_delays):
-                ub_period = target_period
+            if num_periods > 1:
+                periods = self.get_search_periods(lb_period, ub_period, target_period, num_periods)
+                debug.info(1, "MinPeriod Search Port {3}: {0}ns (ub: {1} lb: {2})".format(periods,
+                                                                                          ub_period,
+                                                                                          lb_period,
+                                                                                          port))
+                # Keep the smallest feasible period and the largest infeasible
+                # period below it
+                for period, feasible in zip(periods, self.try_periods(feasible_delays, periods)):
+                    if feasible:
+                        ub_period = period
+                        break
+                    lb_period = period
+                # Only the first step simulates the given target period
+                target_period = None
             else:
-                lb_period = target_period
+                self.period = target_period
+                debug.info(1, "MinPeriod Search Port {3}: {0}ns (ub: {1} lb: {2})".format(target_period,
+                                                                                          ub_period,
+                                                                                          lb_period,
+                                                                                          port))
+
+                if self.try_period(feasible_delays):
+                    ub_period = target_period
+                else:
+                    lb_period = target_period
 
             if relative_compare(ub_period, lb_period, error_tolerance=0.05):
                 # ub_period is always feasible.
                 return ub_period
 
             # Update target
-            target_period = 0.5 * (ub_period + lb_period)
+            if num_periods == 1:
+                target_period = 0.5 * (ub_period + lb_period)
             # key=input("press return to continue")
 
+    def get_search_periods(self, lb_period, ub_period, target_period, num_periods):
+        """
+        Returns the periods to simulate in a step of the parallel search. They
+        split the range between the bounds evenly. The target period of the
+        first step is also simulated.
+        """
+
+        if target_period is not None:
+            num_periods -= 1
+        step = (ub_period - lb_period) / (num_periods + 1)
+        periods = [lb_period + (i + 1) * step for i in range(num_periods)]
+        if target_period is not None:
+            periods = sorted(set(periods + [target_period]))
+        return periods
+
     def try_period(self, feasible_delays):
         """
         This tries to simulate a period and checks if the result
@@ -1121,6 +1164,35 @@ class delay(simulation):
         if not success:
             return False
 
+        return self.check_period_delays(feasible_delays, results)
+
+    def try_periods(self, feasible_delays, periods):
+        """
+        This simulates the periods at the same time in their own workspaces
+        and checks each result like try_period.
+        """
+
+        jobs = []
+        for period in periods:
+            self.period = period
+            self.write_delay_stimulus(workspace=new_workspace("delay"))
+            jobs.append(self.job)
+        run_jobs(jobs)
+
+        feasible = []
+        for period, job in zip(periods, jobs):
+            # The checks use the period and the results of the job
+            self.period = period
+            self.job = job
+            (success, results) = self.check_measurements()
+            feasible.append(success and self.check_period_delays(feasible_delays, results))
+        return feasible
+
+    def check_period_delays(self, feasible_delays, results):
+        """
+        Checks if the delays of a simulated period are within 5% of the feasible delays.
+        """
+
         # Check the values of target readwrite and read ports. Write ports do not produce delays in this current version
         for port in self.targ_read_ports:
             # check that the delays and slews do not degrade with tested period.
@@ -1352,10 +1424,28 @@ class delay(simulation):
         # Set the target simulation ports to all available ports. This make sims slower but failed sims exit anyways.
         self.targ_read_ports = self.read_ports
         self.targ_write_ports = self.write_ports
-        for load, slew in load_slews:
+        # The pairs are independent, so they can be simulated at the same time
+        # in their own workspaces. The number of running simulations is
+        # limited by the number of threads.
+        parallel = OPTS.num_threads > 1 and len(load_slews) > 1
+        if parallel:
+            futures = []
+            for load, slew in load_slews:
+                self.set_load_slew(load, slew)
+                self.write_delay_stimulus(workspace=new_workspace("delay"))
+                futures.append(self.job.submit())
+        for i, (load, slew) in enumerate(load_slews):
             self.set_load_slew(load, slew)
             # Find the delay, dynamic power, and leakage power of the trimmed array.
-            (success, delay_results) = self.run_delay_simulation()
+            if parallel:
+                self.job = futures[i].result()
+                (success, delay_results) = self.check_measurements()
+                # Don't start the remaining simulations if this one failed
+                if not success:
+                    for future in futures:
+                        future.cancel()
+            else:
+                (success, delay_results) = self.run_delay_simulation()
             debug.check(success, "Couldn't run a simulation. slew={0} load={1}\n".format(self.slew, self.load))
             debug.info(1, "Simulation Passed: Port {0} slew={1} load={2}".format("All", self.slew, self.load))
             # The results has a dict for every port but dicts can be empty (e.g. ports were not targeted).
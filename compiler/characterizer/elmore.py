@@ -41,6 +41,13 @@ class elmore(simulation):
         """
         Return the analytical model results for the SRAM.
         """
+        return self.get_corners_lib_values([self.corner], load_slews)[0]
+
+    def get_corners_lib_values(self, corners, load_slews):
+        """
+        Return the analytical model results for the SRAM at each corner. The
+        graph and the bitline path are only found once for all corners.
+        """
         if OPTS.num_rw_ports > 1 or OPTS.num_w_ports > 0 and OPTS.num_r_ports > 0:
             debug.warning("In analytical mode, all ports have the timing of the first read port.")
 
@@ -58,6 +65,17 @@ class elmore(simulation):
         bl_name, br_name = self.get_bl_name(self.graph.all_paths, port)
         bl_path = [path for path in self.graph.all_paths if bl_name in path][0]
 
+        corner_values = []
+        for corner in corners:
+            self.set_corner(corner)
+            corner_values.append(self.get_path_lib_values(bl_path, load_slews))
+        return corner_values
+
+    def get_path_lib_values(self, bl_path, load_slews):
+        """
+        Return the analytical model results of the bitline path at the
+        current corner.
+        """
         # Set delay/power for slews and loads
         port_data = self.get_empty_measure_data_dict()
         power = self.analytical_power(load_slews)
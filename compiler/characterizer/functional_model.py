@@ -0,0 +1,214 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import math
+import numpy as np
+
+
+class functional_model():
+    """
+    Cycle-accurate behavioral model of an SRAM. It replays the control,
+    address, data, write mask and spare enable values of the ports that a
+    functional test generates for its SPICE stimulus and finds the value of
+    each read. Reads see the memory before the writes of the same cycle.
+
+    All cycles are evaluated at once with NumPy. The value of a bit read in
+    a cycle is the value of the last write of that bit to the same address
+    in an earlier cycle, which is found with a search in the sorted write
+    events of the bit. Bits that were never written are read as "X".
+    """
+
+    def __init__(self, sim):
+
+        self.word_size = sim.word_size
+        self.write_size = sim.write_size
+        self.num_wmasks = sim.num_wmasks
+        self.num_spare_cols = sim.num_spare_cols
+        self.num_bits = self.word_size + self.num_spare_cols
+        self.all_ports = sim.all_ports
+        self.read_ports = sim.read_ports
+        self.write_ports = sim.write_ports
+        self.readwrite_ports = sim.readwrite_ports
+        self.num_cycles = len(sim.cycle_times)
+        # Spare columns are shared by all words in a row
+        self.col_addr_size = int(math.log(sim.words_per_row, 2))
+
+        self.create_write_events(sim)
+        self.create_read_events(sim)
+
+    def get_enables(self, sim, port, op):
+        """ Return the cycles where a port performs an operation. """
+
+        enables = np.asarray(sim.csb_values[port]) == 0
+        if port in self.readwrite_ports:
+            web = np.asarray(sim.web_values[port])
+            if op == "read":
+                enables &= web == 1
+            else:
+                enables &= web == 0
+        return enables
+
+    def get_addresses(self, sim, port):
+        """ Return the address of a port in each cycle. """
+
+        # Address bits are stored with the LSB first
+        bits = np.asarray(sim.addr_values[port], dtype=np.int64)
+        weights = np.left_shift(1, np.arange(len(bits), dtype=np.int64))
+        return weights.dot(bits)
+
+    def get_bit_enables(self, sim, port):
+        """
+        Return which data bits of a port are written in each cycle. Each
+        write mask bit enables `write_size` data bits and each spare enable
+        bit enables one spare column.
+        """
+
+        bit_enables = np.ones((self.num_cycles, self.num_bits), dtype=bool)
+        if self.num_wmasks:
+            wmasks = np.asarray(sim.wmask_values[port], dtype=bool)
+            bit_enables[:, :self.word_size] = np.repeat(wmasks, self.write_size, axis=0)[:self.word_size].T
+        if self.num_spare_cols:
+            bit_enables[:, self.word_size:] = np.asarray(sim.spare_wen_values[port], dtype=bool).T
+        return bit_enables
+
+    def create_write_events(self, sim):
+        """
+        Find the writes of each bit as keys sorted by address and cycle with
+        the written values.
+        """
+
+        # (cycle, address) of the writes of all ports for conflict checks
+        self.write_cycles = []
+        self.write_addresses = []
+        keys = [[] for bit in range(self.num_bits)]
+        values = [[] for bit in range(self.num_bits)]
+        for port in self.write_ports:
+            enables = self.get_enables(sim, port, "write")
+            addresses = self.get_addresses(sim, port)
+            data = np.asarray(sim.data_values[port], dtype=np.uint8)
+            bit_enables = self.get_bit_enables(sim, port) & enables[:, None]
+            cycles = np.nonzero(enables)[0]
+            self.write_cycles.append(cycles)
+            self.write_addresses.append(addresses[cycles])
+            for bit in range(self.num_bits):
+                cycles = np.nonzero(bit_enables[:, bit])[0]
+                keys[bit].append(self.get_keys(addresses[cycles], cycles, bit))
+                values[bit].append(data[bit][cycles])
+
+        self.write_keys = []
+        self.write_values = []
+        for bit in range(self.num_bits):
+            bit_keys = np.concatenate(keys[bit]) if keys[bit] else np.zeros(0, dtype=np.int64)
+            bit_values = np.concatenate(values[bit]) if values[bit] else np.zeros(0, dtype=np.uint8)
+            order = np.argsort(bit_keys, kind="stable")
+            self.write_keys.append(bit_keys[order])
+            self.write_values.append(bit_values[order])
+        self.write_cycles = np.concatenate(self.write_cycles) if self.write_cycles else np.zeros(0, dtype=np.int64)
+        self.write_addresses = np.concatenate(self.write_addresses) if self.write_addresses else np.zeros(0, dtype=np.int64)
+
+    def create_read_events(self, sim):
+        """
+        Find the reads of all ports in the order of their cycles and of the
+        ports in each cycle.
+        """
+
+        cycles = []
+        ports = []
+        addresses = []
+        for port_index, port in enumerate(self.all_ports):
+            if port not in self.read_ports:
+                continue
+            port_cycles = np.nonzero(self.get_enables(sim, port, "read"))[0]
+            cycles.append(port_cycles)
+            ports.append(np.full(len(port_cycles), port_index))
+            addresses.append(self.get_addresses(sim, port)[port_cycles])
+        cycles = np.concatenate(cycles)
+        ports = np.concatenate(ports)
+        addresses = np.concatenate(addresses)
+        order = np.lexsort((ports, cycles))
+        self.read_cycles = cycles[order]
+        self.read_ports_index = ports[order]
+        self.read_addresses = addresses[order]
+
+    def get_keys(self, addresses, cycles, bit):
+        """
+        Return the keys of events that sort by address and then cycle. Spare
+        columns are addressed by their row.
+        """
+
+        if bit >= self.word_size:
+            addresses = np.right_shift(addresses, self.col_addr_size)
+        return addresses * self.num_cycles + cycles
+
+    def check_conflicts(self):
+        """
+        Check that two ports don't write the same address in a cycle and
+        that no port reads an address while another port writes it.
+        """
+
+        write_keys = self.write_addresses * self.num_cycles + self.write_cycles
+        (unique_keys, counts) = np.unique(write_keys, return_counts=True)
+        conflicts = unique_keys[counts > 1]
+        if len(conflicts):
+            (address, cycle) = divmod(int(conflicts[0]), self.num_cycles)
+            return (0, "FAILED: Multiple ports write address {0} during cycle {1}".format(address, cycle))
+
+        read_keys = self.read_addresses * self.num_cycles + self.read_cycles
+        conflicts = np.nonzero(np.isin(read_keys, unique_keys))[0]
+        if len(conflicts):
+            i = conflicts[0]
+            return (0, "FAILED: Port {0} reads address {1} while it is written during cycle {2}".format(self.all_ports[self.read_ports_index[i]],
+                                                                                                     self.read_addresses[i],
+                                                                                                     self.read_cycles[i]))
+        return (1, "SUCCESS")
+
+    def get_read_bits(self):
+        """
+        Return the value of each bit of each read as a matrix where 0 and 1
+        are the values read and -1 is a bit that was never written.
+        """
+
+        read_bits = np.full((len(self.read_cycles), self.num_bits), -1, dtype=np.int8)
+        for bit in range(self.num_bits):
+            keys = self.write_keys[bit]
+            if not len(keys):
+                continue
+            read_keys = self.get_keys(self.read_addresses, self.read_cycles, bit)
+            # The last write of the bit before the read
+            last = np.searchsorted(keys, read_keys, side="left") - 1
+            found = last >= 0
+            last = np.maximum(last, 0)
+            # The write must be to the same address
+            found &= keys[last] // self.num_cycles == read_keys // self.num_cycles
+            read_bits[found, bit] = self.write_values[bit][last[found]]
+        return read_bits
+
+    def get_read_values(self):
+        """
+        Return the value of each read as a binary string with the MSB first
+        like the words of the functional test.
+        """
+
+        read_bits = self.get_read_bits()
+        symbols = np.frombuffer(b"X01", dtype=np.uint8)
+        text = symbols[read_bits[:, ::-1] + 1].tobytes().decode()
+        return [text[i:i + self.num_bits] for i in range(0, len(text), self.num_bits)]
+
+    def get_word_bits(self, words):
+        """
+        Return the bits of binary strings with the MSB first as a matrix
+        like the one of the read bits.
+        """
+
+        text = "".join(words).encode()
+        bits = np.frombuffer(text, dtype=np.uint8).reshape(-1, self.num_bits) - ord("0")
+        return bits[:, ::-1].astype(np.int8)
+
+    def get_reads(self):
+        """ Return the port and cycle of each read in order. """
+
+        return [(self.all_ports[p], int(c)) for (p, c) in zip(self.read_ports_index, self.read_cycles)]
@@ -6,6 +6,7 @@
 # All rights reserved.
 #
 import os, sys, re
+import multiprocessing
 import time
 import datetime
 import numpy as np
@@ -16,6 +17,7 @@ from openram import OPTS
 from .setup_hold import *
 from .delay import *
 from .charutils import *
+from . import char_cache
 
 
 class lib:
@@ -153,23 +155,66 @@ class lib:
     def characterize_corners(self):
         """ Characterize the list of corners. """
         debug.info(1,"Characterizing corners: " + str(self.corners))
+        if OPTS.num_threads > 1 and len(self.corners) > 1 and \
+           "fork" in multiprocessing.get_all_start_methods():
+            corner_results = self.characterize_corners_parallel()
+        else:
+            corner_results = [self.characterize_corner(i) for i in range(len(self.corners))]
+
+        # Write the datasheet info in the order of the corners (nominal first)
         is_first_corner = True
-        for (self.corner,lib_name) in zip(self.corners,self.lib_files):
-            run_start = time.time()
-            debug.info(1,"Corner: " + str(self.corner))
-            (self.process, self.voltage, self.temperature) = self.corner
-            self.lib = open(lib_name, "w")
-            debug.info(1,"Writing to {0}".format(lib_name))
-            self.corner_name = lib_name.replace(self.out_dir,"").replace(".lib","")
-            self.characterize()
-            self.lib.close()
-            if self.pred_time == None:
-                total_time = time.time()-run_start
-            else:
-                total_time = self.pred_time
-            self.parse_info(self.corner,lib_name, is_first_corner, total_time)
+        for (self.corner, lib_name, results) in zip(self.corners, self.lib_files, corner_results):
+            (self.char_sram_results, self.char_port_results, total_time) = results
+            self.parse_info(self.corner, lib_name, is_first_corner, total_time)
             is_first_corner = False
 
+    def characterize_corner(self, index):
+        """
+        Characterize a corner and write its lib file. Return the SRAM results,
+        the port results and the characterization time.
+        """
+        run_start = time.time()
+        self.corner = self.corners[index]
+        lib_name = self.lib_files[index]
+        debug.info(1,"Corner: " + str(self.corner))
+        (self.process, self.voltage, self.temperature) = self.corner
+        self.lib = open(lib_name, "w")
+        debug.info(1,"Writing to {0}".format(lib_name))
+        self.corner_name = lib_name.replace(self.out_dir,"").replace(".lib","")
+        self.characterize()
+        self.lib.close()
+        char_cache.log_stats("sim", "Simulation")
+        if self.pred_time == None:
+            total_time = time.time()-run_start
+        else:
+            total_time = self.pred_time
+        return (self.char_sram_results, self.char_port_results, total_time)
+
+    def characterize_corners_parallel(self):
+        """
+        Characterize the corners in forked processes. Each process simulates
+        in its own temp directory since the simulation files have fixed names.
+        """
+        global corner_lib
+
+        # Setup and hold times are only found once for the first corner and
+        # used for all corners
+        self.corner = self.corners[0]
+        self.compute_setup_hold()
+        # The model results of all corners are also predicted at once
+        if self.use_model:
+            self.compute_model_results()
+
+        num_procs = min(OPTS.num_threads, len(self.corners))
+        debug.info(1, "Characterizing {0} corners with {1} processes".format(len(self.corners), num_procs))
+        corner_lib = self
+        self.base_temp = OPTS.openram_temp
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes=num_procs) as pool:
+            corner_results = pool.map(characterize_corner, range(len(self.corners)), chunksize=1)
+        corner_lib = None
+        return corner_results
+
     def characterize(self):
         """ Characterize the current corner. """
 
@@ -631,20 +676,10 @@ class lib:
     def compute_delay(self):
         """Compute SRAM delays for current corner"""
         if self.use_model:
-            model_name_lc = OPTS.model_name.lower()
-            if model_name_lc == "linear_regression":
-                from .linear_regression import linear_regression as model
-            elif model_name_lc == "elmore":
-                from .elmore import elmore as model
-            elif model_name_lc == "neural_network":
-                from .neural_network import neural_network as model
-            elif model_name_lc == "cacti":
-                from .cacti import cacti as model
-            else:
-                debug.error("{} model not recognized. See options.py for available models.".format(OPTS.model_name))
-
-            m = model(self.sram, self.sp_file, self.corner)
-            char_results = m.get_lib_values(self.load_slews)
+            # The models predict all corners at once
+            if not hasattr(self, "model_results"):
+                self.compute_model_results()
+            char_results = self.model_results[self.corner]
 
         else:
             self.d = delay(self.sram, self.sp_file, self.corner)
@@ -669,6 +704,24 @@ class lib:
             # OPTS.bl_path_names = self.char_sram_results["bl_path_names"]
 
 
+    def compute_model_results(self):
+        """ Compute the model results of all corners at once """
+        model_name_lc = OPTS.model_name.lower()
+        if model_name_lc == "linear_regression":
+            from .linear_regression import linear_regression as model
+        elif model_name_lc == "elmore":
+            from .elmore import elmore as model
+        elif model_name_lc == "neural_network":
+            from .neural_network import neural_network as model
+        elif model_name_lc == "cacti":
+            from .cacti import cacti as model
+        else:
+            debug.error("{} model not recognized. See options.py for available models.".format(OPTS.model_name))
+
+        m = model(self.sram, self.sp_file, self.corners[0])
+        corner_results = m.get_corners_lib_values(self.corners, self.load_slews)
+        self.model_results = dict(zip(self.corners, corner_results))
+
     def compute_setup_hold(self):
         """ Do the analysis if we haven't characterized a FF yet """
         # Do the analysis if we haven't characterized a FF yet
@@ -892,3 +945,16 @@ class lib:
             datasheet.write("{0},{1},".format('read_rise_power_{}'.format(port), read1_power))
             #FIXME: should be read_fall_power
             datasheet.write("{0},{1},".format('read_fall_power_{}'.format(port), read0_power))
+
+
+# The lib object whose corners are being characterized. Forked processes
+# inherit it.
+corner_lib = None
+
+
+def characterize_corner(index):
+    """ Characterize a corner of `corner_lib` in its own temp directory. """
+    OPTS.openram_temp = os.path.join(corner_lib.base_temp, "corner{}".format(index), "")
+    if not os.path.exists(OPTS.openram_temp):
+        os.makedirs(OPTS.openram_temp, 0o750)
+    return corner_lib.characterize_corner(index)
@@ -35,12 +35,15 @@ class spice_measurement(ABC):
         measure_vals = self.get_measure_values(*input_tuple)
         self.measure_function(stim_obj, *measure_vals)
 
-    def retrieve_measure(self, port=None):
+    def retrieve_measure(self, port=None, results=None):
         self.port_error_check(port)
+        # Parse the simulation output if the results aren't given
+        if results is None:
+            results = spice_results()
         if port is not None:
-            value = parse_spice_list("timing", "{0}{1}".format(self.name.lower(), port))
+            value = results.get("{0}{1}".format(self.name.lower(), port))
         else:
-            value = parse_spice_list("timing", "{0}".format(self.name.lower()))
+            value = results.get("{0}".format(self.name.lower()))
         if type(value)!=float or self.measure_scale is None:
             return value
         else:
@@ -71,16 +74,7 @@ class delay_measure(spice_measurement):
 
     def measure_function(self, stim_obj, meas_name, trig_name, targ_name, trig_val, targ_val, trig_dir, targ_dir, trig_td, targ_td):
         """ Creates the .meas statement for the measurement of delay """
-        measure_string=".meas tran {0} TRIG v({1}) VAL={2} {3}=1 TD={4}n TARG v({5}) VAL={6} {7}=1 TD={8}n\n\n"
-        stim_obj.mf.write(measure_string.format(meas_name.lower(),
-                                                 trig_name,
-                                                 trig_val,
-                                                 trig_dir,
-                                                 trig_td,
-                                                 targ_name,
-                                                 targ_val,
-                                                 targ_dir,
-                                                 targ_td))
+        stim_obj.gen_meas_delay(meas_name, trig_name, targ_name, trig_val, targ_val, trig_dir, targ_dir, trig_td, targ_td)
 
     def set_meas_constants(self, trig_name, targ_name, trig_dir_str, targ_dir_str, trig_vdd, targ_vdd):
         """Set the constants for this measurement: signal names, directions, and trigger scales"""
@@ -145,16 +139,7 @@ class power_measure(spice_measurement):
 
     def measure_function(self, stim_obj, meas_name, t_initial, t_final):
         """ Creates the .meas statement for the measurement of avg power """
-        # power mea cmd is different in different spice:
-        if OPTS.spice_name == "hspice":
-            power_exp = "power"
-        else:
-            # FIXME: Obtain proper vdd and gnd name
-            power_exp = "par('(-1*v(" + "vdd" + ")*I(v" + "vdd" + "))')"
-        stim_obj.mf.write(".meas tran {0} avg {1} from={2}n to={3}n\n\n".format(meas_name.lower(),
-                                                                                 power_exp,
-                                                                                 t_initial,
-                                                                                 t_final))
+        stim_obj.gen_meas_power(meas_name, t_initial, t_final)
 
     def set_meas_constants(self, power_type):
         """Sets values useful for power simulations. This value is only meta related to the lib file (rise/fall)"""
@@ -180,13 +165,7 @@ class voltage_when_measure(spice_measurement):
 
     def measure_function(self, stim_obj, meas_name, trig_name, targ_name, trig_val, trig_dir, trig_td):
         """ Creates the .meas statement for the measurement of delay """
-        measure_string=".meas tran {0} FIND v({1}) WHEN v({2})={3}v {4}=1 TD={5}n \n\n"
-        stim_obj.mf.write(measure_string.format(meas_name.lower(),
-                                                targ_name,
-                                                trig_name,
-                                                trig_val,
-                                                trig_dir,
-                                                trig_td))
+        stim_obj.gen_meas_find_voltage(meas_name, trig_name, targ_name, trig_val, trig_dir, trig_td)
 
     def set_meas_constants(self, trig_name, targ_name, trig_dir_str, trig_vdd):
         """Sets values useful for power simulations. This value is only meta related to the lib file (rise/fall)"""
@@ -221,10 +200,7 @@ class voltage_at_measure(spice_measurement):
 
     def measure_function(self, stim_obj, meas_name, targ_name, time_at):
         """ Creates the .meas statement for voltage at time"""
-        measure_string=".meas tran {0} FIND v({1}) AT={2}n \n\n"
-        stim_obj.mf.write(measure_string.format(meas_name.lower(),
-                                                targ_name,
-                                                time_at))
+        stim_obj.gen_meas_find_voltage_at_time(meas_name, targ_name, time_at)
 
     def set_meas_constants(self, targ_name):
         """Sets values useful for power simulations. This value is only meta related to the lib file (rise/fall)"""
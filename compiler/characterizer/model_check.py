@@ -274,7 +274,7 @@ class model_check(delay):
         slew_meas_list = []
         power_meas_list=[]
         for measure in meas_objs:
-            measure_value = measure.retrieve_measure(port=port)
+            measure_value = measure.retrieve_measure(port=port, results=self.job.get_results())
             if type(measure_value) != float:
                 debug.error("Failed to Measure Value:\n\t\t{}={}".format(measure.name, measure_value),1)
             if type(measure) is delay_measure:
@@ -307,7 +307,7 @@ class model_check(delay):
         # Checking from not data_value to data_value
         self.write_delay_stimulus()
 
-        self.stim.run_sim() # running sim prodoces spice output file.
+        self.job.run() # running sim prodoces spice output file.
 
         # Retrieve the results from the output file
         for port in self.targ_read_ports:
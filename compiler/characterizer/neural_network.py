@@ -5,6 +5,7 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
+import numpy as np
 from sklearn.neural_network import MLPRegressor
 from openram import debug
 from openram import OPTS
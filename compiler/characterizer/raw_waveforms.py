@@ -0,0 +1,207 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+This file reads the waveforms of a transient simulation from a SPICE3 raw
+file and computes the measurements of the .meas statements from them. The
+raw file is written by ngspice and Xyce with -r and by spectre with the
+nutbin format. Binary raw files are memory-mapped, so only the waveforms
+that are measured are read from the disk.
+"""
+
+import os
+import re
+import numpy as np
+from openram import debug
+
+
+class raw_waveforms():
+    """
+    Waveforms of a transient simulation. All times of the measurement
+    functions are in ns like the .meas statements of the stimulus and the
+    results are in the units of the simulator's measurements.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        # Column of each signal indexed by its normalized name
+        self.signals = {}
+        self.read_file()
+
+    def read_file(self):
+        """ Read the header of the first plot and map its values. """
+
+        try:
+            f = open(self.filename, "rb")
+        except IOError:
+            debug.error("Unable to open raw waveform file: {0}".format(self.filename), 1)
+
+        with f:
+            flags = ""
+            num_vars = 0
+            num_points = 0
+            while True:
+                line = f.readline()
+                if not line:
+                    debug.error("No values in raw waveform file: {0}".format(self.filename), 1)
+                (key, _, value) = line.decode("latin-1").partition(":")
+                key = key.strip().lower()
+                if key == "flags":
+                    flags = value.strip().lower()
+                elif key == "no. variables":
+                    num_vars = int(value)
+                elif key == "no. points":
+                    num_points = int(value)
+                elif key == "variables":
+                    for index in range(num_vars):
+                        # Each variable is "index name type" on its own line.
+                        # The first may follow the colon.
+                        if index == 0 and value.strip():
+                            words = value.split()
+                        else:
+                            words = f.readline().decode("latin-1").split()
+                        self.signals[self.get_signal_name(words[1])] = index
+                elif key == "binary":
+                    offset = f.tell()
+                    self.read_binary(offset, num_vars, num_points, "complex" in flags)
+                    return
+                elif key == "values":
+                    self.read_ascii(f.read().decode("latin-1"), num_vars, num_points)
+                    return
+
+    def read_binary(self, offset, num_vars, num_points, is_complex):
+        """ Memory-map the values of a binary raw file. """
+
+        if is_complex:
+            dtype = np.complex128
+        else:
+            dtype = np.float64
+        # A simulation that stopped early has fewer points than its header
+        file_points = (os.path.getsize(self.filename) - offset) // (num_vars * np.dtype(dtype).itemsize)
+        num_points = min(num_points, file_points)
+        self.values = np.memmap(self.filename, dtype=dtype, mode="r", offset=offset, shape=(num_points, num_vars))
+        if is_complex:
+            self.values = self.values.real
+
+    def read_ascii(self, text, num_vars, num_points):
+        """ Parse the values of an ASCII raw file. """
+
+        # Each point is its index followed by the value of each variable
+        words = text.split()
+        num_points = min(num_points, len(words) // (num_vars + 1))
+        words = words[:num_points * (num_vars + 1)]
+        values = np.array(words).reshape(num_points, num_vars + 1)[:, 1:]
+        # Complex values are written as "real,imaginary"
+        self.values = np.char.partition(values, ",")[:, :, 0].astype(np.float64)
+
+    def get_signal_name(self, name):
+        """
+        Return the name of a signal without the voltage prefix. Currents
+        are named i(source) since ngspice names them source#branch.
+        """
+
+        name = name.lower()
+        match = re.fullmatch(r"v\((.*)\)", name)
+        if match:
+            return match.group(1)
+        match = re.fullmatch(r"(.*)#branch", name)
+        if match:
+            return "i({})".format(match.group(1))
+        return name
+
+    def get_time(self):
+        """ Return the time of each point. """
+        return self.values[:, 0]
+
+    def get_signal(self, name):
+        """ Return the values of a signal. """
+        try:
+            return self.values[:, self.signals[self.get_signal_name(name)]]
+        except KeyError:
+            debug.error("Signal {0} not found in {1}".format(name, self.filename), 1)
+
+    def get_crossings(self, name, value, direction, td=0):
+        """
+        Return the times where a signal crosses a value in a direction
+        (RISE, FALL or CROSS) after a delay. The times are interpolated
+        between the points.
+        """
+
+        time = self.get_time()
+        diff = self.get_signal(name) - value
+        if direction == "RISE":
+            crossings = (diff[:-1] < 0) & (diff[1:] >= 0)
+        elif direction == "FALL":
+            crossings = (diff[:-1] > 0) & (diff[1:] <= 0)
+        else:
+            crossings = ((diff[:-1] < 0) & (diff[1:] >= 0)) | ((diff[:-1] > 0) & (diff[1:] <= 0))
+        index = np.nonzero(crossings)[0]
+        (t0, t1) = (time[index], time[index + 1])
+        (d0, d1) = (diff[index], diff[index + 1])
+        times = t0 + (t1 - t0) * d0 / (d0 - d1)
+        return times[times >= td * 1e-9]
+
+    def get_crossing(self, name, value, direction, td=0):
+        """ Return the time of the first crossing or None if there is none. """
+
+        times = self.get_crossings(name, value, direction, td)
+        if len(times):
+            return times[0]
+        return None
+
+    def delay(self, trig_name, targ_name, trig_val, targ_val, trig_dir, targ_dir, trig_td, targ_td):
+        """ Return the time between the trigger and target crossings. """
+
+        trig_time = self.get_crossing(trig_name, trig_val, trig_dir, trig_td)
+        targ_time = self.get_crossing(targ_name, targ_val, targ_dir, targ_td)
+        if trig_time is None or targ_time is None:
+            return None
+        return targ_time - trig_time
+
+    def voltage_when(self, trig_name, targ_name, trig_val, trig_dir, trig_td):
+        """ Return the voltage of the target when the trigger crosses a value. """
+
+        trig_time = self.get_crossing(trig_name, trig_val, trig_dir, trig_td)
+        if trig_time is None:
+            return None
+        return np.interp(trig_time, self.get_time(), self.get_signal(targ_name))
+
+    def voltage_at(self, targ_name, time_at):
+        """ Return the voltage of a signal at a time. """
+
+        time = self.get_time()
+        if not time[0] <= time_at * 1e-9 <= time[-1]:
+            return None
+        return np.interp(time_at * 1e-9, time, self.get_signal(targ_name))
+
+    def power(self, t_initial, t_final, vdd_name="vdd"):
+        """ Return the average power of the supply between two times. """
+
+        time = self.get_time()
+        (t_initial, t_final) = (t_initial * 1e-9, t_final * 1e-9)
+        if not time[0] <= t_initial < t_final <= time[-1]:
+            return None
+        power = -self.get_signal(vdd_name) * self.get_signal("i(v{})".format(vdd_name))
+        # Integrate the points in the window and the interpolated ends
+        inside = (time > t_initial) & (time < t_final)
+        window_time = np.concatenate(([t_initial], time[inside], [t_final]))
+        window_power = np.concatenate(([np.interp(t_initial, time, power)],
+                                       power[inside],
+                                       [np.interp(t_final, time, power)]))
+        energy = np.sum((window_power[1:] + window_power[:-1]) * np.diff(window_time)) / 2
+        return energy / (t_final - t_initial)
+
+    def measure(self, kind, *args):
+        """
+        Return the value of a measurement of a kind (the name of the
+        measurement function) or None if it fails.
+        """
+
+        value = getattr(self, kind)(*args)
+        if value is None:
+            return None
+        return float(value)
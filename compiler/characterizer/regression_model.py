@@ -10,6 +10,7 @@ from openram import debug
 from openram import OPTS
 from .analytical_util import *
 from .simulation import simulation
+from . import char_cache
 
 
 relative_data_path = "sim_data"
@@ -43,6 +44,12 @@ else:
 
 data_path = data_dir + '/' + data_file
 
+# Increase this when the format of the stored models changes
+model_store_version = 1
+# Trained models with their output names and scaling values indexed by their
+# keys in the model store
+trained_models = {}
+
 class regression_model(simulation):
 
     def __init__(self, sram, spfile, corner):
@@ -53,31 +60,57 @@ class regression_model(simulation):
         """
         A model and prediction is created for each output needed for the LIB
         """
+        return self.get_corners_lib_values([self.corner], load_slews)[0]
+
+    def get_corners_lib_values(self, corners, load_slews):
+        """
+        Return the LIB values of each corner. The inputs of all corners and
+        load/slew pairs are predicted at once with a single call to each
+        output's model.
+        """
 
         debug.info(1, "Characterizing SRAM using regression models.")
         log_num_words = math.log(OPTS.num_words, 2)
-        model_inputs = [log_num_words,
-                        OPTS.word_size,
-                        OPTS.words_per_row,
-                        OPTS.local_array_size,
-                        process_transform[self.process],
-                        self.vdd_voltage,
-                        self.temperature]
-                        # Area removed for now
-                        # self.sram.width * self.sram.height,
-        # Include above inputs, plus load and slew which are added below
-        self.num_inputs = len(model_inputs)+2
+        model_inputs = []
+        for corner in corners:
+            (process, vdd_voltage, temperature) = corner
+            for load, slew in load_slews:
+                model_inputs.append([log_num_words,
+                                     OPTS.word_size,
+                                     OPTS.words_per_row,
+                                     OPTS.local_array_size,
+                                     process_transform[process],
+                                     vdd_voltage,
+                                     temperature,
+                                     # Area removed for now
+                                     # self.sram.width * self.sram.height,
+                                     slew,
+                                     load])
+        self.num_inputs = len(model_inputs[0])
 
         self.create_measurement_names()
         models = self.train_models()
+        predictions = self.get_predictions(model_inputs, models)
+
+        corner_values = []
+        for i, corner in enumerate(corners):
+            self.set_corner(corner)
+            # Rows of this corner's predictions
+            rows = range(i * len(load_slews), (i + 1) * len(load_slews))
+            corner_values.append(self.get_corner_lib_values(load_slews, rows, predictions))
+        return corner_values
+
+    def get_corner_lib_values(self, load_slews, rows, predictions):
+        """
+        Return the SRAM and port data of the given rows of the predictions.
+        """
 
         # Set delay/power for slews and loads
         port_data = self.get_empty_measure_data_dict()
         debug.info(1, 'Slew, Load, Port, Delay(ns), Slew(ns)')
-        max_delay = 0.0
-        for load, slew in load_slews:
-            # List returned with value order being delay, power, leakage, slew
-            sram_vals = self.get_predictions(model_inputs+[slew, load], models)
+        for (load, slew), row in zip(load_slews, rows):
+            # Dictionary of the predicted delay, power, leakage and slew
+            sram_vals = {dname: predictions[dname][row] for dname in self.output_names}
             # Delay is only calculated on a single port and replicated for now.
             for port in self.all_ports:
                 port_data[port]['delay_lh'].append(sram_vals['rise_delay'])
@@ -113,41 +146,81 @@ class regression_model(simulation):
 
     def get_predictions(self, model_inputs, models):
         """
-        Generate a model and prediction for LIB output
+        Return the predictions of each LIB output for all rows of inputs
         """
 
         #Scaled the inputs using first data file as a reference
-        scaled_inputs = np.asarray([scale_input_datapoint(model_inputs, data_path)])
+        (maxs, mins) = self.data_scale
+        scaled_inputs = scale_points(model_inputs, maxs, mins)
 
         predictions = {}
-        out_pos = 0
-        for dname in self.output_names:
+        for out_pos, dname in enumerate(self.output_names):
             m = models[dname]
 
-            scaled_pred = self.model_prediction(m, scaled_inputs)
-            pred = unscale_data(scaled_pred.tolist(), data_path, pos=self.num_inputs+out_pos)
-            debug.info(2,"Unscaled Prediction = {}".format(pred))
-            predictions[dname] = pred[0]
-            out_pos+=1
+            scaled_pred = np.ravel(self.model_prediction(m, scaled_inputs))
+            pos = self.num_inputs + out_pos
+            pred = scaled_pred * (maxs[pos] - mins[pos]) + mins[pos]
+            debug.info(2,"Unscaled Predictions = {}".format(pred))
+            predictions[dname] = pred.tolist()
         return predictions
 
     def train_models(self):
         """
-        Generate and return models
+        Generate and return models. Models are only trained once for a data
+        file and model type. They are kept in memory and in the model store of
+        the cache for later runs.
         """
-        self.output_names = get_data_names(data_path)[self.num_inputs:]
+        key = self.get_model_key()
+        if key not in trained_models:
+            trained = char_cache.load("models", key, use_pickle=True)
+            if trained is None:
+                debug.info(1, "Training {} models.".format(type(self).__name__))
+                trained = self.fit_models()
+                char_cache.store("models", key, trained, use_pickle=True)
+            trained_models[key] = trained
+
+        trained = trained_models[key]
+        self.output_names = trained["output_names"]
+        self.data_scale = (trained["maxs"], trained["mins"])
+        return trained["models"]
+
+    def fit_models(self):
+        """
+        Train the models and return them with the output names and the
+        max/min values used to scale the data.
+        """
+        output_names = get_data_names(data_path)[self.num_inputs:]
         data = get_scaled_data(data_path)
         features, labels = data[:, :self.num_inputs], data[:,self.num_inputs:]
 
         output_num = 0
         models = {}
-        for o_name in self.output_names:
+        for o_name in output_names:
             output_label = labels[:,output_num]
             model = self.generate_model(features, output_label)
             models[o_name] = model
             output_num+=1
 
-        return models
+        maxs, mins, avgs = get_max_min_from_file(data_path)
+        return {"output_names": output_names,
+                "maxs": maxs,
+                "mins": mins,
+                "models": models}
+
+    def get_model_key(self):
+        """
+        Return the key of the models in the model store. The models depend on
+        the data file, the model type with its hyperparameters and the
+        version of scikit-learn.
+        """
+        import sklearn
+        params = sorted(self.get_model().get_params().items())
+        return char_cache.get_key(model_store_version,
+                                  char_cache.get_file_hash(data_path),
+                                  type(self).__name__,
+                                  repr(params),
+                                  self.num_inputs,
+                                  sklearn.__version__)
 
     def score_model(self):
         num_inputs = 9 #FIXME - should be defined somewhere else
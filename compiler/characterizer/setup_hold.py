@@ -5,12 +5,15 @@
 # (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 #
+import copy
 from openram import debug
 from openram.sram_factory import factory
 from openram import tech
 from openram import OPTS
 from .stimuli import *
+from .sim_job import *
 from .charutils import *
+from . import char_cache
 
 
 class setup_hold():
@@ -28,6 +31,8 @@ class setup_hold():
         debug.info(2, "Feasible period from technology file: {0} ".format(self.period))
 
         self.set_corner(corner)
+        # Simulations are written to the temp directory unless a workspace is set
+        self.workspace = None
 
     def set_corner(self, corner):
         """ Set the corner values """
@@ -35,20 +40,21 @@ class setup_hold():
         (self.process, self.vdd_voltage, self.temperature) = corner
         self.gnd_voltage = 0
 
-    def write_stimulus(self, mode, target_time, correct_value):
-        """Creates a stimulus file for SRAM setup/hold time calculation"""
-
-        # creates and opens the stimulus file for writing
-        self.stim_sp = "sh_stim.sp"
-        temp_stim = OPTS.openram_temp + self.stim_sp
-        self.sf = open(temp_stim, "w")
+    def write_stimulus(self, mode, target_time, correct_value, workspace=None):
+        """
+        Creates a stimulus file for SRAM setup/hold time calculation.
+        The simulation job is written to the temp directory unless a workspace is given.
+        """
 
-        # creates and opens the measure file for writing
-        self.meas_sp = "sh_meas.sp"
-        temp_meas = OPTS.openram_temp + self.meas_sp
-        self.mf = open(temp_meas, "w")
+        # creates the simulation job and opens its stimulus and measure files for writing
+        if workspace is None:
+            workspace = OPTS.openram_temp
+        self.job = sim_job("sh", self.corner, workspace)
+        self.sf = self.job.sf
+        self.mf = self.job.mf
+        temp_meas = self.job.meas_file()
 
-        self.stim = stimuli(self.sf, self.mf, self.corner)
+        self.stim = self.job.stim
 
         self.write_header(correct_value)
 
@@ -174,10 +180,10 @@ class setup_hold():
         # Initial check if reference feasible bound time passes for correct_value, if not, we can't start the search!
         self.write_stimulus(mode=mode,
                             target_time=feasible_bound,
-                            correct_value=correct_value)
-        self.stim.run_sim(self.stim_sp)
-        ideal_clk_to_q = convert_to_float(parse_spice_list("timing",
-                                                           "clk2q_delay"))
+                            correct_value=correct_value,
+                            workspace=self.workspace)
+        self.job.run()
+        ideal_clk_to_q = convert_to_float(self.job.parse("clk2q_delay"))
         # We use a 1/2 speed clock for some reason...
         setuphold_time = (feasible_bound - 2 * self.period)
         if mode == "SETUP": # SETUP is clk-din, not din-clk
@@ -208,7 +214,8 @@ class setup_hold():
             target_time = (feasible_bound + infeasible_bound) / 2
             self.write_stimulus(mode=mode,
                                 target_time=target_time,
-                                correct_value=correct_value)
+                                correct_value=correct_value,
+                                workspace=self.workspace)
 
             debug.info(2, "{0} value: {1} Target time: {2} Infeasible: {3} Feasible: {4}"
                            .format(mode,
@@ -217,8 +224,8 @@ class setup_hold():
                                    infeasible_bound,
                                    feasible_bound))
 
-            self.stim.run_sim(self.stim_sp)
-            clk_to_q = convert_to_float(parse_spice_list("timing", "clk2q_delay"))
+            self.job.run()
+            clk_to_q = convert_to_float(self.job.parse("clk2q_delay"))
             # We use a 1/2 speed clock for some reason...
             setuphold_time = (target_time - 2 * self.period)
             if mode == "SETUP": # SETUP is clk-din, not din-clk
@@ -287,30 +294,96 @@ class setup_hold():
                  # }
         # return times
 
-        for self.related_input_slew in related_slews:
-            for self.constrained_input_slew in constrained_slews:
-                debug.info(1, "Clock slew: {0} Data slew: {1}".format(self.related_input_slew,
-                                                                      self.constrained_input_slew))
-                LH_setup_time = self.setup_LH_time()
-                debug.info(1, "  Setup Time for low_to_high transition: {0}".format(LH_setup_time))
-                HL_setup_time = self.setup_HL_time()
-                debug.info(1, "  Setup Time for high_to_low transition: {0}".format(HL_setup_time))
-                LH_hold_time = self.hold_LH_time()
-                debug.info(1, "  Hold Time for low_to_high transition: {0}".format(LH_hold_time))
-                HL_hold_time = self.hold_HL_time()
-                debug.info(1, "  Hold Time for high_to_low transition: {0}".format(HL_hold_time))
-                LH_setup.append(LH_setup_time)
-                HL_setup.append(HL_setup_time)
-                LH_hold.append(LH_hold_time)
-                HL_hold.append(HL_hold_time)
+        # Reuse the times of the same DFF, corner and slews from a previous run
+        if OPTS.use_sim_cache:
+            cache_key = self.get_cache_key(related_slews, constrained_slews)
+            times = char_cache.load("setup_hold", cache_key)
+            if times:
+                debug.info(1, "Using cached setup/hold times.")
+                return times
+
+        if OPTS.num_threads > 1:
+            (LH_setup, HL_setup, LH_hold, HL_hold) = self.parallel_search(related_slews, constrained_slews)
+        else:
+            for self.related_input_slew in related_slews:
+                for self.constrained_input_slew in constrained_slews:
+                    debug.info(1, "Clock slew: {0} Data slew: {1}".format(self.related_input_slew,
+                                                                          self.constrained_input_slew))
+                    LH_setup_time = self.setup_LH_time()
+                    debug.info(1, "  Setup Time for low_to_high transition: {0}".format(LH_setup_time))
+                    HL_setup_time = self.setup_HL_time()
+                    debug.info(1, "  Setup Time for high_to_low transition: {0}".format(HL_setup_time))
+                    LH_hold_time = self.hold_LH_time()
+                    debug.info(1, "  Hold Time for low_to_high transition: {0}".format(LH_hold_time))
+                    HL_hold_time = self.hold_HL_time()
+                    debug.info(1, "  Hold Time for high_to_low transition: {0}".format(HL_hold_time))
+                    LH_setup.append(LH_setup_time)
+                    HL_setup.append(HL_setup_time)
+                    LH_hold.append(LH_hold_time)
+                    HL_hold.append(HL_hold_time)
 
         times = {"setup_times_LH": LH_setup,
                  "setup_times_HL": HL_setup,
                  "hold_times_LH": LH_hold,
                  "hold_times_HL": HL_hold
                  }
+        if OPTS.use_sim_cache:
+            char_cache.store("setup_hold", cache_key, times)
         return times
 
+    def parallel_search(self, related_slews, constrained_slews):
+        """
+        Run the setup and hold searches of all slew combinations at the same
+        time and return the lists of LH/HL setup and hold times.
+        """
+        # The searches in the order of the returned lists
+        searches = [(1, "SETUP"), (0, "SETUP"), (1, "HOLD"), (0, "HOLD")]
+        futures = []
+        for related_input_slew in related_slews:
+            for constrained_input_slew in constrained_slews:
+                for (correct_value, mode) in searches:
+                    futures.append(get_executor().submit(self.isolated_search,
+                                                         related_input_slew,
+                                                         constrained_input_slew,
+                                                         correct_value,
+                                                         mode))
+        times = [future.result() for future in futures]
+        return [times[i::len(searches)] for i in range(len(searches))]
+
+    def isolated_search(self, related_input_slew, constrained_input_slew, correct_value, mode):
+        """
+        Run a search with a copy of this object in a new workspace so that it
+        doesn't share any files with the other searches.
+        """
+        search = copy.copy(self)
+        search.related_input_slew = related_input_slew
+        search.constrained_input_slew = constrained_input_slew
+        search.workspace = new_workspace("sh")
+        time = search.bidir_search(correct_value, mode)
+        debug.info(1, "Clock slew: {0} Data slew: {1} {2} time for {3} value: {4}".format(related_input_slew,
+                                                                                         constrained_input_slew,
+                                                                                         mode,
+                                                                                         correct_value,
+                                                                                         time))
+        return time
+
+    def get_cache_key(self, related_slews, constrained_slews):
+        """
+        Return the cache key of the times. The times only depend on the DFF
+        netlist, the corner, the slews, the device models, the simulator and
+        the code that searches and measures them.
+        """
+        return char_cache.get_key(OPTS.tech_name,
+                                  char_cache.get_file_hash(self.dff.sp_file),
+                                  self.corner,
+                                  self.period,
+                                  related_slews,
+                                  constrained_slews,
+                                  get_model_version(self.process),
+                                  get_simulator_version(),
+                                  get_parser_version(),
+                                  char_cache.get_file_hash(__file__))
+
     def analytical_setuphold(self, related_slews, constrained_slews):
         """ Just return the fixed setup/hold times from the technology.
         """
@@ -0,0 +1,226 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+"""
+This file runs spice simulations as jobs. Each job has its own workspace
+directory so that several simulations can run at the same time.
+"""
+
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from openram import debug
+from openram import tech
+from openram import OPTS
+from .stimuli import stimuli
+from .charutils import spice_results
+from .raw_waveforms import raw_waveforms
+from . import char_cache
+
+# The simulators are separate processes, so threads are enough to wait for
+# them. The pid is saved since a forked process can't use the threads of its
+# parent.
+executor = None
+executor_pid = None
+
+# Increase this when the format of the cached measurements changes
+sim_cache_version = 1
+
+
+def get_executor():
+    """ Return the thread pool that runs the submitted jobs. """
+    global executor, executor_pid
+
+    if executor is None or executor_pid != os.getpid():
+        executor = ThreadPoolExecutor(max_workers=max(OPTS.num_threads, 1))
+        executor_pid = os.getpid()
+    return executor
+
+
+def get_simulator_version():
+    """
+    Return the name of the simulator with the size and modification time of
+    its executable, which change when another version is installed.
+    """
+
+    try:
+        st = os.stat(OPTS.spice_exe)
+    except (OSError, TypeError):
+        return (OPTS.spice_name, OPTS.spice_exe)
+    return (OPTS.spice_name, os.path.realpath(OPTS.spice_exe), st.st_size, st.st_mtime)
+
+
+def get_parser_version():
+    """
+    Return the version of the cached measurements and the hashes of the
+    code that parses and computes them, so that a change of the parsers
+    doesn't reuse measurements of the old ones.
+    """
+
+    modules = [sys.modules[c.__module__] for c in [spice_results, raw_waveforms, stimuli]]
+    return (sim_cache_version, [char_cache.get_file_hash(module.__file__) for module in modules])
+
+
+def get_model_version(process):
+    """
+    Return the hashes of the device model files and libraries of a process
+    corner with the library sections. Files that don't exist are kept by
+    their paths.
+    """
+
+    spice_name = (OPTS.spice_name or "ngspice").lower()
+
+    def get_hash(path):
+        path = path.replace("SIMULATOR", spice_name)
+        if os.path.isfile(path):
+            return char_cache.get_file_hash(path)
+        return path
+
+    libraries = [(get_hash(path), section) for (path, section) in tech.spice.get("fet_libraries", {}).get(process, [])]
+    models = [get_hash(path) for path in tech.spice.get("fet_models", {}).get(process, [])]
+    return (libraries, models)
+
+
+def new_workspace(name):
+    """ Create a unique workspace directory in the temp directory. """
+
+    return tempfile.mkdtemp(prefix="{}_".format(name), dir=OPTS.openram_temp)
+
+
+def run_jobs(jobs):
+    """
+    Run the jobs at the same time if multiple threads are enabled and wait
+    for all of them to finish.
+    """
+
+    if OPTS.num_threads > 1 and len(jobs) > 1:
+        futures = [job.submit() for job in jobs]
+        return [future.result() for future in futures]
+    return [job.run() for job in jobs]
+
+
+class sim_job():
+    """
+    A simulation job writes the stimulus and measure files of one
+    simulation to its workspace. The simulator configuration, stdout/stderr
+    logs and output listing are written to the same workspace, so jobs in
+    different workspaces don't overwrite each other's files.
+    """
+
+    def __init__(self, name, corner, workspace=None):
+        # Use a new workspace if none is given
+        if workspace is None:
+            workspace = new_workspace(name)
+        self.workspace = os.path.join(workspace, "")
+
+        self.stim_sp = "{}_stim.sp".format(name)
+        self.meas_sp = "{}_meas.sp".format(name)
+        self.sf = open(self.stim_file(), "w")
+        self.mf = open(self.meas_file(), "w")
+        self.stim = stimuli(self.sf, self.mf, corner, self.workspace)
+        self.results = None
+        # Whether the measurements were loaded from the cache without a
+        # simulation
+        self.cached = False
+
+    def stim_file(self):
+        """ Return the path of the stimulus file. """
+        return self.workspace + self.stim_sp
+
+    def meas_file(self):
+        """ Return the path of the measure file. """
+        return self.workspace + self.meas_sp
+
+    def close(self):
+        """ Close the stimulus and measure files. """
+        self.sf.close()
+        self.mf.close()
+
+    def run(self):
+        """
+        Run the simulation and wait for it to finish. The simulation is
+        skipped if the cache has the measurements of an identical one.
+        """
+        self.close()
+        self.results = None
+        self.cached = False
+        if OPTS.use_sim_cache:
+            cache_key = self.get_cache_key()
+            values = char_cache.load("sim", cache_key)
+            if values is not None:
+                debug.info(2, "Using cached measurements of {}".format(self.stim_file()))
+                self.results = spice_results(values=values)
+                self.cached = True
+                return self
+        self.stim.run_sim(self.stim_sp)
+        if OPTS.use_sim_cache:
+            char_cache.store("sim", cache_key, self.get_results().values)
+            char_cache.evict("sim", OPTS.sim_cache_size * 1024 * 1024)
+        return self
+
+    def submit(self):
+        """
+        Start the simulation in the background. The returned future gives
+        this job when the simulation is finished.
+        """
+        self.close()
+        return get_executor().submit(self.run)
+
+    def get_cache_key(self):
+        """
+        Return the cache key of the simulation. Included files are replaced
+        by the hashes of their contents since their paths depend on the
+        workspace. Libraries are identified by their paths and sections.
+        """
+        lines = []
+        with open(self.stim_file(), "r") as f:
+            for line in f:
+                words = line.split()
+                if len(words) > 1 and words[0].lower() == ".include":
+                    lines.append(char_cache.get_file_hash(words[1].strip("\"'")))
+                else:
+                    lines.append(line)
+        corner = (self.stim.process, self.stim.voltage, self.stim.temperature)
+        return char_cache.get_key(lines,
+                                  corner,
+                                  get_simulator_version(),
+                                  get_parser_version(),
+                                  OPTS.use_raw_waveforms)
+
+    def get_results(self):
+        """
+        Return the measurement results of the job. The output of the
+        simulator is only parsed the first time.
+        """
+        if self.results is None:
+            if OPTS.use_raw_waveforms:
+                values = self.stim.get_waveform_measures(self.get_waveforms())
+                self.results = spice_results(values=values)
+            else:
+                self.results = spice_results(self.workspace)
+        return self.results
+
+    def get_waveforms(self):
+        """
+        Return the waveforms that the simulator saved. New measurements can
+        be computed from them without another simulation. A job whose
+        measurements were loaded from the cache has no waveforms, so it is
+        simulated first.
+        """
+        raw_file = self.workspace + "timing.raw"
+        if self.cached and not os.path.exists(raw_file):
+            debug.info(2, "Simulating cached job for its waveforms: {}".format(self.stim_file()))
+            self.stim.run_sim(self.stim_sp)
+            self.cached = False
+        debug.check(os.path.exists(raw_file),
+                    "No waveforms saved by {0}. Set use_raw_waveforms to save them.".format(self.stim_file()))
+        return raw_waveforms(raw_file)
+
+    def parse(self, key):
+        """ Return the value of a measurement from the output of the job. """
+        return self.get_results().get(key)
@@ -22,7 +22,7 @@ from openram import OPTS
 class stimuli():
     """ Class for providing stimuli functions """
 
-    def __init__(self, stim_file, meas_file, corner):
+    def __init__(self, stim_file, meas_file, corner, workspace=None):
         self.vdd_name = "vdd"
         self.gnd_name = "gnd"
         self.pmos_name = tech.spice["pmos"]
@@ -32,6 +32,14 @@ class stimuli():
 
         self.sf = stim_file
         self.mf = meas_file
+        # The kind and inputs of each measurement indexed by its name, so the
+        # measurements can also be computed from saved waveforms
+        self.measures = {}
+        # The simulator configuration and outputs are written to the workspace
+        if workspace is None:
+            self.workspace = OPTS.openram_temp
+        else:
+            self.workspace = workspace
 
         (self.process, self.voltage, self.temperature) = corner
         found = False
@@ -181,6 +189,7 @@ class stimuli():
 
     def gen_meas_delay(self, meas_name, trig_name, targ_name, trig_val, targ_val, trig_dir, targ_dir, trig_td, targ_td):
         """ Creates the .meas statement for the measurement of delay """
+        self.add_measure(meas_name, "delay", trig_name, targ_name, trig_val, targ_val, trig_dir, targ_dir, trig_td, targ_td)
         measure_string=".meas tran {0} TRIG v({1}) VAL={2} {3}=1 TD={4}n TARG v({5}) VAL={6} {7}=1 TD={8}n\n\n"
         self.mf.write(measure_string.format(meas_name.lower(),
                                             trig_name,
@@ -194,6 +203,7 @@ class stimuli():
 
     def gen_meas_find_voltage(self, meas_name, trig_name, targ_name, trig_val, trig_dir, trig_td):
         """ Creates the .meas statement for the measurement of delay """
+        self.add_measure(meas_name, "voltage_when", trig_name, targ_name, trig_val, trig_dir, trig_td)
         measure_string=".meas tran {0} FIND v({1}) WHEN v({2})={3}v {4}=1 TD={5}n \n\n"
         self.mf.write(measure_string.format(meas_name.lower(),
                                             targ_name,
@@ -204,6 +214,7 @@ class stimuli():
 
     def gen_meas_find_voltage_at_time(self, meas_name, targ_name, time_at):
         """ Creates the .meas statement for voltage at time"""
+        self.add_measure(meas_name, "voltage_at", targ_name, time_at)
         measure_string=".meas tran {0} FIND v({1}) AT={2}n \n\n"
         self.mf.write(measure_string.format(meas_name.lower(),
                                             targ_name,
@@ -211,6 +222,7 @@ class stimuli():
 
     def gen_meas_power(self, meas_name, t_initial, t_final):
         """ Creates the .meas statement for the measurement of avg power """
+        self.add_measure(meas_name, "power", t_initial, t_final, self.vdd_name)
         # power mea cmd is different in different spice:
         if OPTS.spice_name == "hspice":
             power_exp = "power"
@@ -222,10 +234,30 @@ class stimuli():
                                                                             t_final))
 
     def gen_meas_value(self, meas_name, dout, t_initial, t_final):
+        self.add_measure(meas_name, "voltage_at", dout, (t_initial + t_final) / 2)
         measure_string=".meas tran {0} FIND v({1}) AT={2}n\n\n".format(meas_name.lower(), dout, (t_initial + t_final) / 2)
         # measure_string=".meas tran {0} AVG v({1}) FROM={2}n TO={3}n\n\n".format(meas_name.lower(), dout, t_initial, t_final)
         self.mf.write(measure_string)
 
+    def add_measure(self, meas_name, kind, *args):
+        """
+        Save the kind and inputs of a measurement. The kind is the name of
+        the function of raw_waveforms that computes it.
+        """
+        self.measures[meas_name.lower()] = (kind, args)
+
+    def get_waveform_measures(self, waveforms):
+        """
+        Compute the measurements from saved waveforms. Failed measurements
+        are left out like the ones that the simulators don't write.
+        """
+        values = {}
+        for (meas_name, (kind, args)) in self.measures.items():
+            value = waveforms.measure(kind, *args)
+            if value is not None:
+                values[meas_name] = value
+        return values
+
     def write_control(self, end_time, runlvl=4):
         """ Write the control cards to run and end the simulation """
 
@@ -340,20 +372,23 @@ class stimuli():
 
     def run_sim(self, name):
         """ Run hspice in batch mode and output rawfile to parse. """
-        temp_stim = "{0}{1}".format(OPTS.openram_temp, name)
+        temp_stim = "{0}{1}".format(self.workspace, name)
         import datetime
         start_time = datetime.datetime.now()
         debug.check(OPTS.spice_exe != "", "No spice simulator has been found.")
 
+        debug.check(not OPTS.use_raw_waveforms or OPTS.spice_name not in ["hspice", "xa"],
+                    "Raw waveforms are not supported with {}.".format(OPTS.spice_name))
+
         if OPTS.spice_name == "xa":
             # Output the xa configurations here. FIXME: Move this to write it once.
-            xa_cfg = open("{}xa.cfg".format(OPTS.openram_temp), "w")
+            xa_cfg = open("{}xa.cfg".format(self.workspace), "w")
             xa_cfg.write("set_sim_level -level 7\n")
             xa_cfg.write("set_powernet_level 7 -node vdd\n")
             xa_cfg.close()
             cmd = "{0} {1} -c {2}xa.cfg -o {2}xa -mt {3}".format(OPTS.spice_exe,
                                                                  temp_stim,
-                                                                 OPTS.openram_temp,
+                                                                 self.workspace,
                                                                  OPTS.num_sim_threads)
             valid_retcode=0
         elif OPTS.spice_name == "spectre":
@@ -361,9 +396,14 @@ class stimuli():
                 extra_options = " +dcopt +postlayout "
             else:
                 extra_options = ""
-            cmd = ("{0} -64 {1} -format psfbin -raw {2} {3} -maxwarnstolog 1000 "
+            if OPTS.use_raw_waveforms:
+                # nutbin is the binary SPICE3 raw format
+                raw_options = "-format nutbin -raw {0}timing.raw".format(self.workspace)
+            else:
+                raw_options = "-format psfbin -raw {0}".format(self.workspace)
+            cmd = ("{0} -64 {1} {2} {3} -maxwarnstolog 1000 "
                    " +mt={4} -maxnotestolog 1000 "
-                   .format(OPTS.spice_exe, temp_stim, OPTS.openram_temp, extra_options,
+                   .format(OPTS.spice_exe, temp_stim, raw_options, extra_options,
                            OPTS.num_sim_threads))
             valid_retcode = 0
         elif OPTS.spice_name == "hspice":
@@ -371,7 +411,7 @@ class stimuli():
             cmd = "{0} -mt {1} -i {2} -o {3}timing".format(OPTS.spice_exe,
                                                            OPTS.num_sim_threads,
                                                            temp_stim,
-                                                           OPTS.openram_temp)
+                                                           self.workspace)
             valid_retcode=0
         elif OPTS.spice_name in ["Xyce", "xyce"]:
             if OPTS.num_sim_threads > 1 and OPTS.mpi_name:
@@ -384,14 +424,14 @@ class stimuli():
             cmd = "{0} {1} -r {3}timing.raw -o {3}timing.lis {2}".format(mpi_cmd,
                                                                          OPTS.spice_exe,
                                                                          temp_stim,
-                                                                         OPTS.openram_temp)
+                                                                         self.workspace)
 
             valid_retcode=0
         else:
             # ngspice 27+ supports threading with "set num_threads=4" in the stimulus file or a .spiceinit
             # Measurements can't be made with a raw file set in ngspice
             # -r {2}timing.raw
-            ng_cfg = open("{}.spiceinit".format(OPTS.openram_temp), "w")
+            ng_cfg = open("{}.spiceinit".format(self.workspace), "w")
             ng_cfg.write("set num_threads={}\n".format(OPTS.num_sim_threads))
             ng_cfg.write("set ngbehavior=hsa\n")
             ng_cfg.write("set ng_nomodcheck\n")
@@ -399,12 +439,15 @@ class stimuli():
 
             cmd = "{0} -b -o {2}timing.lis {1}".format(OPTS.spice_exe,
                                                        temp_stim,
-                                                       OPTS.openram_temp)
+                                                       self.workspace)
+            # The measurements are computed from the raw file instead
+            if OPTS.use_raw_waveforms:
+                cmd += " -r {0}timing.raw".format(self.workspace)
             # for some reason, ngspice-25 returns 1 when it only has acceptable warnings
             valid_retcode=1
 
-        spice_stdout = open("{0}spice_stdout.log".format(OPTS.openram_temp), 'w')
-        spice_stderr = open("{0}spice_stderr.log".format(OPTS.openram_temp), 'w')
+        spice_stdout = open("{0}spice_stdout.log".format(self.workspace), 'w')
+        spice_stderr = open("{0}spice_stderr.log".format(self.workspace), 'w')
 
         # Wrap the command with conda activate & conda deactivate
         # FIXME: Should use verify/run_script.py here but run_script doesn't return
@@ -412,7 +455,14 @@ class stimuli():
         from openram import CONDA_HOME
         cmd = "/bin/bash -c 'source {0}/bin/activate && {1} && conda deactivate'".format(CONDA_HOME, cmd)
         debug.info(2, cmd)
-        proc = subprocess.run(cmd, stdout=spice_stdout, stderr=spice_stderr, shell=True)
+        # Run in the workspace so that ngspice finds its .spiceinit there
+        env = dict(os.environ, NGSPICE_INPUT_DIR=self.workspace)
+        proc = subprocess.run(cmd,
+                              stdout=spice_stdout,
+                              stderr=spice_stderr,
+                              shell=True,
+                              cwd=self.workspace,
+                              env=env)
 
         spice_stdout.close()
         spice_stderr.close()
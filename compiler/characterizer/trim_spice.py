@@ -10,6 +10,85 @@ from math import log, ceil
 from openram import debug
 
 
+class spice_subckt():
+    """
+    A subcircuit of a parsed netlist. The instances are indexed by the nets
+    they connect to so that the instances of a net are found with a lookup.
+    """
+
+    def __init__(self, name, header):
+        self.name = name
+        # The .SUBCKT statement
+        self.header = header
+        # The .ENDS statement
+        self.end = None
+        # Statements in the body
+        self.body = []
+        # Instance index of each statement in the body or None if it isn't
+        # an instance
+        self.body_insts = []
+        # Name of each instance
+        self.insts = []
+        # Indices of the instances connected to each net
+        self.net_insts = {}
+        # Indices of the instances connected to the port-indexed nets (like
+        # wl0_3) of each net without the port (like wl_3). It is made the
+        # first time it is needed.
+        self.port_net_insts = None
+
+    def add_statement(self, statement, words):
+        """ Add a statement of the body and index it if it is an instance. """
+
+        self.body.append(statement)
+        if not words or words[0][0] in "*.":
+            self.body_insts.append(None)
+            return
+        index = len(self.insts)
+        self.insts.append(words[0])
+        for net in self.get_nets(words):
+            self.net_insts.setdefault(net, []).append(index)
+        self.body_insts.append(index)
+
+    def get_nets(self, words):
+        """ Return the nets of an instance statement. """
+
+        kind = words[0][0].lower()
+        # Parameters aren't nets
+        words = [word for word in words[1:] if "=" not in word]
+        if kind == "x":
+            # The last word of a subcircuit instance is the subcircuit name
+            return words[:-1]
+        elif kind == "m":
+            # Drain, gate, source and body
+            return words[:4]
+        return words[:2]
+
+    def get_port_net_insts(self):
+        """ Return the instances of the port-indexed nets by the net without the port. """
+
+        if self.port_net_insts is None:
+            self.port_net_insts = {}
+            for (net, insts) in self.net_insts.items():
+                match = re.fullmatch(r"(\D+)\d+(_\d+)", net)
+                if match:
+                    self.port_net_insts.setdefault(match.group(1) + match.group(2), []).extend(insts)
+        return self.port_net_insts
+
+    def find_insts(self, nets, ports=False):
+        """
+        Return the indices of the instances connected to one of the nets.
+        If ports is true, the port-indexed nets (like wl0_3 of wl_3) are
+        included too.
+        """
+
+        insts = set()
+        for net in nets:
+            insts.update(self.net_insts.get(net, ()))
+            if ports:
+                insts.update(self.get_port_net_insts().get(net, ()))
+        return insts
+
+
 class trim_spice():
     """
     A utility to trim redundant parts of an SRAM spice netlist.
@@ -23,14 +102,50 @@ class trim_spice():
 
         debug.info(1,"Trimming non-critical cells to speed-up characterization: {}.".format(reduced_spfile))
 
-        # Load the file into a buffer for performance
-        sp = open(self.sp_file, "r")
-        self.spice = sp.readlines()
-        sp.close()
-        for i in range(len(self.spice)):
-            self.spice[i] = self.spice[i].rstrip(" \n")
+        # Parse the file once so that it can be trimmed for several addresses
+        self.parse()
 
-        self.sp_buffer = self.spice
+    def parse(self):
+        """
+        Parse the netlist into statements outside of subcircuits and
+        subcircuit objects. Continuation lines are kept with their statement.
+        """
+
+        # Statements outside of subcircuits and subcircuits in their order
+        self.items = []
+        # Subcircuits indexed by their lower case names
+        self.subckts = {}
+        subckt = None
+        for statement in self.get_statements():
+            words = statement.replace("\n+", " ").split()
+            keyword = words[0].lower() if words else ""
+            if keyword == ".subckt":
+                subckt = spice_subckt(words[1].lower(), statement)
+                self.items.append(subckt)
+                self.subckts[subckt.name] = subckt
+            elif keyword == ".ends" and subckt:
+                subckt.end = statement
+                subckt = None
+            elif subckt:
+                subckt.add_statement(statement, words)
+            else:
+                self.items.append(statement)
+
+    def get_statements(self):
+        """
+        Return each statement in the netlist as a string. The lines of
+        statements with continuation lines are joined by newlines.
+        """
+
+        statements = []
+        with open(self.sp_file, "r") as sp:
+            for line in sp:
+                line = line.rstrip(" \n")
+                if line.startswith("+") and statements:
+                    statements[-1] += "\n" + line
+                else:
+                    statements.append(line)
+        return statements
 
     def set_configuration(self, banks, rows, columns, word_size):
         """ Set the configuration of SRAM sizes that we are simulating.
@@ -47,14 +162,19 @@ class trim_spice():
         self.bank_addr_size = self.col_addr_size + self.row_addr_size
         self.addr_size = self.bank_addr_size + int(log(self.num_banks, 2))
 
-    def trim(self, address, data_bit):
+    def trim(self, address, data_bit, reduced_spfile=None):
         """
         Reduce the spice netlist but KEEP the given bits at the
         address (and things that will add capacitive load!)
+        The parsed netlist isn't changed, so it can be trimmed again for
+        another address.
         """
 
-        # Always start fresh if we do multiple reductions
-        self.sp_buffer = self.spice
+        if reduced_spfile is None:
+            reduced_spfile = self.reduced_spfile
+
+        # Indices of the removed instances of each subcircuit
+        self.removed_insts = {}
 
         # Split up the address and convert to an int
         wl_address = int(address[self.col_addr_size:], 2)
@@ -68,82 +188,72 @@ class trim_spice():
         bl_name = "bl_{}".format(int(self.words_per_row*data_bit + col_address))
 
         # Prepend info about the trimming
-        addr_msg = "Keeping {} address".format(address)
-        self.sp_buffer.insert(0, "* "+addr_msg)
-        debug.info(1,addr_msg)
-        data_msg = "Keeping {} data bit".format(data_bit)
-        self.sp_buffer.insert(0, "* "+data_msg)
-        debug.info(1,data_msg)
-        bl_msg = "Keeping {} (trimming other BLs)".format(bl_name)
+        header = ["* WARNING: This is a TRIMMED NETLIST.",
+                  "* It should NOT be used for LVS!!"]
         wl_msg = "Keeping {} (trimming other WLs)".format(wl_name)
-        self.sp_buffer.insert(0, "* "+bl_msg)
-        debug.info(1,bl_msg)
-        self.sp_buffer.insert(0, "* "+wl_msg)
+        header.append("* "+wl_msg)
         debug.info(1,wl_msg)
-        self.sp_buffer.insert(0, "* It should NOT be used for LVS!!")
-        self.sp_buffer.insert(0, "* WARNING: This is a TRIMMED NETLIST.")
-
-        wl_regex = r"wl\d*_{}".format(wl_address)
-        bl_regex = r"bl\d*_{}".format(int(self.words_per_row*data_bit + col_address))
-        bl_no_port_regex = r"bl_{}".format(int(self.words_per_row*data_bit + col_address))
+        bl_msg = "Keeping {} (trimming other BLs)".format(bl_name)
+        header.append("* "+bl_msg)
+        debug.info(1,bl_msg)
+        data_msg = "Keeping {} data bit".format(data_bit)
+        header.append("* "+data_msg)
+        debug.info(1,data_msg)
+        addr_msg = "Keeping {} address".format(address)
+        header.append("* "+addr_msg)
+        debug.info(1,addr_msg)
 
-        self.remove_insts("bitcell_array",[wl_regex,bl_regex])
+        self.remove_insts("bitcell_array", [wl_name, bl_name], ports=True)
 
         # 2. Keep sense amps basd on BL
-        self.remove_insts("sense_amp_array",[bl_no_port_regex])
+        self.remove_insts("sense_amp_array", [bl_name])
 
         # 3. Keep column muxes basd on BL
-        self.remove_insts("single_level_column_mux_array", [bl_no_port_regex])
+        self.remove_insts("single_level_column_mux_array", [bl_name])
 
         # 4. Keep write driver based on DATA
-        data_regex = r"data_{}".format(data_bit)
-        self.remove_insts("write_driver_array", [data_regex])
+        data_name = "data_{}".format(data_bit)
+        self.remove_insts("write_driver_array", [data_name])
 
         # 5. Keep wordline driver based on WL
         # Need to keep the gater too
-        #self.remove_insts("wordline_driver",wl_regex)
+        #self.remove_insts("wordline_driver", [wl_name], ports=True)
 
         # 6. Keep precharges based on BL
-        self.remove_insts("precharge_array",[bl_regex])
+        self.remove_insts("precharge_array", [bl_name], ports=True)
 
         # Everything else isn't worth removing. :)
 
-        # Finally, write out the buffer as the new reduced file
-        sp = open(self.reduced_spfile, "w")
-        sp.write("\n".join(self.sp_buffer))
-        sp.close()
+        # Finally, write out the reduced netlist
+        self.write(reduced_spfile, header)
 
-    def remove_insts(self, subckt_name, keep_inst_list):
-        """This will remove all of the instances in the list from the named
-        subckt that DO NOT contain a term in the list.  It just does a
-        match of the line with a term so you can search for a single
-        net connection, the instance name, anything..
+    def remove_insts(self, subckt_name, keep_net_list, ports=False):
+        """This will remove all of the instances from the subckts whose
+        names start with the given name that are NOT connected to a net
+        in the list. If ports is true, instances connected to the
+        port-indexed nets (like wl0_3 of wl_3) are kept too.
         """
-        removed_insts = 0
-        # Expects keep_inst_list are regex patterns. Compile them here.
-        compiled_patterns = [re.compile(pattern) for pattern in keep_inst_list]
-
-        start_name = ".SUBCKT {}".format(subckt_name)
-        end_name = ".ENDS {}".format(subckt_name)
-
-        in_subckt=False
-        new_buffer=[]
-        for line in self.sp_buffer:
-            if start_name in line:
-                new_buffer.append(line)
-                in_subckt=True
-            elif end_name in line:
-                new_buffer.append(line)
-                in_subckt=False
-            elif in_subckt:
-                removed_insts += 1
-                for pattern in compiled_patterns:
-                    if pattern.search(line) != None:
-                        new_buffer.append(line)
-                        removed_insts -= 1
-                        break
-            else:
-                new_buffer.append(line)
+        for subckt in self.subckts.values():
+            if not subckt.name.startswith(subckt_name.lower()):
+                continue
+            keep_insts = subckt.find_insts(keep_net_list, ports)
+            removed = set(range(len(subckt.insts))) - keep_insts
+            self.removed_insts.setdefault(subckt.name, set()).update(removed)
+            debug.info(2, "Removed {} instances from {} subcircuit.".format(len(removed), subckt.name))
+
+    def write(self, reduced_spfile, header):
+        """ Write the netlist without the removed instances. """
 
-        self.sp_buffer = new_buffer
-        debug.info(2, "Removed {} instances from {} subcircuit.".format(removed_insts, subckt_name))
+        with open(reduced_spfile, "w") as sp:
+            sp.write("\n".join(header))
+            for item in self.items:
+                if isinstance(item, spice_subckt):
+                    removed = self.removed_insts.get(item.name, ())
+                    sp.write("\n" + item.header)
+                    for (statement, index) in zip(item.body, item.body_insts):
+                        if index not in removed:
+                            sp.write("\n" + statement)
+                    if item.end is not None:
+                        sp.write("\n" + item.end)
+                else:
+                    sp.write("\n" + item)
@@ -0,0 +1,315 @@
+import mmap
+import struct
+import numpy as np
+from .gdsPrimitives import *
+from .gds2reader import Gds2reader
+
+# Record types (record id and data type packed into one 16 bit word)
+HEADER    = 0x0002
+BGNLIB    = 0x0102
+LIBNAME   = 0x0206
+UNITS     = 0x0305
+ENDLIB    = 0x0400
+BGNSTR    = 0x0502
+STRNAME   = 0x0606
+ENDSTR    = 0x0700
+BOUNDARY  = 0x0800
+PATH      = 0x0900
+SREF      = 0x0A00
+AREF      = 0x0B00
+TEXT      = 0x0C00
+LAYER     = 0x0D02
+DATATYPE  = 0x0E02
+WIDTH     = 0x0F03
+XY        = 0x1003
+ENDEL     = 0x1100
+SNAME     = 0x1206
+COLROW    = 0x1302
+STRANS    = 0x1A01
+MAG       = 0x1B05
+ANGLE     = 0x1C05
+REFLIBS   = 0x1F06
+FONTS     = 0x2006
+PATHTYPE  = 0x2102
+GENERATIONS = 0x2202
+ATTRTABLE = 0x2306
+TEXTTYPE  = 0x1602
+STRING    = 0x1906
+NODE      = 0x1500
+ELFLAGS   = 0x2601
+NODETYPE  = 0x2A02
+# Gds2reader and Gds2writer start a box element with 0x2E02
+# and store the box type in 0x2D00, so keep the same convention
+BOXTYPE   = 0x2D00
+BOX       = 0x2E02
+PLEX      = 0x2F03
+FORMAT    = 0x3602
+MASK      = 0x3706
+
+_header = struct.Struct(">HH")
+_short = struct.Struct(">h")
+_ushort = struct.Struct(">H")
+_int = struct.Struct(">i")
+
+
+class Gds2mmapReader(Gds2reader):
+    """
+    Class to read in a file in GDSII format and populate a layout class with it.
+    This is a drop-in replacement for Gds2reader that memory-maps the file,
+    scans all of the record headers in a single pass and decodes the XY
+    records in bulk with NumPy instead of unpacking one coordinate at a time.
+    """
+
+    def __init__(self,layoutObject):
+        Gds2reader.__init__(self, layoutObject)
+        self.data = None
+        self.coordinates = None
+
+    def scanRecords(self):
+        """
+        Walk the mapped file once and return a list of
+        (record type, data offset, data length) tuples.
+        The record header is not included in the data.
+        """
+        records = []
+        append = records.append
+        unpack_from = _header.unpack_from
+        data = self.data
+        size = len(data)
+        offset = 0
+        while offset + 4 <= size:
+            (recordLength, recordType) = unpack_from(data, offset)
+            # Some writers pad the end of the file with zeros
+            if recordLength < 4:
+                break
+            append((recordType, offset + 4, recordLength - 4))
+            offset += recordLength
+            if recordType == ENDLIB:
+                break
+        return records
+
+    def readShort(self, offset):
+        return _short.unpack_from(self.data, offset)[0]
+
+    def readInt(self, offset):
+        return _int.unpack_from(self.data, offset)[0]
+
+    def readDouble(self, offset):
+        return self.ieeeDoubleFromIbmData(self.data[offset:offset + 8])
+
+    def readString(self, offset, length):
+        return self.stripNonASCII(self.data[offset:offset + length])
+
+    def readShorts(self, offset, length):
+        return struct.unpack_from(">{}h".format(length // 2), self.data, offset)
+
+    def decodeXY(self, records):
+        """
+        Decode every XY record in the file with a single NumPy gather and
+        return a list of coordinate lists in file order.
+        """
+        xyRecords = np.array([(offset, length) for (recordType, offset, length) in records if recordType == XY],
+                             dtype=np.int64).reshape(-1, 2)
+        if len(xyRecords) == 0:
+            return []
+        (offsets, lengths) = (xyRecords[:, 0], xyRecords[:, 1])
+        # Byte index of every XY byte in the file, record after record
+        starts = np.cumsum(lengths) - lengths
+        byteIndex = np.arange(lengths.sum()) + np.repeat(offsets - starts, lengths)
+        fileBytes = np.frombuffer(self.data, dtype=np.uint8)
+        xy = fileBytes[byteIndex].view(">i4").astype(np.int32).tolist()
+        del fileBytes
+        coordinates = []
+        start = 0
+        for length in (lengths // 4).tolist():
+            end = start + length
+            coordinates.append(list(zip(xy[start:end:2], xy[start + 1:end:2])))
+            start = end
+        return coordinates
+
+    def readTransFlags(self, offset):
+        transFlags = _ushort.unpack_from(self.data, offset)[0]
+        mirrorFlag = bool(transFlags&0x8000)
+        rotateFlag = bool(transFlags&0x0002)
+        magnifyFlag = bool(transFlags&0x0004)
+        return [mirrorFlag,magnifyFlag,rotateFlag]
+
+    def readHeader(self, records):
+        """ Read the library header and return the index of the first structure record. """
+        self.layoutObject.info.clear()
+        info = self.layoutObject.info
+        (recordType, offset, length) = records[0]
+        if recordType != HEADER or length != 2:
+            print("Invalid GDSII Header")
+            return -1
+        info["gdsVersion"] = self.readShort(offset)
+
+        # read records until we hit the UNITS section... this is the last part of the header
+        for index in range(1, len(records)):
+            (recordType, offset, length) = records[index]
+            if recordType == BGNLIB and length == 24:
+                info["dates"] = self.readShorts(offset, length)
+            elif recordType == LIBNAME:
+                info["libraryName"] = self.data[offset:offset + length].decode("utf-8")
+            elif recordType == REFLIBS:
+                info["referenceLibraries"] = (self.data[offset:offset + 44],
+                                              self.data[offset + 45:offset + 89])
+            elif recordType == FONTS:
+                info["fonts"] = (self.data[offset:offset + 43],
+                                 self.data[offset + 44:offset + 87],
+                                 self.data[offset + 88:offset + 131],
+                                 self.data[offset + 132:offset + 175])
+            elif recordType == ATTRTABLE:
+                info["attributeTable"] = self.data[offset:offset + 43]
+            elif recordType == GENERATIONS:
+                info["generations"] = (self.readShort(offset),)
+            elif recordType == FORMAT:
+                info["fileFormat"] = (self.readShort(offset),)
+            elif recordType == MASK:
+                info["mask"] = self.data[offset:offset + length]
+            elif recordType == UNITS:
+                userUnits = self.readDouble(offset)
+                dbUnits = self.readDouble(offset + 8)
+                info["units"] = (userUnits, dbUnits)
+                return index + 1
+        print("There was an error parsing the GDS header.  Aborting...")
+        return -1
+
+    def readElement(self, thisElement, records, index):
+        """
+        Fill in the fields of an element from its records
+        and return the index of the ENDEL record.
+        """
+        elementClass = type(thisElement)
+        layerNumbersInUse = self.layoutObject.layerNumbersInUse
+        while True:
+            (recordType, offset, length) = records[index]
+            if recordType == ENDEL:
+                return index
+            elif recordType == XY:
+                coordinates = next(self.coordinates)
+                if elementClass == GdsSref:
+                    thisElement.coordinates = coordinates[0]
+                elif elementClass == GdsAref:
+                    thisElement.coordinates = coordinates[0:3]
+                elif elementClass == GdsText:
+                    thisElement.coordinates = coordinates[0:1]
+                else:
+                    thisElement.coordinates = coordinates
+            elif recordType == LAYER:
+                drawingLayer = self.readShort(offset)
+                thisElement.drawingLayer = drawingLayer
+                if drawingLayer not in layerNumbersInUse:
+                    layerNumbersInUse.append(drawingLayer)
+            elif recordType == DATATYPE:
+                # The boundary datatype is used as the purpose
+                if elementClass == GdsBoundary:
+                    thisElement.purposeLayer = self.readShort(offset)
+                elif elementClass == GdsPath:
+                    thisElement.dataType = self.readShort(offset)
+            elif recordType == TEXTTYPE:
+                thisElement.purposeLayer = self.readShort(offset)
+            elif recordType == ELFLAGS:
+                thisElement.elementFlags = self.readShort(offset)
+            elif recordType == PLEX:
+                thisElement.plex = self.readInt(offset)
+            elif recordType == PATHTYPE:
+                thisElement.pathType = self.readShort(offset)
+            elif recordType == WIDTH:
+                thisElement.pathWidth = self.readInt(offset)
+            elif recordType == SNAME:
+                if elementClass == GdsAref:
+                    thisElement.aName = self.readString(offset, length).rstrip()
+                else:
+                    thisElement.sName = self.readString(offset, length).rstrip()
+            elif recordType == COLROW:
+                thisElement.columns = self.readShort(offset)
+                thisElement.rows = self.readShort(offset + 2)
+            elif recordType == STRANS:
+                thisElement.transFlags = self.readTransFlags(offset)
+            elif recordType == MAG:
+                thisElement.magFactor = self.readDouble(offset)
+            elif recordType == ANGLE:
+                thisElement.rotateAngle = self.readDouble(offset)
+            elif recordType == STRING:
+                thisElement.textString = self.data[offset:offset + length].decode("utf-8")
+            elif recordType == NODETYPE:
+                thisElement.nodeType = self.readShort(offset)
+            elif recordType == BOXTYPE:
+                thisElement.boxValue = self.readShort(offset)
+            index += 1
+
+    def readStructure(self, records, index):
+        """ Read a structure starting at its BGNSTR record and return the index of its ENDSTR. """
+        thisStructure = GdsStructure()
+        (recordType, offset, length) = records[index]
+        dates = self.readShorts(offset, length)
+        thisStructure.createDate = dates[0:6]
+        thisStructure.modDate = dates[6:12]
+        index += 1
+        while True:
+            (recordType, offset, length) = records[index]
+            if recordType == ENDSTR:
+                break
+            elif recordType == STRNAME:
+                thisStructure.name = self.readString(offset, length)
+            elif recordType == BOUNDARY:
+                thisElement = GdsBoundary()
+                thisStructure.boundaries.append(thisElement)
+                index = self.readElement(thisElement, records, index + 1)
+            elif recordType == PATH:
+                thisElement = GdsPath()
+                thisStructure.paths.append(thisElement)
+                index = self.readElement(thisElement, records, index + 1)
+            elif recordType == SREF:
+                thisElement = GdsSref()
+                thisStructure.srefs.append(thisElement)
+                index = self.readElement(thisElement, records, index + 1)
+            elif recordType == AREF:
+                thisElement = GdsAref()
+                thisStructure.arefs.append(thisElement)
+                index = self.readElement(thisElement, records, index + 1)
+            elif recordType == TEXT:
+                thisElement = GdsText()
+                thisStructure.texts.append(thisElement)
+                index = self.readElement(thisElement, records, index + 1)
+            elif recordType == BOX:
+                thisElement = GdsBox()
+                thisStructure.boxes.append(thisElement)
+                index = self.readElement(thisElement, records, index + 1)
+            elif recordType == NODE:
+                thisElement = GdsNode()
+                thisStructure.nodes.append(thisElement)
+                index = self.readElement(thisElement, records, index + 1)
+            index += 1
+        self.layoutObject.structures[thisStructure.name] = thisStructure
+        return index
+
+    def readGds2(self):
+        records = self.scanRecords()
+        if len(records) == 0:
+            print("There was an error parsing the GDS header.  Aborting...")
+            return
+        index = self.readHeader(records)
+        if index < 0:
+            return
+        self.coordinates = iter(self.decodeXY(records))
+        try:
+            while records[index][0] == BGNSTR:
+                index = self.readStructure(records, index) + 1
+        except IndexError:
+            print("There was an error reading the structure list.")
+            return
+        if records[index][0] != ENDLIB:
+            print("There was an error reading the structure list.")
+
+    def loadFromFile(self, fileName, special_purposes={}):
+        with open(fileName, "rb") as self.fileHandle:
+            self.data = mmap.mmap(self.fileHandle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self.readGds2()
+            finally:
+                self.data.close()
+                self.data = None
+                self.coordinates = None
+        self.layoutObject.initialize(special_purposes)
@@ -354,8 +354,8 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print("\t\tPLEX: "+str(plex))
             elif(idBits==b'\x12\x06'):  #Reference Name
-                aName = record[2::]
-                thisAref.aName=aName
+                aName = self.stripNonASCII(record[2::])
+                thisAref.aName=aName.rstrip()
                 if(self.debugToTerminal==1):
                     print("\t\tReference Name:"+aName)
             elif(idBits==b'\x1A\x01'):  #Transformation
@@ -378,17 +378,25 @@ class Gds2reader:
                 thisAref.rotateAngle=rotateAngle
                 if(self.debugToTerminal==1):
                     print("\t\t\tRotate Angle (CCW):"+str(rotateAngle))
+            elif(idBits==b'\x13\x02'):  #Columns and Rows
+                (columns, rows) = struct.unpack(">hh",record[2:6])
+                thisAref.columns=columns
+                thisAref.rows=rows
+                if(self.debugToTerminal==1):
+                    print("\t\t\tColumns: "+str(columns)+" Rows: "+str(rows))
             elif(idBits==b'\x10\x03'):  #XY Data Points
                 index=2
-                topLeftX=struct.unpack(">i",record[index:index+4])[0]
-                topLeftY=struct.unpack(">i",record[index+4:index+8])[0]
-                rightMostX=struct.unpack(">i",record[index+8:index+12])[0]
-                bottomMostY=struct.unpack(">i",record[index+12:index+16])[0]
-                thisAref.coordinates=[(topLeftX,topLeftY),(rightMostX,topLeftY),(topLeftX,bottomMostY)]
-                if(self.debugToTerminal==1):
-                    print("\t\t\tTop Left Point: "+str(topLeftX)+","+str(topLeftY))
-                    print("\t\t\t\tArray Width: "+str(rightMostX-topLeftX))
-                    print("\t\t\t\tArray Height: "+str(topLeftY-bottomMostY))
+                coordinates=[]
+                for point in range(3):
+                    x=struct.unpack(">i",record[index:index+4])[0]
+                    y=struct.unpack(">i",record[index+4:index+8])[0]
+                    coordinates.append((x,y))
+                    index+=8
+                thisAref.coordinates=coordinates
+                if(self.debugToTerminal==1):
+                    print("\t\t\tOrigin: "+str(coordinates[0]))
+                    print("\t\t\t\tColumn Displacement: "+str(coordinates[1]))
+                    print("\t\t\t\tRow Displacement: "+str(coordinates[2]))
             elif(idBits==b'\x11\x00'):  #End Of Element
                 if(self.debugToTerminal==1):
                     print("\t\t\tEndAref")
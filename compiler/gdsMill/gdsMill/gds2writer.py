@@ -1,15 +1,30 @@
 #!/usr/bin/env python
+import gzip
 import struct
+import numpy as np
 from .gdsPrimitives import *
 
+_recordLength = struct.Struct(">h")
+
 class Gds2writer:
-    """Class to take a populated layout class and write it to a file in GDSII format"""
+    """
+    Class to take a populated layout class and write it to a file in GDSII format.
+    The records of a structure are packed into a buffer that is written to the
+    file at the end of the structure, so structures can also be streamed one at
+    a time with openFile, writeStructure and closeFile without keeping the
+    whole layout in memory.
+    """
     ## Based on info from http://www.rulabinsky.com/cavd/text/chapc.html
 
-    def __init__(self,layoutObject):
+    def __init__(self,layoutObject,bufferSize=1<<20):
         self.fileHandle = 0
         self.layoutObject = layoutObject
         self.debugToTerminal=0  #do we dump debug data to the screen
+        self.bufferSize = bufferSize
+        # records that haven't been written to the file yet
+        self.recordBuffer = bytearray()
+        # names of the structures that are already in the file
+        self.writtenStructures = set()
 
     def print64AsBinary(self,number):
         #debugging method for binary inspection
@@ -93,8 +108,21 @@ class Gds2writer:
 
     def writeRecord(self,record):
         recordLength = len(record)+2  #make sure to include this in the length
-        recordLengthAscii=struct.pack(">h",recordLength)
-        self.fileHandle.write(recordLengthAscii+record)
+        self.recordBuffer += _recordLength.pack(recordLength)
+        self.recordBuffer += record
+
+    def flushRecords(self):
+        """Write the buffered records to the file"""
+        self.fileHandle.write(self.recordBuffer)
+        self.recordBuffer = bytearray()
+
+    def packCoordinates(self,coordinates):
+        """
+        Pack a list of (x,y) coordinates (or a single one) as big-endian
+        4 byte integers in one conversion. Like int(), the values are
+        truncated towards zero.
+        """
+        return np.asarray(coordinates, dtype=np.float64).astype(">i4").tobytes()
 
     def writeHeader(self):
         ##  Header
@@ -206,13 +234,7 @@ class Gds2writer:
             self.writeRecord(idBits+dataType)
         if(thisBoundary.coordinates!=""):
             idBits=b'\x10\x03' # XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisBoundary.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisBoundary.coordinates))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -250,13 +272,7 @@ class Gds2writer:
             self.writeRecord(idBits+pathWidth)
         if(thisPath.coordinates):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisPath.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisPath.coordinates))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -301,14 +317,7 @@ class Gds2writer:
             self.writeRecord(idBits+rotateAngle)
         if(thisSref.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            coordinate = thisSref.coordinates
-            x=struct.pack(">i",int(coordinate[0]))
-            y=struct.pack(">i",int(coordinate[1]))
-            coordinateRecord+=x
-            coordinateRecord+=y
-	    #print(thisSref.coordinates)
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisSref.coordinates))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -330,7 +339,7 @@ class Gds2writer:
                 aName = thisAref.aName+"\0"
             else:
                 aName = thisAref.aName
-            self.writeRecord(idBits+aName)
+            self.writeRecord(idBits+aName.encode())
         if(thisAref.transFlags):
             idBits=b'\x1A\x01'
             mirrorFlag = int(thisAref.transFlags[0])<<15
@@ -351,15 +360,13 @@ class Gds2writer:
             idBits=b'\x1C\x05'
             rotateAngle=self.ibmDataFromIeeeDouble(thisAref.rotateAngle)
             self.writeRecord(idBits+rotateAngle)
+        if(thisAref.columns!=""):
+            idBits=b'\x13\x02' #COLROW
+            colRow = struct.pack(">hh",thisAref.columns,thisAref.rows)
+            self.writeRecord(idBits+colRow)
         if(thisAref.coordinates):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisAref.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisAref.coordinates))
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
@@ -419,13 +426,7 @@ class Gds2writer:
             self.writeRecord(idBits+transFlags)
         if(thisText.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisText.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisText.coordinates))
         if(thisText.textString):
             idBits=b'\x19\x06'
             textString = thisText.textString
@@ -454,15 +455,9 @@ class Gds2writer:
             idBits=b'\x2A\x02'
             nodeType = struct.pack(">h",thisNode.nodeType)
             self.writeRecord(idBits+nodeType)
-        if(thisText.coordinates!=""):
+        if(thisNode.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisText.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisNode.coordinates))
 
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
@@ -493,36 +488,28 @@ class Gds2writer:
             self.writeRecord(idBits+boxValue)
         if(thisBox.coordinates!=""):
             idBits=b'\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisBox.coordinates:
-                x=struct.pack(">i",int(coordinate[0]))
-                y=struct.pack(">i",int(coordinate[1]))
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            self.writeRecord(idBits+self.packCoordinates(thisBox.coordinates))
 
         idBits=b'\x11\x00' #End Of Element
         coordinateRecord = idBits
         self.writeRecord(coordinateRecord)
 
     def writeNextStructure(self,structureName):
+        self.writeStructure(structureName,self.layoutObject.structures[structureName])
+
+    def writeStructure(self,structureName,thisStructure):
+        """
+        Write a structure to the file unless a structure with the same name
+        was already written.
+        """
+        if structureName.rstrip("\x00") in self.writtenStructures:
+            return
+        self.writtenStructures.add(structureName.rstrip("\x00"))
         #first put in the structure head
-        thisStructure = self.layoutObject.structures[structureName]
         idBits=b'\x05\x02'
-        createYear = struct.pack(">h",thisStructure.createDate[0])
-        createMonth = struct.pack(">h",thisStructure.createDate[1])
-        createDay = struct.pack(">h",thisStructure.createDate[2])
-        createHour = struct.pack(">h",thisStructure.createDate[3])
-        createMinute = struct.pack(">h",thisStructure.createDate[4])
-        createSecond = struct.pack(">h",thisStructure.createDate[5])
-        modYear = struct.pack(">h",thisStructure.modDate[0])
-        modMonth = struct.pack(">h",thisStructure.modDate[1])
-        modDay = struct.pack(">h",thisStructure.modDate[2])
-        modHour = struct.pack(">h",thisStructure.modDate[3])
-        modMinute = struct.pack(">h",thisStructure.modDate[4])
-        modSecond = struct.pack(">h",thisStructure.modDate[5])
-        self.writeRecord(idBits+createYear+createMonth+createDay+createHour+createMinute+createSecond\
-                         +modYear+modMonth+modDay+modHour+modMinute+modSecond)
+        createDate = struct.pack(">6h",*thisStructure.createDate[0:6])
+        modDate = struct.pack(">6h",*thisStructure.modDate[0:6])
+        self.writeRecord(idBits+createDate+modDate)
         #now the structure name
         idBits=b'\x06\x06'
         ##caveat: the name needs to be an EVEN number of characters
@@ -549,17 +536,49 @@ class Gds2writer:
         #put in the structure tail
         idBits=b'\x07\x00'
         self.writeRecord(idBits)
+        self.flushRecords()
+
+    def hasStructure(self,structureName):
+        """Check if a structure was already written"""
+        return structureName.rstrip("\x00") in self.writtenStructures
+
+    def writeLayout(self,layoutObject):
+        """Write the structures of a layout that weren't already written"""
+        for structureName in layoutObject.structures:
+            self.writeStructure(structureName,layoutObject.structures[structureName])
 
     def writeGds2(self):
         self.writeHeader();  #first, put the header in
         #go through each structure in the layout and write it to the file
-        for structureName in self.layoutObject.structures:
-            self.writeNextStructure(structureName)
+        self.writeLayout(self.layoutObject)
         #at the end, put in the END LIB record
         idBits=b'\x04\x00'
         self.writeRecord(idBits)
+        self.flushRecords()
+
+    def openFile(self,fileName,compress=None):
+        """
+        Open a file and write the header of the layout object. The file is
+        gzip compressed if compress is set or if the name ends with .gz.
+        """
+        if compress is None:
+            compress = fileName.endswith(".gz")
+        if compress:
+            self.fileHandle = gzip.open(fileName,"wb",compresslevel=6)
+        else:
+            self.fileHandle = open(fileName,"wb",buffering=self.bufferSize)
+        self.writtenStructures = set()
+        self.writeHeader()
+        self.flushRecords()
 
-    def writeToFile(self,fileName):
-        self.fileHandle = open(fileName,"wb")
-        self.writeGds2()
+    def closeFile(self):
+        """Write the end of the library and close the file"""
+        idBits=b'\x04\x00'
+        self.writeRecord(idBits)
+        self.flushRecords()
         self.fileHandle.close()
+
+    def writeToFile(self,fileName,compress=None):
+        self.openFile(fileName,compress)
+        self.writeLayout(self.layoutObject)
+        self.closeFile()
@@ -136,6 +136,10 @@ class GdsAref:
         self.transFlags=[0,0,0]
         self.magFactor=""
         self.rotateAngle=""
+        self.columns=""
+        self.rows=""
+        # The origin, the origin displaced by all the columns and
+        # the origin displaced by all the rows
         self.coordinates=""
 
         
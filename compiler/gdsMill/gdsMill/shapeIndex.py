@@ -0,0 +1,109 @@
+import math
+import numpy as np
+
+
+class ShapeIndex:
+    """
+    Uniform grid index over an array of rectangles in (llx, lly, urx, ury) format.
+    Every rectangle is stored in each bin that it touches so that a region
+    query only has to look at the bins that overlap the region.
+    """
+
+    def __init__(self, rects):
+        self.rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        count = len(self.rects)
+        if count == 0:
+            self.bins = 0
+            return
+        self.ll = self.rects[:, 0:2].min(axis=0)
+        ur = self.rects[:, 2:4].max(axis=0)
+        # Aim for roughly one rectangle per bin
+        self.bins = max(1, int(math.sqrt(count)))
+        self.pitch = np.maximum((ur - self.ll) / self.bins, 1e-9)
+        lo = self.binOf(self.rects[:, 0:2])
+        hi = self.binOf(self.rects[:, 2:4])
+        # Expand every rectangle into the bins that it covers
+        widths = hi[:, 0] - lo[:, 0] + 1
+        counts = widths * (hi[:, 1] - lo[:, 1] + 1)
+        ids = np.repeat(np.arange(count), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        widths = np.repeat(widths, counts)
+        binX = np.repeat(lo[:, 0], counts) + offsets % widths
+        binY = np.repeat(lo[:, 1], counts) + offsets // widths
+        cells = binY * self.bins + binX
+        order = np.argsort(cells, kind="stable")
+        self.ids = ids[order]
+        self.starts = np.searchsorted(cells[order], np.arange(self.bins * self.bins + 1))
+
+    def __len__(self):
+        return len(self.rects)
+
+    def binOf(self, points):
+        """ Return the (x, y) bin of each point clipped to the grid. """
+        bins = np.floor((np.asarray(points, dtype=np.float64) - self.ll) / self.pitch).astype(np.int64)
+        return np.clip(bins, 0, self.bins - 1)
+
+    def candidates(self, ll, ur):
+        """ Return the sorted unique ids of rectangles in the bins overlapping a region. """
+        if self.bins == 0:
+            return np.zeros(0, dtype=np.int64)
+        (lo, hi) = self.binOf([ll, ur])
+        # The bins of a row in the region are contiguous in the index
+        slices = [self.ids[self.starts[y * self.bins + lo[0]]:self.starts[y * self.bins + hi[0] + 1]]
+                  for y in range(lo[1], hi[1] + 1)]
+        return np.unique(np.concatenate(slices))
+
+    def overlapping(self, ll, ur):
+        """ Return the ids of rectangles that overlap or touch a region. """
+        ids = self.candidates(ll, ur)
+        rects = self.rects[ids]
+        mask = (rects[:, 0] <= ur[0]) & (rects[:, 2] >= ll[0]) & (rects[:, 1] <= ur[1]) & (rects[:, 3] >= ll[1])
+        return ids[mask]
+
+    def containing(self, point):
+        """ Return the ids of rectangles that contain a point (including the edges). """
+        return self.overlapping(point, point)
+
+
+class LayerShapes:
+    """
+    All of the flattened shapes of one layer in a layout in user units.
+    Rectangles are kept as an array with a ShapeIndex while the
+    (rare) polygons are kept as lists of coordinates.
+    """
+
+    def __init__(self, rects, polygons):
+        self.rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        self.polygons = polygons
+        self._index = None
+
+    def __len__(self):
+        return len(self.rects) + len(self.polygons)
+
+    @property
+    def index(self):
+        """ The ShapeIndex is only built the first time a region is queried. """
+        if self._index is None:
+            self._index = ShapeIndex(self.rects)
+        return self._index
+
+    def getShapes(self, region=None):
+        """ Return the shapes as lists, optionally only the ones overlapping an (ll, ur) region. """
+        if region is None:
+            return self.rects.tolist() + [list(x) for x in self.polygons]
+        (ll, ur) = region
+        shapes = self.rects[self.index.overlapping(ll, ur)].tolist()
+        for polygon in self.polygons:
+            xs = polygon[0::2]
+            ys = polygon[1::2]
+            if min(xs) <= ur[0] and max(xs) >= ll[0] and min(ys) <= ur[1] and max(ys) >= ll[1]:
+                shapes.append(list(polygon))
+        return shapes
+
+    def getShapesContaining(self, point):
+        """ Return the shapes whose (llx, lly, urx, ury) box contains the point. """
+        shapes = self.rects[self.index.containing(point)].tolist()
+        for polygon in self.polygons:
+            if polygon[0] <= point[0] <= polygon[2] and polygon[1] <= point[1] <= polygon[3]:
+                shapes.append(list(polygon))
+        return shapes
@@ -3,6 +3,7 @@ from datetime import *
 import numpy as np
 from openram import debug
 from .gdsPrimitives import *
+from .shapeIndex import *
 
 
 class VlsiLayout:
@@ -58,6 +59,19 @@ class VlsiLayout:
         # with it.  Populate via traverseTheHierarchy method.
         self.xyTree = []
 
+        # Flattened shapes of the xyTree.
+        # Set useShapeCache to False to flatten a layer again on every
+        # query instead of keeping its shapes.
+        self.useShapeCache = True
+        # This is a dict indexed by the LPP with a LayerShapes of each layer
+        self.shapeCache = {}
+        # This is a dict indexed by structure name with the rectangles
+        # and polygons of each (layer, purpose) in the structure
+        self.structureShapes = {}
+        # This is a dict indexed by structure name with the placements
+        # of each structure in the xyTree
+        self.structurePlacements = None
+
         # temp variables used in delegate functions
         self.tempCoordinates=None
         self.tempPassFail = True
@@ -115,6 +129,17 @@ class VlsiLayout:
                     new_sref_name = self.padText(prefix + base_sref_name)
                 sref.sName = new_sref_name
                 #print("SREF: {0} -> {1}".format(base_sref_name, new_sref_name))
+            for aref in new_structures[new_name].arefs:
+                if aref.aName[-1] == "\x00":
+                    base_aref_name = aref.aName[0:-1]
+                else:
+                    base_aref_name = aref.aName
+                # Don't do library cells
+                if prefix_name and base_aref_name.startswith(prefix_name):
+                    new_aref_name = aref.aName
+                else:
+                    new_aref_name = self.padText(prefix + base_aref_name)
+                aref.aName = new_aref_name
         self.structures = new_structures
 
     def rename(self,newName):
@@ -185,6 +210,9 @@ class VlsiLayout:
                 for sref in self.structures[name].srefs: #go through each reference
                     if sref.sName in structureNames: #and compare to our list
                         structureNames.remove(sref.sName)
+            for aref in self.structures[name].arefs:
+                if aref.aName in structureNames:
+                    structureNames.remove(aref.aName)
 
         debug.check(len(structureNames)==1,"Multiple possible root structures in the layout: {}".format(str(structureNames)))
         self.rootStructureName = structureNames[0]
@@ -239,14 +267,38 @@ class VlsiLayout:
                                               rotateAngle = sref.rotateAngle,
                                               transFlags = sref.transFlags,
                                               coordinates = sref.coordinates)
+            # every element of an array reference is traversed like an sref
+            for aref in self.structures[startingStructureName].arefs:
+                for elementCoordinates in self.getArefCoordinates(aref):
+                    self.traverseTheHierarchy(startingStructureName = aref.aName,
+                                              delegateFunction = delegateFunction,
+                                              transformPath = transformPath,
+                                              rotateAngle = aref.rotateAngle,
+                                              transFlags = aref.transFlags,
+                                              coordinates = elementCoordinates)
         except KeyError:
             debug.error("Could not find structure {} in GDS file.".format(startingStructureName),-1)
 
-            # MUST HANDLE AREFs HERE AS WELL
         # when we return, drop the last transform from the transformPath
         del transformPath[-1]
         return
 
+    def getArefCoordinates(self, aref):
+        """
+        Return the origin of every element of an array reference. The
+        displacements of the columns and rows are in the coordinates of
+        the parent structure.
+        """
+        (origin, columnEnd, rowEnd) = aref.coordinates[0:3]
+        columnStep = ((columnEnd[0] - origin[0]) / aref.columns, (columnEnd[1] - origin[1]) / aref.columns)
+        rowStep = ((rowEnd[0] - origin[0]) / aref.rows, (rowEnd[1] - origin[1]) / aref.rows)
+        elementCoordinates = []
+        for row in range(aref.rows):
+            for column in range(aref.columns):
+                elementCoordinates.append((origin[0] + column * columnStep[0] + row * rowStep[0],
+                                           origin[1] + column * columnStep[1] + row * rowStep[1]))
+        return elementCoordinates
+
     def initialize(self, special_purposes={}):
         self.deduceHierarchy()
         # self.traverseTheHierarchy()
@@ -260,6 +312,7 @@ class VlsiLayout:
                 self.processLabelPins((layerNumber, None))
 
     def populateCoordinateMap(self):
+        self.clearShapeCache()
         def addToXyTree(startingStructureName = None,transformPath = None):
             uVector = np.array([[1.0],[0.0],[0.0]]) #start with normal basis vectors
             vVector = np.array([[0.0],[1.0],[0.0]])
@@ -330,8 +383,54 @@ class VlsiLayout:
             debug.info(0,"DEBUG:  GdsMill vlsiLayout: addInstance: type {0}, nameOfLayout {1}".format(type(layoutToAdd),nameOfLayout))
             debug.info(0,"DEBUG: name={0} offset={1} mirror={2} rotate={3}".format(layoutToAdd.rootStructureName,offsetInMicrons, mirror, rotate))
 
+        StructureName = self.addStructures(layoutToAdd, nameOfLayout)
 
+        #add a reference to the new layout structure in this layout's root
+        layoutToAddSref = GdsSref()
+        layoutToAddSref.sName = StructureName
+        layoutToAddSref.coordinates = offsetInLayoutUnits
+        self.setReferenceTransform(layoutToAddSref, mirror, rotate)
 
+        #add the sref to the root structure
+        self.structures[self.rootStructureName].srefs.append(layoutToAddSref)
+        # The flattened shapes are out of date now
+        self.clearShapeCache()
+
+    def addArray(self,layoutToAdd,nameOfLayout=0,offsetInMicrons=(0,0),columns=1,rows=1,
+                 columnPitch=0,rowPitch=0,mirror=None,rotate=None):
+        """
+        Method to insert a columns x rows array of one layout into another.
+        The elements are spaced by the column and row pitches in microns
+        and all have the same mirror and rotation.
+        """
+        (x, y) = (self.userUnits(offsetInMicrons[0]),self.userUnits(offsetInMicrons[1]))
+        if self.debug:
+            debug.info(0,"DEBUG:  GdsMill vlsiLayout: addArray: type {0}, nameOfLayout {1}".format(type(layoutToAdd),nameOfLayout))
+            debug.info(0,"DEBUG: name={0} offset={1} columns={2} rows={3} mirror={4} rotate={5}".format(layoutToAdd.rootStructureName,
+                                                                                                     offsetInMicrons, columns, rows, mirror, rotate))
+
+        StructureName = self.addStructures(layoutToAdd, nameOfLayout)
+
+        #add an array reference to the new layout structure in this layout's root
+        layoutToAddAref = GdsAref()
+        layoutToAddAref.aName = StructureName
+        layoutToAddAref.columns = columns
+        layoutToAddAref.rows = rows
+        layoutToAddAref.coordinates = [(x, y),
+                                       (x + columns * self.userUnits(columnPitch), y),
+                                       (x, y + rows * self.userUnits(rowPitch))]
+        self.setReferenceTransform(layoutToAddAref, mirror, rotate)
+
+        #add the aref to the root structure
+        self.structures[self.rootStructureName].arefs.append(layoutToAddAref)
+        # The flattened shapes are out of date now
+        self.clearShapeCache()
+
+    def addStructures(self, layoutToAdd, nameOfLayout=0):
+        """
+        Copy the structures of a layout that is instantiated in this one
+        and return the name of the instantiated structure.
+        """
         # Determine if we are instantiating the root design of
         #  layoutToAdd (default) or nameOfLayout
         if nameOfLayout == 0:
@@ -361,15 +460,13 @@ class VlsiLayout:
             for layerNumber in layoutToAdd.layerNumbersInUse:
                 if layerNumber not in self.layerNumbersInUse:
                     self.layerNumbersInUse.append(layerNumber)
+        return StructureName
 
-        #add a reference to the new layout structure in this layout's root
-        layoutToAddSref = GdsSref()
-        layoutToAddSref.sName = StructureName
-        layoutToAddSref.coordinates = offsetInLayoutUnits
-
+    def setReferenceTransform(self, reference, mirror=None, rotate=None):
+        """ Set the mirror and rotation of an sref or aref. """
         if mirror or rotate:
 
-            layoutToAddSref.transFlags = [0,0,0]
+            reference.transFlags = [0,0,0]
             # transFlags = (mirror around x-axis, magnification, rotation)
             # If magnification or rotation is true, it is the flags are then
             # followed by an amount in the record
@@ -380,20 +477,17 @@ class VlsiLayout:
             if mirror=="R270":
                 rotate = 270.0
             if rotate:
-                #layoutToAddSref.transFlags[2] = 1
-                layoutToAddSref.rotateAngle = rotate
+                #reference.transFlags[2] = 1
+                reference.rotateAngle = rotate
             if mirror == "x" or mirror == "MX":
-                layoutToAddSref.transFlags[0] = 1
+                reference.transFlags[0] = 1
             if mirror == "y" or mirror == "MY": #NOTE: "MY" option will override specified rotate angle
-                layoutToAddSref.transFlags[0] = 1
-                #layoutToAddSref.transFlags[2] = 1
-                layoutToAddSref.rotateAngle = 180.0
+                reference.transFlags[0] = 1
+                #reference.transFlags[2] = 1
+                reference.rotateAngle = 180.0
             if mirror == "xy" or mirror == "XY": #NOTE: "XY" option will override specified rotate angle
-                #layoutToAddSref.transFlags[2] = 1
-                layoutToAddSref.rotateAngle = 180.0
-
-        #add the sref to the root structure
-        self.structures[self.rootStructureName].srefs.append(layoutToAddSref)
+                #reference.transFlags[2] = 1
+                reference.rotateAngle = 180.0
 
     def addBox(self,layerNumber=0, purposeNumber=0, offsetInMicrons=(0,0), width=1.0, height=1.0,center=False):
         """
@@ -424,6 +518,8 @@ class VlsiLayout:
         boundaryToAdd.purposeLayer = purposeNumber
         #add the sref to the root structure
         self.structures[self.rootStructureName].boundaries.append(boundaryToAdd)
+        # The flattened shapes are out of date now
+        self.clearShapeCache()
 
     def addPath(self, layerNumber=0, purposeNumber=0, coordinates=[(0,0)], width=1.0):
         """
@@ -737,16 +833,19 @@ class VlsiLayout:
 
         return max_pins
 
-    def getAllPinShapes(self, pin_name):
+    def getAllPinShapes(self, pin_name, region=None):
         """
         Search for a pin label and return ALL the enclosing rectangles on the same layer
-        as the pin label.
+        as the pin label. If a region of (ll, ur) is given,
+        only return the ones that overlap it.
         """
         shape_list = []
         pin_map = self.pins[pin_name]
         for pin_list in pin_map:
             for pin in pin_list:
                 (pin_layer, boundary) = pin
+                if region and not rectangleOverlapsRegion(boundary, region):
+                    continue
                 shape_list.append(pin)
 
         return shape_list
@@ -762,12 +861,11 @@ class VlsiLayout:
 
         # Get all of the shapes on the layer at all levels
         # and transform them to the current level
-        shapes = self.getAllShapes(lpp)
+        shapes = self.getLayerShapes(lpp)
 
         for label in labels:
             label_coordinate = label.coordinates[0]
             user_coordinate = [x*self.units[0] for x in label_coordinate]
-            pin_shapes = []
             # Remove the padding if it exists
             if label.textString[-1] == "\x00":
                 label_text = label.textString[0:-1]
@@ -776,19 +874,14 @@ class VlsiLayout:
             try:
                 from openram.tech import layer_override
                 if layer_override[label_text]:
-                    shapes = self.getAllShapes((layer_override[label_text][0], None))
-                    if not shapes:
-                        shapes = self.getAllShapes(lpp)
+                    shapes = self.getLayerShapes((layer_override[label_text][0], None))
+                    if len(shapes) == 0:
+                        shapes = self.getLayerShapes(lpp)
                     else:
                         lpp = layer_override[label_text]
-
-
-
             except:
                 pass
-            for boundary in shapes:
-                if self.labelInRectangle(user_coordinate, boundary):
-                    pin_shapes.append((lpp, boundary))
+            pin_shapes = [(lpp, boundary) for boundary in shapes.getShapesContaining(user_coordinate)]
 
             try:
                 self.pins[label_text]
@@ -796,15 +889,16 @@ class VlsiLayout:
                 self.pins[label_text] = []
             self.pins[label_text].append(pin_shapes)
 
-    def getBlockages(self, lpp):
+    def getBlockages(self, lpp, region=None):
         """
         Return all blockages on a given layer in
         [coordinate 1, coordinate 2,...] format and
-        user units.
+        user units. If a region of (ll, ur) is given,
+        only return the ones that overlap it.
         """
         blockages = []
 
-        shapes = self.getAllShapes(lpp)
+        shapes = self.getAllShapes(lpp, region)
         for boundary in shapes:
             vectors = []
             for i in range(0, len(boundary), 2):
@@ -813,82 +907,143 @@ class VlsiLayout:
 
         return blockages
 
-    def getAllShapes(self, lpp):
+    def getAllShapes(self, lpp, region=None):
         """
         Return all shapes on a given layer in [llx, lly, urx, ury]
         format and user units for rectangles
         and [coordinate 1, coordinate 2,...] format and user
-        units for polygons.
+        units for polygons. If a region of (ll, ur) in user units
+        is given, only return the shapes that overlap it.
         """
-        boundaries = set()
-        for TreeUnit in self.xyTree:
-            # print(TreeUnit[0])
-            boundaries.update(self.getShapesInStructure(lpp, TreeUnit))
+        return self.getLayerShapes(lpp).getShapes(region)
 
-        # Convert to user units
-        user_boundaries = []
-        for boundary in boundaries:
-            boundaries_list = []
-            for i in range(0, len(boundary)):
-                boundaries_list.append(boundary[i]*self.units[0])
-            user_boundaries.append(boundaries_list)
-        return user_boundaries
-
-    def getShapesInStructure(self, lpp, structure):
+    def clearShapeCache(self):
         """
-        Go through all the shapes in a structure and
-        return the list of shapes in
-        the form [llx, lly, urx, ury] for rectangles
-        and [coordinate 1, coordinate 2,...] for polygons.
+        Forget the flattened shapes. This must be called if
+        the structures or the xyTree are changed.
         """
-        (structureName, structureOrigin,
-         structureuVector, structurevVector) = structure
-        # print(structureName,
-        # "u", structureuVector.transpose(),
-        # "v",structurevVector.transpose(),
-        # "o",structureOrigin.transpose())
-        boundaries = []
-        for boundary in self.structures[str(structureName)].boundaries:
-            if sameLPP((boundary.drawingLayer, boundary.purposeLayer),
-                       lpp):
-                if len(boundary.coordinates) != 5:
-                    # if shape is a polygon (used in DFF)
-                    boundaryPolygon = []
-                    # Polygon is a list of coordinates going ccw
-                    for coord in range(0, len(boundary.coordinates)):
-                        boundaryPolygon.append(boundary.coordinates[coord][0])
-                        boundaryPolygon.append(boundary.coordinates[coord][1])
-                    # perform the rotation
-                    boundaryPolygon = self.transformPolygon(boundaryPolygon,
-                                                            structureuVector,
-                                                            structurevVector)
-                    # add the offset
-                    polygon = []
-                    for i in range(0, len(boundaryPolygon), 2):
-                        polygon.append(boundaryPolygon[i] + structureOrigin[0].item())
-                        polygon.append(boundaryPolygon[i+1] + structureOrigin[1].item())
-                    # make it a tuple
-                    polygon = tuple(polygon)
-                    boundaries.append(polygon)
-                else:
-                    # else shape is a rectangle
-                    left_bottom = boundary.coordinates[0]
-                    right_top = boundary.coordinates[2]
-                    # Rectangle is [leftx, bottomy, rightx, topy].
-                    boundaryRect = [left_bottom[0], left_bottom[1],
-                                    right_top[0], right_top[1]]
-                    # perform the rotation
-                    boundaryRect = self.transformRectangle(boundaryRect,
-                                                           structureuVector,
-                                                           structurevVector)
-                    # add the offset and make it a tuple
-                    boundaryRect = (boundaryRect[0]+structureOrigin[0].item(),
-                                    boundaryRect[1]+structureOrigin[1].item(),
-                                    boundaryRect[2]+structureOrigin[0].item(),
-                                    boundaryRect[3]+structureOrigin[1].item())
-                    boundaries.append(boundaryRect)
-        return boundaries
+        self.shapeCache = {}
+        self.structureShapes = {}
+        self.structurePlacements = None
 
+    def getLayerShapes(self, lpp):
+        """
+        Return a LayerShapes with all the shapes on a given layer
+        transformed to the root structure. Rectangles of every placement
+        of a structure are transformed at once.
+        """
+        if isinstance(lpp[1], list):
+            key = (lpp[0], tuple(lpp[1]))
+        else:
+            key = lpp
+        try:
+            return self.shapeCache[key]
+        except KeyError:
+            pass
+
+        rects = []
+        polygons = set()
+        for (structureName, placements) in self.getStructurePlacements().items():
+            structureRects = []
+            for (shapeLPP, (shapeRects, shapePolygons)) in self.getStructureShapes(structureName).items():
+                if not sameLPP(shapeLPP, lpp):
+                    continue
+                structureRects.append(shapeRects)
+                # Polygons are rare (used in DFF) so transform them one at a time
+                for boundaryPolygon in shapePolygons:
+                    for (structureOrigin, structureuVector, structurevVector) in placements[1]:
+                        polygon = self.transformPolygon(boundaryPolygon,
+                                                        structureuVector,
+                                                        structurevVector)
+                        for i in range(0, len(polygon), 2):
+                            polygon[i] += structureOrigin[0].item()
+                            polygon[i+1] += structureOrigin[1].item()
+                        polygons.add(tuple(polygon))
+            if structureRects:
+                rects.append(transformRectangles(np.concatenate(structureRects), placements[0]))
+
+        # Remove duplicates and convert to user units
+        if rects:
+            rects = np.unique(np.concatenate(rects), axis=0) * self.units[0]
+        user_polygons = [[x*self.units[0] for x in polygon] for polygon in polygons]
+        shapes = LayerShapes(rects, user_polygons)
+        if self.useShapeCache:
+            self.shapeCache[key] = shapes
+        return shapes
+
+    def getFlatShapes(self):
+        """
+        Return a dict indexed by (layer, purpose) of all the rectangles
+        as an array of [llx, lly, urx, ury] and the polygons as
+        coordinate lists transformed to the root structure.
+        Everything is in database units and duplicates are not removed.
+        """
+        flatShapes = {}
+        for (structureName, placements) in self.getStructurePlacements().items():
+            for (shapeLPP, (shapeRects, shapePolygons)) in self.getStructureShapes(structureName).items():
+                (rects, polygons) = flatShapes.setdefault(shapeLPP, ([], []))
+                if len(shapeRects):
+                    rects.append(transformRectangles(shapeRects, placements[0]))
+                for boundaryPolygon in shapePolygons:
+                    for (structureOrigin, structureuVector, structurevVector) in placements[1]:
+                        polygon = self.transformPolygon(boundaryPolygon,
+                                                        structureuVector,
+                                                        structurevVector)
+                        for i in range(0, len(polygon), 2):
+                            polygon[i] += structureOrigin[0].item()
+                            polygon[i+1] += structureOrigin[1].item()
+                        polygons.append(polygon)
+        for (lpp, (rects, polygons)) in flatShapes.items():
+            if rects:
+                rects = np.concatenate(rects)
+            flatShapes[lpp] = (np.asarray(rects, dtype=np.float64).reshape(-1, 4), polygons)
+        return flatShapes
+
+    def getStructurePlacements(self):
+        """
+        Group the xyTree by structure name. Each structure has an array of
+        [u[0], u[1], v[0], v[1], x, y] transforms and a list of the
+        original (origin, uVector, vVector) of every placement.
+        """
+        if self.structurePlacements is None:
+            placements = {}
+            for (structureName, origin, uVector, vVector) in self.xyTree:
+                (transforms, vectors) = placements.setdefault(str(structureName), ([], []))
+                transforms.append((uVector[0][0], uVector[1][0],
+                                   vVector[0][0], vVector[1][0],
+                                   origin[0][0], origin[1][0]))
+                vectors.append((origin, uVector, vVector))
+            self.structurePlacements = {k: (np.array(t, dtype=np.float64), v) for (k, (t, v)) in placements.items()}
+        return self.structurePlacements
+
+    def getStructureShapes(self, structureName):
+        """
+        Return a dict indexed by (layer, purpose) of the rectangles as an array of
+        [llx, lly, urx, ury] and the polygons as coordinate lists in a structure.
+        """
+        try:
+            return self.structureShapes[structureName]
+        except KeyError:
+            pass
+
+        shapes = {}
+        for boundary in self.structures[structureName].boundaries:
+            (rects, polygons) = shapes.setdefault((boundary.drawingLayer, boundary.purposeLayer), ([], []))
+            if len(boundary.coordinates) != 5:
+                # Polygon is a list of coordinates going ccw
+                polygon = []
+                for coord in boundary.coordinates:
+                    polygon.append(coord[0])
+                    polygon.append(coord[1])
+                polygons.append(polygon)
+            else:
+                left_bottom = boundary.coordinates[0]
+                right_top = boundary.coordinates[2]
+                rects.append((left_bottom[0], left_bottom[1], right_top[0], right_top[1]))
+        for (lpp, (rects, polygons)) in shapes.items():
+            shapes[lpp] = (np.array(rects, dtype=np.float64).reshape(-1, 4), polygons)
+        self.structureShapes[structureName] = shapes
+        return shapes
 
     def transformPolygon(self,originalPolygon,uVector,vVector):
         """
@@ -969,6 +1124,46 @@ def sameLPP(lpp1, lpp2):
     return lpp1[0] == lpp2[0] and lpp1[1] == lpp2[1]
 
 
+def rectangleOverlapsRegion(A, region):
+    """
+    Check if a [llx, lly, urx, ury] boundary overlaps an (ll, ur) region.
+    """
+    (ll, ur) = region
+    return A[0] <= ur[0] and A[2] >= ll[0] and A[1] <= ur[1] and A[3] >= ll[1]
+
+
+def transformRectangles(rects, transforms):
+    """
+    Transform an array of rectangles by an array of
+    [u[0], u[1], v[0], v[1], x, y] transforms. Returns every rectangle
+    in every transform and recomputes the left, bottom, right, top values.
+    """
+    (u0, u1, v0, v1, x, y) = [transforms[:, i:i+1] for i in range(6)]
+    (left, bottom, right, top) = [rects[:, i] for i in range(4)]
+    leftBottomX = left*u0 + bottom*v0
+    leftBottomY = left*u1 + bottom*v1
+    rightTopX = right*u0 + top*v0
+    rightTopY = right*u1 + top*v1
+    newRectangles = np.stack([np.minimum(leftBottomX, rightTopX) + x,
+                              np.minimum(leftBottomY, rightTopY) + y,
+                              np.maximum(leftBottomX, rightTopX) + x,
+                              np.maximum(leftBottomY, rightTopY) + y], axis=-1)
+    return newRectangles.reshape(-1, 4)
+
+
+def transformPolygons(polygons, transforms):
+    """
+    Transform an array of polygons with the same number of points by an
+    array of [u[0], u[1], v[0], v[1], x, y] transforms. Returns every
+    polygon in every transform like transformRectangles.
+    """
+    (u0, u1, v0, v1, x, y) = [transforms[:, i, None, None] for i in range(6)]
+    (pointX, pointY) = (polygons[None, :, :, 0], polygons[None, :, :, 1])
+    newPolygons = np.stack([pointX*u0 + pointY*v0 + x,
+                            pointX*u1 + pointY*v1 + y], axis=-1)
+    return newPolygons.reshape(-1, polygons.shape[1], 2)
+
+
 def boundaryArea(A):
     """
     Returns boundary area for sorting.
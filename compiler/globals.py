@@ -345,6 +345,10 @@ def read_config(config_file, is_unit_test=False):
     # Remember if we are running unit tests to reduce output
     OPTS.is_unit_test = is_unit_test
 
+    # Unit tests don't reuse the cached results of other runs
+    if is_unit_test and "char_cache_path" not in OPTS.overridden:
+        OPTS.char_cache_path = OPTS.openram_temp + "cache"
+
     # If we are only generating a netlist, we can't do DRC/LVS
     if OPTS.netlist_only:
         OPTS.check_lvsdrc = False
@@ -6,7 +6,7 @@
 # All rights reserved.
 #
 from openram import debug
-from openram.base import design
+from openram.base import design, vector
 from openram.sram_factory import factory
 from openram import OPTS
 
@@ -189,27 +189,22 @@ class bitcell_base_array(design):
         self.height = self.row_size * self.cell.height
         self.width = self.column_size * self.cell.width
 
-        xoffset = 0.0
-        for col in range(self.column_size):
-            yoffset = 0.0
-            tempx, dir_y = self._adjust_x_offset(xoffset, col, self.column_offset)
-
-            for row in range(self.row_size):
-                tempy, dir_x = self._adjust_y_offset(yoffset, row, row_offset)
-
-                if dir_x and dir_y:
-                    dir_key = "XY"
-                elif dir_x:
-                    dir_key = "MX"
-                elif dir_y:
-                    dir_key = "MY"
-                else:
-                    dir_key = ""
-
-                self.cell_inst[row, col].place(offset=[tempx, tempy],
-                                               mirror=dir_key)
-                yoffset += self.cell.height
-            xoffset += self.cell.width
+        # The cells are placed as an array so that the layout is written as
+        # a few AREFs. Mirrored rows and columns are the odd ones including
+        # the offsets like in _adjust_x_offset and _adjust_y_offset.
+        if self.cell.mirror.x:
+            mirror_rows = (1 + row_offset) % 2
+        else:
+            mirror_rows = None
+        if self.cell.mirror.y:
+            mirror_cols = (1 + self.column_offset) % 2
+        else:
+            mirror_cols = None
+        self.cell_array = self.add_inst_array(name="cell_array",
+                                              insts=self.cell_inst,
+                                              pitch=vector(self.cell.width, self.cell.height),
+                                              mirror_rows=mirror_rows,
+                                              mirror_cols=mirror_cols)
 
     def get_column_offsets(self):
         """
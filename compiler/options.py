@@ -188,6 +188,24 @@ class options(optparse.Values):
     # Use analytical delay models by default
     # rather than (slow) characterization
     analytical_delay = True
+    # This is the directory where the characterization results that don't
+    # depend on the SRAM (e.g. DFF setup/hold times) are cached between runs.
+    # The cache is disabled if it is empty.
+    try:
+        # If user defined the cache location in their environment, use it
+        char_cache_path = os.path.abspath(os.environ.get("OPENRAM_CACHE"))
+    except:
+        char_cache_path = os.path.join(os.path.expanduser("~"), ".cache", "openram")
+    # Reuse the measurements of identical simulations from the cache.
+    # This is off by default since the cached measurements are only
+    # invalidated by changes of the simulation and not of OpenRAM.
+    use_sim_cache = False
+    # Maximum size of the cached simulation measurements in MB. The least
+    # recently used ones are removed first.
+    sim_cache_size = 100
+    # Save the waveforms of simulations to a raw file and compute the
+    # measurements from them instead of the simulator's .meas results
+    use_raw_waveforms = False
     # Purge the temp directory after a successful
     # run (doesn't purge on errors, anyhow)
 
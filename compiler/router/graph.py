@@ -5,18 +5,22 @@
 #
 import heapq
 from copy import deepcopy
+import numpy as np
+from scipy.spatial import cKDTree
 from openram import debug
 from openram.base.vector import vector
 from openram.tech import drc
-from .bbox import bbox
-from .bbox_node import bbox_node
 from .graph_node import graph_node
-from .graph_probe import graph_probe
-from .graph_utils import snap
+from .graph_utils import expand_ranges, snap
 
 
 class graph:
-    """ This is the graph created from the blockages. """
+    """
+    This is the graph created from the blockages.
+    Graph nodes are not stored as objects. A node is the integer id of an
+    (x, y, z) point on the Hanan grid and the graph is a set of arrays indexed
+    by these ids.
+    """
 
     def __init__(self, router):
 
@@ -32,17 +36,6 @@ class graph:
         return shape.name == self.source.name
 
 
-    def inside_shape(self, point, shape):
-        """ Return if the point is inside the shape. """
-
-        # Check if they're on the same layer
-        if point.z != self.router.get_zindex(shape.lpp):
-            return False
-        # Check if the point is inside the shape
-        ll, ur = shape.rect
-        return shape.on_segment(ll, point, ur)
-
-
     def get_safe_pin_values(self, pin):
         """ Get the safe x and y values of the given pin. """
 
@@ -71,119 +64,6 @@ class graph:
         return x_values, y_values
 
 
-    def is_probe_blocked(self, p1, p2):
-        """
-        Return if a probe sent from p1 to p2 encounters a blockage.
-        The probe must be sent vertically or horizontally.
-        This function assumes that p1 and p2 are on the same layer.
-        """
-
-        probe_shape = graph_probe(p1, p2, self.router.get_lpp(p1.z))
-        pll, pur = probe_shape.rect
-        # Check if any blockage blocks this probe
-        for blockage in self.blockage_bbox_tree.iterate_shape(probe_shape):
-            bll, bur = blockage.rect
-            # Not on the same layer
-            if not blockage.same_lpp(blockage.lpp, probe_shape.lpp):
-                continue
-            # Probe is blocked if the shape isn't routable
-            if not self.is_routable(blockage):
-                return True
-            blockage = blockage.get_core()
-            bll, bur = blockage.rect
-            # Not overlapping
-            if bll.x > pur.x or pll.x > bur.x or bll.y > pur.y or pll.y > bur.y:
-                return True
-        return False
-
-
-    def is_node_blocked(self, node):
-        """ Return if a node is blocked by a blockage. """
-
-        p = node.center
-        x = p.x
-        y = p.y
-        z = p.z
-
-        def closest(value, checklist):
-            """ Return the distance of the closest value in the checklist. """
-            diffs = [abs(value - other) for other in checklist]
-            return snap(min(diffs))
-
-        wide = self.router.track_wire
-        half_wide = self.router.half_wire
-        spacing = snap(self.router.track_space + half_wide + drc["grid"])
-        blocked = False
-        for blockage in self.blockage_bbox_tree.iterate_point(p):
-            ll, ur = blockage.rect
-            # Not on the same layer
-            if self.router.get_zindex(blockage.lpp) != z:
-                continue
-            # Blocked if not routable
-            if not self.is_routable(blockage):
-                blocked = True
-                continue
-            blockage = blockage.get_core()
-            ll, ur = blockage.rect
-            # Not overlapping
-            if ll.x > x or x > ur.x or ll.y > y or y > ur.y:
-                blocked = True
-                continue
-            # Check if the node is too close to one edge of the shape
-            lengths = [blockage.width(), blockage.height()]
-            centers = blockage.center()
-            ll, ur = blockage.rect
-            safe = [True, True]
-            for i in range(2):
-                if lengths[i] >= wide:
-                    min_diff = closest(p[i], [ll[i], ur[i]])
-                    if min_diff < half_wide:
-                        safe[i] = False
-                elif centers[i] != p[i]:
-                    safe[i] = False
-            if not all(safe):
-                blocked = True
-                continue
-            # Check if the node is in a safe region of the shape
-            xs, ys = self.get_safe_pin_values(blockage)
-            xdiff = closest(p.x, xs)
-            ydiff = closest(p.y, ys)
-            if xdiff == 0 and ydiff == 0:
-                if blockage in [self.source, self.target]:
-                    return False
-            elif xdiff < spacing and ydiff < spacing:
-                blocked = True
-        return blocked
-
-
-    def is_via_blocked(self, nodes):
-        """ Return if a via on the given point is blocked by another via. """
-
-        # If the nodes are blocked by a blockage other than a via
-        for node in nodes:
-            if self.is_node_blocked(node):
-                return True
-
-        # Skip if no via is present
-        if len(self.graph_vias) == 0:
-            return False
-
-        # If the nodes are blocked by a via
-        x = node.center.x
-        y = node.center.y
-        z = node.center.z
-        for via in self.via_bbox_tree.iterate_point(node.center):
-            ll, ur = via.rect
-            # Not overlapping
-            if ll.x > x or x > ur.x or ll.y > y or y > ur.y:
-                continue
-            center = via.center()
-            # If not in the center
-            if center.x != x or center.y != y:
-                return True
-        return False
-
-
     def create_graph(self, source, target):
         """ Create the graph to run routing on later. """
         debug.info(3, "Creating the graph for source '{}' and target'{}'.".format(source, target))
@@ -200,6 +80,7 @@ class graph:
 
         # Find the blockages that are in the routing area
         self.graph_blockages = []
+        self.graph_blockage_ids = set()
         self.find_graph_blockages(region)
 
         # Find the vias that are in the routing area
@@ -212,29 +93,26 @@ class graph:
         region.bbox(self.graph_blockages)
         # Find and include edge shapes to prevent DRC errors
         self.find_graph_blockages(region)
-        # Build the bbox tree
-        self.build_bbox_trees()
+        # Save the final routing region
+        self.region = region
         # Generate the graph nodes from cartesian values
         self.generate_graph_nodes(x_values, y_values)
         # Save the graph nodes that lie in source and target shapes
         self.save_end_nodes()
         debug.info(4, "Number of blockages detected in the routing region: {}".format(len(self.graph_blockages)))
         debug.info(4, "Number of vias detected in the routing region: {}".format(len(self.graph_vias)))
-        debug.info(4, "Number of nodes in the routing graph: {}".format(len(self.nodes)))
+        debug.info(4, "Number of nodes in the routing graph: {}".format(self.get_node_count()))
 
 
     def find_graph_blockages(self, region):
         """ Find blockages that overlap the routing region. """
 
-        for blockage in self.router.blockages:
+        for blockage in self.router.blockages.overlapping(region.rect):
             # Skip if already included
-            if blockage in self.graph_blockages:
+            if id(blockage) in self.graph_blockage_ids:
                 continue
-            # Set the region's lpp to current blockage's lpp so that the
-            # overlaps method works
-            region.lpp = blockage.lpp
-            if region.overlaps(blockage):
-                self.graph_blockages.append(blockage)
+            self.graph_blockage_ids.add(id(blockage))
+            self.graph_blockages.append(blockage)
         # Make sure that the source or target fake pins are included as blockage
         for shape in [self.source, self.target]:
             for blockage in self.graph_blockages:
@@ -248,30 +126,7 @@ class graph:
     def find_graph_vias(self, region):
         """ Find vias that overlap the routing region. """
 
-        for via in self.router.vias:
-            # Skip if already included
-            if via in self.graph_vias:
-                continue
-            # Set the regions's lpp to current via's lpp so that the
-            # overlaps method works
-            region.lpp = via.lpp
-            if region.overlaps(via):
-                self.graph_vias.append(via)
-
-
-    def build_bbox_trees(self):
-        """ Build bbox trees for blockages and vias in the routing region. """
-
-        # Bbox tree for blockages
-        self.blockage_bbox_tree = bbox_node(bbox(self.graph_blockages[0]))
-        for i in range(1, len(self.graph_blockages)):
-            self.blockage_bbox_tree.insert(bbox(self.graph_blockages[i]))
-        # Bbox tree for vias
-        if len(self.graph_vias) == 0:
-            return
-        self.via_bbox_tree = bbox_node(bbox(self.graph_vias[0]))
-        for i in range(1, len(self.graph_vias)):
-            self.via_bbox_tree.insert(bbox(self.graph_vias[i]))
+        self.graph_vias.extend(self.router.vias.overlapping(region.rect))
 
 
     def generate_cartesian_values(self):
@@ -317,76 +172,323 @@ class graph:
         return x_values, y_values
 
 
+    def get_node_id(self, ix, iy, z):
+        """ Return the node id of the given grid indices. """
+
+        return (ix * len(self.y_values) + iy) * 2 + z
+
+
+    def get_node_center(self, node_id):
+        """ Return the center of a node as a list of [x, y, z]. """
+
+        ix, iy, z = np.unravel_index(node_id, self.valid.shape)
+        return [float(self.x_values[ix]), float(self.y_values[iy]), int(z)]
+
+
+    def get_node_count(self):
+        """ Return the number of nodes that aren't blocked. """
+
+        return int(np.count_nonzero(self.valid))
+
+
+    def get_node_centers(self):
+        """ Return the centers of all nodes that aren't blocked. """
+
+        return [self.get_node_center(i) for i in np.flatnonzero(self.valid)]
+
+
+    def get_slice(self, rect):
+        """
+        Return the index slices of the x and y values that are inside the
+        given rectangle (including the edges).
+        """
+
+        ll, ur = rect
+        x_slice = slice(np.searchsorted(self.x_values, ll.x, "left"),
+                        np.searchsorted(self.x_values, ur.x, "right"))
+        y_slice = slice(np.searchsorted(self.y_values, ll.y, "left"),
+                        np.searchsorted(self.y_values, ur.y, "right"))
+        return x_slice, y_slice
+
+
+    def get_slices(self, rects):
+        """
+        Return the start and end indices of the x and y values that are inside
+        the given [llx, lly, urx, ury] rectangles (including the edges) as
+        arrays.
+        """
+
+        return (np.searchsorted(self.x_values, rects[:, 0], "left"),
+                np.searchsorted(self.x_values, rects[:, 2], "right"),
+                np.searchsorted(self.y_values, rects[:, 1], "left"),
+                np.searchsorted(self.y_values, rects[:, 3], "right"))
+
+
+    def save_blockage_arrays(self):
+        """
+        Save the rectangles, cores, z-indices and routability of the blockages
+        as arrays so that all blockages can be checked at once.
+        """
+
+        def get_rects(shapes):
+            rects = [[ll.x, ll.y, ur.x, ur.y] for ll, ur in (x.rect for x in shapes)]
+            return np.array(rects, dtype=np.float64).reshape(-1, 4)
+
+        self.blockage_rects = get_rects(self.graph_blockages)
+        self.blockage_cores = get_rects([x.get_core() for x in self.graph_blockages])
+        self.blockage_routable = np.array([self.is_routable(x) for x in self.graph_blockages], dtype=bool)
+        self.blockage_zindices = np.array([self.router.get_zindex(x.lpp) for x in self.graph_blockages], dtype=np.int64)
+        # Probes only check the blockages with the same lpp as their layer
+        self.blockage_layers = np.array([[x.same_lpp(x.lpp, self.router.get_lpp(z)) for z in [0, 1]]
+                                         for x in self.graph_blockages], dtype=bool).reshape(-1, 2)
+
+
     def generate_graph_nodes(self, x_values, y_values):
         """
         Generate all graph nodes using the cartesian values and connect the
         orthogonal neighbors.
         """
 
-        # Generate all nodes
-        self.nodes = []
-        for x in x_values:
-            for y in y_values:
-                for z in [0, 1]:
-                    self.nodes.append(graph_node([x, y, z]))
-
-        # Mark nodes that will be removed
-        self.mark_blocked_nodes()
-
-        # Connect closest nodes that won't be removed
-        def search(index, condition, shift):
-            """ Search and connect neighbor nodes. """
-            base_nodes = self.nodes[index:index+2]
-            found = [base_nodes[0].remove,
-                     base_nodes[1].remove]
-            while condition(index) and not all(found):
-                nodes = self.nodes[index - shift:index - shift + 2]
-                for k in range(2):
-                    if not found[k] and not nodes[k].remove:
-                        found[k] = True
-                        if not self.is_probe_blocked(base_nodes[k].center, nodes[k].center):
-                            base_nodes[k].add_neighbor(nodes[k])
-                index -= shift
-        y_len = len(y_values)
-        for i in range(0, len(self.nodes), 2):
-            search(i, lambda count: (count / 2) % y_len, 2) # Down
-            search(i, lambda count: (count / 2) >= y_len, y_len * 2) # Left
-            if not self.nodes[i].remove and \
-               not self.nodes[i + 1].remove and \
-               not self.is_via_blocked(self.nodes[i:i+2]):
-                self.nodes[i].add_neighbor(self.nodes[i + 1])
-
-        # Remove marked nodes
-        self.remove_blocked_nodes()
+        self.x_values = np.array(x_values, dtype=np.float64)
+        self.y_values = np.array(y_values, dtype=np.float64)
+
+        # Nodes that aren't blocked are valid
+        self.save_blockage_arrays()
+        self.valid = ~self.mark_blocked_nodes()
+
+        # Each edge is between two valid nodes and has a type of 0 (vertical),
+        # 1 (horizontal) or 2 (via)
+        sources = []
+        targets = []
+        types = []
+        for z in [0, 1]:
+            for vertical in [True, False]:
+                source, target = self.find_layer_edges(z, vertical)
+                sources.append(source)
+                targets.append(target)
+                types.append(np.full(len(source), int(not vertical)))
+        # Connect the nodes on both layers if the via isn't blocked
+        via_nodes = np.flatnonzero(self.valid[:, :, 0] & self.valid[:, :, 1] & ~self.mark_blocked_vias()) * 2
+        sources.append(via_nodes)
+        targets.append(via_nodes + 1)
+        types.append(np.full(len(via_nodes), 2))
+
+        self.build_adjacency(np.concatenate(sources),
+                             np.concatenate(targets),
+                             np.concatenate(types))
 
 
     def mark_blocked_nodes(self):
-        """ Mark graph nodes to be removed that are blocked by a blockage. """
+        """
+        Return a mask of the graph nodes that are blocked by a blockage. The
+        nodes inside all blockages are found at once and each (node, blockage)
+        pair is checked in vectorized form.
+        """
+
+        shape = (len(self.x_values), len(self.y_values), 2)
+        blocked = np.zeros(shape, dtype=bool)
+        # Nodes in the safe region of the source or target are never blocked
+        unblocked = np.zeros(shape, dtype=bool)
 
-        for i in range(len(self.nodes) - 1, -1, -1):
-            node = self.nodes[i]
-            if self.is_node_blocked(node):
-                node.remove = True
+        wide = self.router.track_wire
+        half_wide = self.router.half_wire
+        spacing = snap(self.router.track_space + half_wide + drc["grid"])
+
+        # Find the nodes inside each blockage
+        x_start, x_end, y_start, y_end = self.get_slices(self.blockage_rects)
+        heights = np.maximum(y_end - y_start, 0)
+        sizes = np.maximum(x_end - x_start, 0) * heights
+        blockages, inside = expand_ranges(np.zeros(len(sizes), dtype=np.int64), sizes)
+        x = x_start[blockages] + inside // heights[blockages]
+        y = y_start[blockages] + inside % heights[blockages]
+        z = self.blockage_zindices[blockages]
+
+        # Blocked if not routable
+        routable = self.blockage_routable[blockages]
+        blocked[x[~routable], y[~routable], z[~routable]] = True
+        blockages = blockages[routable]
+        x = x[routable]
+        y = y[routable]
+        z = z[routable]
+
+        # Values of the routable blockages
+        count = len(self.graph_blockages)
+        lengths = np.zeros((count, 2))
+        centers = np.zeros((count, 2))
+        safe_values = np.zeros((count, 4))
+        is_end = np.zeros(count, dtype=bool)
+        for i in np.unique(blockages).tolist():
+            blockage = self.graph_blockages[i].get_core()
+            lengths[i] = [blockage.width(), blockage.height()]
+            center = blockage.center()
+            centers[i] = [center.x, center.y]
+            xs, ys = self.get_safe_pin_values(blockage)
+            # There are one or two safe values on each axis
+            safe_values[i] = [xs[0], xs[-1], ys[0], ys[-1]]
+            is_end[i] = blockage in [self.source, self.target]
+
+        points = [self.x_values[x], self.y_values[y]]
+        cores = self.blockage_cores[blockages]
+        # Nodes outside of the core are blocked
+        local_blocked = ~((cores[:, 0] <= points[0]) & (points[0] <= cores[:, 2]) &
+                          (cores[:, 1] <= points[1]) & (points[1] <= cores[:, 3]))
+        # Nodes too close to one edge of the shape are blocked
+        for i in range(2):
+            edge_diff = snap(np.minimum(np.abs(points[i] - cores[:, i]),
+                                        np.abs(points[i] - cores[:, i + 2])))
+            local_blocked |= np.where(lengths[blockages, i] >= wide,
+                                      edge_diff < half_wide,
+                                      points[i] != centers[blockages, i])
+        # Check if the nodes are in a safe region of the shape
+        values = safe_values[blockages]
+        xdiff = snap(np.minimum(np.abs(points[0] - values[:, 0]), np.abs(points[0] - values[:, 1])))
+        ydiff = snap(np.minimum(np.abs(points[1] - values[:, 2]), np.abs(points[1] - values[:, 3])))
+        safe = (xdiff == 0) & (ydiff == 0)
+        end = is_end[blockages] & ~local_blocked & safe
+        unblocked[x[end], y[end], z[end]] = True
+        local_blocked |= ~safe & (xdiff < spacing) & (ydiff < spacing)
+        blocked[x[local_blocked], y[local_blocked], z[local_blocked]] = True
+        return blocked & ~unblocked
+
+
+    def mark_blocked_vias(self):
+        """ Return a mask of the (x, y) points where a via is blocked by another via. """
+
+        blocked = np.zeros((len(self.x_values), len(self.y_values)), dtype=bool)
+        rects = np.array([[ll.x, ll.y, ur.x, ur.y] for ll, ur in (x.rect for x in self.graph_vias)],
+                         dtype=np.float64).reshape(-1, 4)
+        centers = np.array([[c.x, c.y] for c in (x.center() for x in self.graph_vias)],
+                           dtype=np.float64).reshape(-1, 2)
+        # Find the points inside each via
+        x_start, x_end, y_start, y_end = self.get_slices(rects)
+        heights = np.maximum(y_end - y_start, 0)
+        sizes = np.maximum(x_end - x_start, 0) * heights
+        vias, inside = expand_ranges(np.zeros(len(sizes), dtype=np.int64), sizes)
+        x = x_start[vias] + inside // heights[vias]
+        y = y_start[vias] + inside % heights[vias]
+        # Blocked if not in the center
+        off_center = (self.x_values[x] != centers[vias, 0]) | (self.y_values[y] != centers[vias, 1])
+        blocked[x[off_center], y[off_center]] = True
+        return blocked
 
 
-    def remove_blocked_nodes(self):
-        """ Remove graph nodes that are marked to be removed. """
+    def find_layer_edges(self, z, vertical):
+        """
+        Return the node ids of the edges between the closest valid nodes on a
+        layer in the given direction. Edges that are blocked by a blockage
+        aren't included.
+        """
+
+        # Put the direction of the edges as the last axis
+        valid = self.valid[:, :, z]
+        values = self.y_values
+        if not vertical:
+            valid = valid.T
+            values = self.x_values
+        # Consecutive valid nodes on the same line are neighbors
+        lines, indices = np.nonzero(valid)
+        same_line = lines[:-1] == lines[1:]
+        lines = lines[:-1][same_line]
+        low = indices[:-1][same_line]
+        high = indices[1:][same_line]
+
+        # Send probes between the neighbors to check if they are blocked
+        line_values = self.x_values if vertical else self.y_values
+        on_layer = self.blockage_layers[:, z]
+        rects = self.blockage_rects[on_layer]
+        cores = self.blockage_cores[on_layer]
+        routable = self.blockage_routable[on_layer]
+        # Put the direction of the edges as the second axis of rectangles
+        if not vertical:
+            rects = rects[:, [1, 0, 3, 2]]
+            cores = cores[:, [1, 0, 3, 2]]
+        # Edges are sorted by lines so the edges on the lines inside a
+        # blockage are next to each other
+        start = np.searchsorted(lines, np.searchsorted(line_values, rects[:, 0], "left"), "left")
+        end = np.searchsorted(lines, np.searchsorted(line_values, rects[:, 2], "right"), "left")
+        blockages, edges = expand_ranges(start, end)
+        rects = rects[blockages]
+        cores = cores[blockages]
+        line = line_values[lines[edges]]
+        low_values = values[low[edges]]
+        high_values = values[high[edges]]
+        overlaps = (low_values <= rects[:, 3]) & (rects[:, 1] <= high_values)
+        # Probe is blocked if the shape isn't routable or if it doesn't overlap
+        # the core
+        core_overlaps = (cores[:, 0] <= line) & (line <= cores[:, 2]) & \
+                        (low_values <= cores[:, 3]) & (cores[:, 1] <= high_values)
+        blocked = np.zeros(len(lines), dtype=bool)
+        blocked[edges[overlaps & (~routable[blockages] | ~core_overlaps)]] = True
+
+        lines = lines[~blocked]
+        low = low[~blocked]
+        high = high[~blocked]
+        if vertical:
+            return self.get_node_id(lines, low, z), self.get_node_id(lines, high, z)
+        return self.get_node_id(low, lines, z), self.get_node_id(high, lines, z)
+
+
+    def build_adjacency(self, sources, targets, types):
+        """
+        Save the edges as compressed adjacency arrays. Neighbors of node `i`
+        are `self.neighbors[self.offsets[i]:self.offsets[i + 1]]`.
+        """
 
-        for i in range(len(self.nodes) - 1, -1, -1):
-            node = self.nodes[i]
-            if node.remove:
-                node.remove_all_neighbors()
-                self.nodes.remove(node)
+        # Add both directions of every edge
+        sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+        types = np.concatenate([types, types])
+        order = np.argsort(sources, kind="stable")
+        sources = sources[order]
+        self.neighbors = targets[order]
+        self.edge_types = types[order]
+        self.offsets = np.searchsorted(sources, np.arange(self.valid.size + 1))
+
+        # Base costs of the edges
+        source_centers = np.unravel_index(sources, self.valid.shape)
+        target_centers = np.unravel_index(self.neighbors, self.valid.shape)
+        dx = np.abs(self.x_values[source_centers[0]] - self.x_values[target_centers[0]])
+        dy = np.abs(self.y_values[source_centers[1]] - self.y_values[target_centers[1]])
+        layer_dist = dx + dy
+        # Quadruple the cost if the edge is in non-preferred direction
+        is_vertical = self.edge_types != 1
+        layer_dist[is_vertical != source_centers[2].astype(bool)] *= 4
+        self.layer_costs = layer_dist
+        self.via_costs = np.abs(source_centers[2] - target_centers[2]) * 2
 
 
     def save_end_nodes(self):
         """ Save graph nodes that are inside source and target pins. """
 
-        for node in self.nodes:
-            if self.inside_shape(node.center, self.source):
-                self.source_nodes.append(node)
-            elif self.inside_shape(node.center, self.target):
-                self.target_nodes.append(node)
+        inside = {}
+        for shape in [self.source, self.target]:
+            mask = np.zeros(self.valid.shape, dtype=bool)
+            x_slice, y_slice = self.get_slice(shape.rect)
+            mask[x_slice, y_slice, self.router.get_zindex(shape.lpp)] = True
+            inside[id(shape)] = mask & self.valid
+        self.source_nodes = np.flatnonzero(inside[id(self.source)])
+        self.target_nodes = np.flatnonzero(inside[id(self.target)] & ~inside[id(self.source)])
+
+
+    def get_heuristics(self):
+        """
+        Return the estimated distance of each node to the closest target. The
+        targets on each layer are put in a KD-tree to find the closest one.
+        """
+
+        centers = np.unravel_index(np.arange(self.valid.size), self.valid.shape)
+        points = np.stack([self.x_values[centers[0]], self.y_values[centers[1]]], axis=1)
+        heuristics = np.full(self.valid.size, float("inf"))
+        target_centers = np.unravel_index(self.target_nodes, self.valid.shape)
+        for z in [0, 1]:
+            on_layer = target_centers[2] == z
+            if not on_layer.any():
+                continue
+            tree = cKDTree(np.stack([self.x_values[target_centers[0][on_layer]],
+                                     self.y_values[target_centers[1][on_layer]]], axis=1))
+            # Manhattan distance to the closest target on this layer
+            dist, _ = tree.query(points, p=1)
+            heuristics = np.minimum(heuristics, dist + np.abs(centers[2] - z))
+        return heuristics
 
 
     def find_shortest_path(self):
@@ -395,62 +497,70 @@ class graph:
         A* algorithm.
         """
 
-        # Heuristic function to calculate the scores
-        def h(node):
-            """ Return the estimated distance to the closest target. """
-            min_dist = float("inf")
-            for t in self.target_nodes:
-                dist = t.center.distance(node.center) + abs(t.center.z - node.center.z)
-                if dist < min_dist:
-                    min_dist = dist
-            return min_dist
+        if len(self.target_nodes) == 0:
+            return None
+
+        # Heuristic values to calculate the scores
+        h = self.get_heuristics().tolist()
+
+        # Use lists for faster access to single items
+        offsets = self.offsets.tolist()
+        neighbors = self.neighbors.tolist()
+        edge_types = self.edge_types.tolist()
+        layer_costs = self.layer_costs.tolist()
+        via_costs = self.via_costs.tolist()
+        wire_cost = drc["grid"]
 
         # Initialize data structures to be used for A* search
+        node_count = self.valid.size
+        is_target = np.zeros(node_count, dtype=bool)
+        is_target[self.target_nodes] = True
+        is_target = is_target.tolist()
         queue = []
-        close_set = set()
-        came_from = {}
-        g_scores = {}
-        f_scores = {}
+        closed = [False] * node_count
+        came_from = [-1] * node_count
+        # Type of the edge used to reach each node
+        came_type = [-1] * node_count
+        g_scores = [float("inf")] * node_count
 
         # Initialize score values for the source nodes
-        for node in self.source_nodes:
-            g_scores[node.id] = 0
-            f_scores[node.id] = h(node)
-            heapq.heappush(queue, (f_scores[node.id], node.id, node))
+        for node in self.source_nodes.tolist():
+            g_scores[node] = 0
+            heapq.heappush(queue, (h[node], node))
 
         # Run the A* algorithm
         while len(queue) > 0:
             # Get the closest node from the queue
-            current = heapq.heappop(queue)[2]
+            current = heapq.heappop(queue)[1]
 
             # Skip this node if already discovered
-            if current in close_set:
+            if closed[current]:
                 continue
-            close_set.add(current)
+            closed[current] = True
 
             # Check if we've reached the target
-            if current in self.target_nodes:
+            if is_target[current]:
                 path = []
-                while current.id in came_from:
-                    path.append(current)
-                    current = came_from[current.id]
-                path.append(current)
+                while current != -1:
+                    path.append(graph_node(self.get_node_center(current)))
+                    current = came_from[current]
                 path.reverse()
                 return path
 
-            # Get the previous node to better calculate the next costs
-            prev_node = None
-            if current.id in came_from:
-                prev_node = came_from[current.id]
-
             # Update neighbor scores
-            for node in current.neighbors:
-                tentative_score = current.get_edge_cost(node, prev_node) + g_scores[current.id]
-                if node.id not in g_scores or tentative_score < g_scores[node.id]:
-                    came_from[node.id] = current
-                    g_scores[node.id] = tentative_score
-                    f_scores[node.id] = tentative_score + h(node)
-                    heapq.heappush(queue, (f_scores[node.id], node.id, node))
+            prev_type = came_type[current]
+            for i in range(offsets[current], offsets[current + 1]):
+                node = neighbors[i]
+                layer_cost = layer_costs[i]
+                # Add a constant wire cost to prevent dog-legs
+                if prev_type != -1 and prev_type != edge_types[i]:
+                    layer_cost += wire_cost
+                tentative_score = layer_cost + via_costs[i] + g_scores[current]
+                if tentative_score < g_scores[node]:
+                    came_from[node] = current
+                    came_type[node] = edge_types[i]
+                    g_scores[node] = tentative_score
+                    heapq.heappush(queue, (tentative_score + h[node], node))
 
         # Return None if not connected
         return None
@@ -13,6 +13,7 @@ class graph_shape(pin_layout):
     This class inherits the pin_layout class to change some of its behavior for
     the graph router.
     """
+    __slots__ = ("core",)
 
     def __init__(self, name, rect, layer_name_pp, core=None):
 
@@ -6,6 +6,7 @@
 """
 Utility functions for graph router.
 """
+import numpy as np
 from openram.base import vector
 from openram.tech import drc
 
@@ -15,4 +16,18 @@ def snap(a):
 
     if isinstance(a, vector):
         return vector(snap(a.x), snap(a.y))
+    if isinstance(a, np.ndarray):
+        return np.round(a, len(str(drc["grid"]).split('.')[1]))
     return round(a, len(str(drc["grid"]).split('.')[1]))
+
+
+def expand_ranges(starts, ends):
+    """
+    Return the index of the range and the value of every integer in the given
+    [start, end) ranges as two arrays.
+    """
+
+    counts = np.maximum(ends - starts, 0)
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return owners, offsets + np.arange(len(offsets))
@@ -0,0 +1,278 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California, Santa Cruz
+# All rights reserved.
+#
+import math
+import numpy as np
+from openram import debug
+from openram.base.geometry import label, rectangle
+from openram.gdsMill.gdsMill import LayerShapes
+from openram.gdsMill.gdsMill.vlsiLayout import rectangleOverlapsRegion, transformRectangles, transformPolygons
+from openram import tech
+from openram.tech import GDS
+from openram.tech import layer as tech_layer
+
+
+class layout_extractor:
+    """
+    This class flattens the shapes and top-level labels of a
+    `hierarchy_layout` object in memory. It gives the same shapes as writing
+    the design to a GDS file and reading it back with gdsMill without
+    touching the disk. It has the same `getAllShapes` and `getAllPinShapes`
+    interface as `VlsiLayout` so that the router can use either one.
+    """
+
+    def __init__(self, design):
+
+        self.design = design
+        self.units = GDS["unit"]
+        # This is the same conversion as `VlsiLayout.userUnits`
+        self.db_per_user = 1.0 / self.units[0]
+        # Flattened modules indexed by the id of the module
+        self.module_shapes = {}
+        # LayerShapes in user units indexed by lpp
+        self.shape_cache = {}
+        # Pin shapes of each top-level label
+        self.pins = {}
+
+        (self.lpps, self.rects, self.polygons) = self.flatten(design)
+        # Only the top level is needed after flattening
+        self.module_shapes = {}
+        self.find_label_pins()
+
+
+    def to_db(self, values):
+        """ Convert user units to database units the same way gdsMill does. """
+
+        return [round(float(x) * self.db_per_user) for x in values]
+
+
+    def get_box(self, offset, width, height):
+        """
+        Return a [llx, lly, urx, ury] box in database units as `VlsiLayout.addBox`
+        does. Boxes with a negative width or height are normalized like the
+        shapes read from GDS.
+        """
+
+        (x, y, width, height) = self.to_db([offset[0], offset[1], width, height])
+        return [min(x, x + width), min(y, y + height), max(x, x + width), max(y, y + height)]
+
+
+    def get_transform(self, inst):
+        """
+        Return the [u[0], u[1], v[0], v[1], x, y] transform of an instance.
+        This follows `VlsiLayout.addInstance` and `traverseTheHierarchy`:
+        the rotation is applied before the mirror.
+        """
+
+        angle = inst.rotate
+        mirror_x = False
+        if inst.mirror in ["R90", "R180", "R270"]:
+            angle = float(inst.mirror[1:])
+        if inst.mirror in ["x", "MX"]:
+            mirror_x = True
+        elif inst.mirror in ["y", "MY"]:
+            mirror_x = True
+            angle = 180
+        elif inst.mirror in ["xy", "XY"]:
+            angle = 180
+
+        angle = math.radians(float(angle or 0))
+        (cos, sin) = (math.cos(angle), math.sin(angle))
+        # Keep the common right angles exact
+        if abs(cos) < 1e-9 or abs(sin) < 1e-9:
+            (cos, sin) = (round(cos), round(sin))
+        scale_y = -1 if mirror_x else 1
+        (x, y) = self.to_db([inst.offset[0], inst.offset[1]])
+        return (cos, scale_y * sin, -sin, scale_y * cos, x, y)
+
+
+    def get_own_shapes(self, mod):
+        """
+        Return the shapes that the module itself writes to GDS (not the ones
+        of its instances) as a dict of lpp to (rects, polygons).
+        """
+
+        shapes = {}
+
+        def add_rect(lpp, rect):
+            shapes.setdefault(tuple(lpp), ([], []))[0].append(rect)
+
+        # Library cells have their shapes in their own GDS
+        if mod.is_library_cell:
+            for (lpp, (rects, polygons)) in mod.gds.getFlatShapes().items():
+                (own_rects, own_polygons) = shapes.setdefault(lpp, ([], []))
+                own_rects.extend(rects.tolist())
+                own_polygons.extend(polygons)
+
+        for obj in mod.objs:
+            if isinstance(obj, rectangle):
+                add_rect(obj.lpp, self.get_box(obj.offset, obj.width, obj.height))
+
+        for pin_list in mod.pin_map.values():
+            for pin in pin_list:
+                (shape_lpp, pin_lpp, label_lpp) = pin.get_gds_lpps()
+                box = self.get_box(pin.ll(), pin.width(), pin.height())
+                add_rect(shape_lpp, box)
+                if not pin.same_lpp(pin_lpp, shape_lpp):
+                    add_rect(pin_lpp, box)
+
+        # Same as the boundary that `hierarchy_layout.gds_write_file` adds
+        if not mod.is_library_cell and not mod.bounding_box:
+            ll = mod.find_lowest_coords()
+            ur = mod.find_highest_coords()
+            debug.check(ll and ur, "No shapes to make a boundary.")
+            for boundary_layer in ["boundary", "stdc"]:
+                if boundary_layer in tech_layer.keys():
+                    add_rect(tech_layer[boundary_layer],
+                             self.get_box(ll, ur[0] - ll[0], ur[1] - ll[1]))
+
+        return shapes
+
+
+    def flatten(self, mod):
+        """
+        Return the lpps, rectangles and polygons of a module and all of its
+        instances in the coordinates of the module. The rectangles are an array
+        of [llx, lly, urx, ury] in database units and `lpps` is an array of the
+        (layer, purpose) of each rectangle.
+        """
+
+        try:
+            return self.module_shapes[id(mod)]
+        except KeyError:
+            pass
+
+        lpps = []
+        rects = []
+        polygons = []
+        for (lpp, (own_rects, own_polygons)) in self.get_own_shapes(mod).items():
+            own_rects = np.asarray(own_rects, dtype=np.float64).reshape(-1, 4)
+            lpps.append(np.tile(np.asarray(lpp, dtype=np.int64), (len(own_rects), 1)))
+            rects.append(own_rects)
+            polygons.extend((lpp, polygon) for polygon in own_polygons)
+
+        # Transform all the placements of the same module at once
+        placements = {}
+        for inst in mod.insts:
+            placements.setdefault(id(inst.mod), (inst.mod, []))[1].append(self.get_transform(inst))
+        for (child, transforms) in placements.values():
+            (child_lpps, child_rects, child_polygons) = self.flatten(child)
+            transforms = np.array(transforms, dtype=np.float64)
+            lpps.append(np.tile(child_lpps, (len(transforms), 1)))
+            rects.append(transformRectangles(child_rects, transforms))
+            for (lpp, polygon) in child_polygons:
+                points = np.asarray(polygon, dtype=np.float64).reshape(1, -1, 2)
+                polygons.extend((lpp, new_points.reshape(-1).tolist())
+                                for new_points in transformPolygons(points, transforms))
+
+        if rects:
+            shapes = (np.concatenate(lpps).reshape(-1, 2),
+                      np.concatenate(rects).reshape(-1, 4),
+                      polygons)
+        else:
+            shapes = (np.zeros((0, 2), dtype=np.int64), np.zeros((0, 4)), polygons)
+        self.module_shapes[id(mod)] = shapes
+        return shapes
+
+
+    def get_labels(self):
+        """ Return the (text, lpp, offset) of the labels at the top level in database units. """
+
+        labels = []
+        for obj in self.design.objs:
+            if isinstance(obj, label):
+                labels.append((obj.text, obj.lpp, self.to_db([obj.offset[0], obj.offset[1]])))
+        for pin_list in self.design.pin_map.values():
+            for pin in pin_list:
+                (shape_lpp, pin_lpp, label_lpp) = pin.get_gds_lpps()
+                center = pin.center()
+                labels.append((pin.name, label_lpp, self.to_db([center[0], center[1]])))
+        return labels
+
+
+    def find_label_pins(self):
+        """
+        Map each top-level label to the shapes on its layer (of any purpose)
+        that contain it like `VlsiLayout.processLabelPins`.
+        """
+
+        layer_override = getattr(tech, "layer_override", {})
+
+        for (text, label_lpp, offset) in self.get_labels():
+            lpp = (label_lpp[0], None)
+            shapes = self.getLayerShapes(lpp)
+            if text in layer_override and layer_override[text]:
+                override_shapes = self.getLayerShapes((layer_override[text][0], None))
+                if len(override_shapes) > 0:
+                    shapes = override_shapes
+                    lpp = layer_override[text]
+            user_offset = [x * self.units[0] for x in offset]
+            pin_shapes = [(lpp, boundary) for boundary in shapes.getShapesContaining(user_offset)]
+            self.pins.setdefault(text, []).append(pin_shapes)
+
+
+    def getLayerShapes(self, lpp):
+        """ Return a LayerShapes with all the unique shapes on a layer in user units. """
+
+        if isinstance(lpp[1], list):
+            key = (lpp[0], tuple(lpp[1]))
+        else:
+            key = tuple(lpp)
+        try:
+            return self.shape_cache[key]
+        except KeyError:
+            pass
+
+        # A purpose of None matches all purposes
+        mask = self.lpps[:, 0] == lpp[0]
+        if isinstance(lpp[1], list):
+            mask &= np.isin(self.lpps[:, 1], lpp[1])
+        elif lpp[1] is not None:
+            mask &= self.lpps[:, 1] == lpp[1]
+        rects = self.rects[mask]
+        if len(rects):
+            rects = np.unique(rects, axis=0) * self.units[0]
+
+        polygons = set()
+        for (polygon_lpp, polygon) in self.polygons:
+            if polygon_lpp[0] != lpp[0]:
+                continue
+            if isinstance(lpp[1], list) and polygon_lpp[1] not in lpp[1]:
+                continue
+            if not isinstance(lpp[1], list) and lpp[1] is not None and polygon_lpp[1] != lpp[1]:
+                continue
+            polygons.add(tuple(polygon))
+        user_polygons = [[x * self.units[0] for x in polygon] for polygon in polygons]
+
+        shapes = LayerShapes(rects, user_polygons)
+        self.shape_cache[key] = shapes
+        return shapes
+
+
+    def getAllShapes(self, lpp, region=None):
+        """
+        Return all shapes on a given layer in [llx, lly, urx, ury] format for
+        rectangles and [x1, y1, x2, y2, ...] for polygons in user units.
+        If a region of (ll, ur) is given, only return the ones that overlap it.
+        """
+
+        return self.getLayerShapes(lpp).getShapes(region)
+
+
+    def getAllPinShapes(self, pin_name, region=None):
+        """
+        Return all the shapes that enclose the labels of a pin as
+        (lpp, boundary) pairs. If a region of (ll, ur) is given,
+        only return the ones that overlap it.
+        """
+
+        shape_list = []
+        for pin_list in self.pins[pin_name]:
+            for pin in pin_list:
+                (pin_lpp, boundary) = pin
+                if region and not rectangleOverlapsRegion(boundary, region):
+                    continue
+                shape_list.append(pin)
+        return shape_list
@@ -5,14 +5,13 @@
 #
 from openram import debug
 from openram.base.vector import vector
-from openram.gdsMill import gdsMill
-from openram.tech import GDS
 from openram.tech import drc
 from openram.tech import layer as tech_layer
-from openram import OPTS
 from .graph_shape import graph_shape
 from .graph_utils import snap
+from .layout_extractor import layout_extractor
 from .router_tech import router_tech
+from .shape_index import shape_index
 
 
 class router(router_tech):
@@ -29,8 +28,6 @@ class router(router_tech):
         self.layers = layers
         # This is the `hierarchy_layout` object
         self.design = design
-        # Temporary GDSII file name to find pins and blockages
-        self.gds_filename = OPTS.openram_temp + "temp.gds"
         # Calculate the bounding box for routing around the perimeter
         # FIXME: We wouldn't do this if `rom_bank` wasn't behaving weird
         if bbox is None:
@@ -41,13 +38,15 @@ class router(router_tech):
             self.bbox = [ll - margin, ur + margin]
         # Dictionary for vdd and gnd pins
         self.pins = {}
-        # Set of all the pins
-        self.all_pins = set()
+        # All the pins in a spatial index
+        self.all_pins = shape_index(self.track_width * 10)
         # This is all the blockages including the pins. The graph class handles
         # pins as blockages while considering their routability
-        self.blockages = []
+        # NOTE: These are kept in spatial indices for the whole routing since
+        # each graph and shape check only needs the shapes around it
+        self.blockages = shape_index(self.track_width * 10)
         # This is all the vias between routing layers
-        self.vias = []
+        self.vias = shape_index(self.track_width * 10)
         # Fake pins are imaginary pins on the side supply pins to route other
         # pins to them
         self.fake_pins = []
@@ -57,34 +56,39 @@ class router(router_tech):
 
 
     def prepare_gds_reader(self):
-        """ Write the current layout to a temporary file to read the layout. """
+        """ Flatten the current layout in memory to find pins and blockages. """
 
-        # NOTE: Avoid using this function if possible since it is too slow to
-        # write/read these files
-        self.design.gds_write(self.gds_filename)
-        self.layout = gdsMill.VlsiLayout(units=GDS["unit"])
-        self.reader = gdsMill.Gds2reader(self.layout)
-        self.reader.loadFromFile(self.gds_filename)
+        self.layout = layout_extractor(self.design)
 
 
-    def merge_shapes(self, merger, shape_list):
+    def merge_shapes(self, merger, shapes):
         """
-        Merge shapes in the list into the merger if they are contained or
+        Merge shapes in the index into the merger if they are contained or
         aligned by the merger.
         """
 
         merger_core = merger.get_core()
-        for shape in list(shape_list):
+        # Only the shapes that overlap the merger can be contained or aligned
+        shape_list = shapes.overlapping(merger_core.rect, lpp=merger_core.lpp)
+        i = 0
+        while i < len(shape_list):
+            shape = shape_list[i]
+            i += 1
             shape_core = shape.get_core()
-            # If merger contains the shape, remove it from the list
+            # If merger contains the shape, remove it from the index
             if merger_core.contains(shape_core):
-                shape_list.remove(shape)
+                shapes.remove(shape)
             # If the merger aligns with the shape, expand the merger and remove
-            # the shape from the list
+            # the shape from the index
             elif merger_core.aligns(shape_core):
                 merger.bbox([shape])
                 merger_core.bbox([shape_core])
-                shape_list.remove(shape)
+                since = shapes.get_order(shape) + 1
+                shapes.remove(shape)
+                # The merger is bigger now, so check the later shapes that
+                # overlap it
+                shape_list = shapes.overlapping(merger_core.rect, since, merger_core.lpp)
+                i = 0
 
 
     def find_pins(self, pin_name):
@@ -92,7 +96,7 @@ class router(router_tech):
         debug.info(4, "Finding all pins for {}".format(pin_name))
 
         shape_list = self.layout.getAllPinShapes(str(pin_name))
-        pin_set = set()
+        pin_index = shape_index(self.track_width * 10)
         for shape in shape_list:
             layer, boundary = shape
             # gdsMill boundaries are in (left, bottom, right, top) order
@@ -101,14 +105,14 @@ class router(router_tech):
             rect = [ll, ur]
             new_pin = graph_shape(pin_name, rect, layer)
             # Skip this pin if it's contained by another pin of the same type
-            if new_pin.core_contained_by_any(pin_set):
+            if new_pin.core_contained_by_any(pin_index.overlapping(new_pin.rect, lpp=new_pin.lpp)):
                 continue
             # Merge previous pins into this one if possible
-            self.merge_shapes(new_pin, pin_set)
-            pin_set.add(new_pin)
+            self.merge_shapes(new_pin, pin_index)
+            pin_index.append(new_pin)
         # Add these pins to the 'pins' dict
-        self.pins[pin_name] = pin_set
-        self.all_pins.update(pin_set)
+        self.pins[pin_name] = set(pin_index)
+        self.all_pins.extend(pin_index)
 
 
     def find_blockages(self, name="blockage", shape_list=None):
@@ -136,8 +140,9 @@ class router(router_tech):
                 new_shape = self.inflate_shape(new_shape)
                 # Skip this blockage if it's contained by a pin or an existing
                 # blockage
-                if new_shape.core_contained_by_any(self.all_pins) or \
-                   new_shape.core_contained_by_any(self.blockages):
+                core = new_shape.get_core()
+                if new_shape.core_contained_by_any(self.all_pins.overlapping(core.rect, lpp=lpp)) or \
+                   new_shape.core_contained_by_any(self.blockages.overlapping(core.rect, lpp=lpp)):
                     continue
                 # Merge previous blockages into this one if possible
                 self.merge_shapes(new_shape, self.blockages)
@@ -169,7 +174,7 @@ class router(router_tech):
             rect = [ll, ur]
             new_shape = graph_shape("via", rect, valid_lpp)
             # Skip this via if it's contained by an existing via blockage
-            if new_shape.contained_by_any(self.vias):
+            if new_shape.contained_by_any(self.vias.overlapping(new_shape.rect, lpp=valid_lpp)):
                 continue
             self.vias.append(self.inflate_shape(new_shape))
 
@@ -179,7 +184,7 @@ class router(router_tech):
 
         for via in self.vias:
             via_core = via.get_core()
-            for pin in self.all_pins:
+            for pin in self.all_pins.overlapping(via_core.rect):
                 pin_core = pin.get_core()
                 via_core.lpp = pin_core.lpp
                 # If the via overlaps a pin, change its name
@@ -195,14 +200,14 @@ class router(router_tech):
         # be connected to a pin through a via.
         for blockage in self.blockages:
             blockage_core = blockage.get_core()
-            for pin in self.all_pins:
+            for pin in self.all_pins.overlapping(blockage_core.rect, lpp=blockage_core.lpp):
                 pin_core = pin.get_core()
                 # If the blockage overlaps a pin, change its name
                 if blockage_core.overlaps(pin_core):
                     blockage.rename(pin.name)
                     break
             else:
-                for via in self.vias:
+                for via in self.vias.overlapping(blockage_core.rect):
                     # Skip if this via isn't connected to a pin
                     if via.name == "via":
                         continue
@@ -326,9 +331,9 @@ class router(router_tech):
                     self.add_object_info(blockage, "blockage{}++[{}]".format(self.get_zindex(blockage.lpp), blockage.name))
                 else:
                     self.add_object_info(blockage, "blockage{}[{}]".format(self.get_zindex(blockage.lpp), blockage.name))
-            for node in g.nodes:
-                offset = (node.center.x, node.center.y)
-                self.design.add_label(text="n{}".format(node.center.z),
+            for center in g.get_node_centers():
+                offset = (center[0], center[1])
+                self.design.add_label(text="n{}".format(center[2]),
                                       layer="text",
                                       offset=offset)
         else:
@@ -0,0 +1,124 @@
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California, Santa Cruz
+# All rights reserved.
+#
+import math
+
+
+class shape_index:
+    """
+    This class is a list of shapes that also keeps the shapes in the buckets
+    of a uniform grid. Shapes overlapping a region can be found by only
+    checking the buckets that the region covers. Shapes are added and removed
+    incrementally as the router creates new wires and vias.
+    Buckets are also keyed by the layer number of the shapes' lpp so that
+    queries for a single layer don't check shapes on other layers. Purposes
+    are ignored since `pin_layout.same_lpp` matches any purpose with None.
+    """
+
+    def __init__(self, bucket_size):
+
+        self.bucket_size = bucket_size
+        # (order, shape) pairs indexed by the id of the shape
+        self.shapes = {}
+        self.count = 0
+        # Sets of shape ids indexed by (layer, x, y) bucket coordinates
+        self.buckets = {}
+        # Layer numbers of the shapes in the index
+        self.layers = set()
+
+
+    def __iter__(self):
+
+        return iter([shape for _, shape in self.shapes.values()])
+
+
+    def __len__(self):
+
+        return len(self.shapes)
+
+
+    def __contains__(self, shape):
+
+        return id(shape) in self.shapes
+
+
+    def get_buckets(self, rect, layer):
+        """
+        Return the coordinates of the buckets that a rectangle covers on a
+        layer.
+        """
+
+        ll, ur = rect
+        size = self.bucket_size
+        for x in range(math.floor(ll.x / size), math.floor(ur.x / size) + 1):
+            for y in range(math.floor(ll.y / size), math.floor(ur.y / size) + 1):
+                yield (layer, x, y)
+
+
+    def get_order(self, shape):
+        """ Return the order in which a shape was added to the index. """
+
+        return self.shapes[id(shape)][0]
+
+
+    def append(self, shape):
+        """ Add a shape to the index. """
+
+        self.shapes[id(shape)] = (self.count, shape)
+        self.count += 1
+        self.layers.add(shape.lpp[0])
+        for key in self.get_buckets(shape.rect, shape.lpp[0]):
+            self.buckets.setdefault(key, set()).add(id(shape))
+
+
+    def extend(self, shapes):
+        """ Add all shapes in a list to the index. """
+
+        for shape in shapes:
+            self.append(shape)
+
+
+    def remove(self, shape):
+        """
+        Remove a shape from the index. Shapes are found by identity, so the
+        rectangle and lpp of a shape must not be changed while it is in the
+        index.
+        """
+
+        del self.shapes[id(shape)]
+        for key in self.get_buckets(shape.rect, shape.lpp[0]):
+            bucket = self.buckets[key]
+            bucket.discard(id(shape))
+            if not bucket:
+                del self.buckets[key]
+
+
+    def overlapping(self, rect, since=0, lpp=None):
+        """
+        Return the shapes whose rectangles overlap the given rectangle
+        (including the edges) in the order they were added. If `since` is
+        given, only return the shapes added after the index had that many
+        additions. If `lpp` is given, only return the shapes on its layer.
+        """
+
+        ll, ur = rect
+        if lpp is None:
+            layers = self.layers
+        else:
+            layers = [lpp[0]]
+        ids = set()
+        for layer in layers:
+            for key in self.get_buckets(rect, layer):
+                ids.update(self.buckets.get(key, ()))
+        shapes = []
+        for shape_id in ids:
+            order, shape = self.shapes[shape_id]
+            if order < since:
+                continue
+            sll, sur = shape.rect
+            if sll.x <= ur.x and ll.x <= sur.x and sll.y <= ur.y and ll.y <= sur.y:
+                shapes.append((order, shape))
+        shapes.sort(key=lambda x: x[0])
+        return [shape for _, shape in shapes]
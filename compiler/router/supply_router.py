@@ -3,12 +3,16 @@
 # Copyright (c) 2016-2024 Regents of the University of California, Santa Cruz
 # All rights reserved.
 #
+import multiprocessing
+from copy import deepcopy
 from openram import debug
 from openram.base.vector import vector
 from openram import OPTS
 from .graph import graph
+from .graph_node import graph_node
 from .graph_shape import graph_shape
 from .router import router
+from .shape_index import shape_index
 
 
 class supply_router(router):
@@ -67,29 +71,126 @@ class supply_router(router):
             self.blockages.append(self.inflate_shape(pin))
 
         # Route vdd and gnd
-        routed_count = 0
-        routed_max = len(self.pins[vdd_name]) + len(self.pins[gnd_name])
+        self.routed_count = 0
+        self.routed_max = len(self.pins[vdd_name]) + len(self.pins[gnd_name])
+        pairs = []
         for pin_name in [vdd_name, gnd_name]:
             pins = self.pins[pin_name]
             # Route closest pins according to the minimum spanning tree
             for source, target in self.get_mst_pairs(list(pins)):
-                # Create the graph
-                g = graph(self)
-                g.create_graph(source, target)
-                # Find the shortest path from source to target
-                path = g.find_shortest_path()
-                # If no path is found, throw an error
-                if path is None:
-                    self.write_debug_gds(gds_name="{}error.gds".format(OPTS.openram_temp), g=g, source=source, target=target)
-                    debug.error("Couldn't route from {} to {}.".format(source, target), -1)
-                # Create the path shapes on layout
-                new_wires, new_vias = self.add_path(path)
-                # Find the recently added shapes
-                self.find_blockages(pin_name, new_wires)
-                self.find_vias(new_vias)
-                # Report routed count
-                routed_count += 1
-                debug.info(2, "Routed {} of {} supply pins".format(routed_count, routed_max))
+                pairs.append((pin_name, source, target))
+        if OPTS.num_threads > 1 and "fork" in multiprocessing.get_all_start_methods():
+            self.route_batches(pairs)
+        else:
+            for pin_name, source, target in pairs:
+                self.route_pair(pin_name, source, target)
+
+
+    def route_pair(self, pin_name, source, target, path=None):
+        """
+        Route from source to target and add the path to the layout. If the
+        path is given, it is added without running the search again.
+        """
+
+        if path is None:
+            # Create the graph
+            g = graph(self)
+            g.create_graph(source, target)
+            # Find the shortest path from source to target
+            path = g.find_shortest_path()
+            # If no path is found, throw an error
+            if path is None:
+                self.write_debug_gds(gds_name="{}error.gds".format(OPTS.openram_temp), g=g, source=source, target=target)
+                debug.error("Couldn't route from {} to {}.".format(source, target), -1)
+        # Create the path shapes on layout
+        new_wires, new_vias = self.add_path(path)
+        # Find the recently added shapes
+        self.find_blockages(pin_name, new_wires)
+        self.find_vias(new_vias)
+        # Report routed count
+        self.routed_count += 1
+        debug.info(2, "Routed {} of {} supply pins".format(self.routed_count, self.routed_max))
+
+
+    def route_batches(self, pairs):
+        """
+        Route the pairs in batches whose routing regions don't overlap. Paths
+        of a batch are found in parallel and added to the layout in the order
+        of the batch. If the real routing region of a path overlaps a shape
+        added by an earlier path of the same batch, that pair is routed again
+        serially so that each path is the same as routing the pairs one at a
+        time in the order of the batch.
+        """
+
+        global batch_router, batch_pairs
+
+        # Routing regions are estimated once for all pairs
+        pending = [(pair, self.get_region(pair)) for pair in pairs]
+        while pending:
+            batch = self.get_batch(pending)
+            # Forking the workers isn't worth it if some of them would be idle
+            if len(batch) < OPTS.num_threads:
+                for pair in batch:
+                    self.route_pair(*pair)
+                continue
+            debug.info(3, "Routing a batch of {} pairs in parallel.".format(len(batch)))
+
+            # Worker processes are forked for each batch so that they share
+            # the current blockages without copying them
+            batch_router = self
+            batch_pairs = batch
+            context = multiprocessing.get_context("fork")
+            with context.Pool(processes=OPTS.num_threads) as pool:
+                results = pool.map(find_batch_path, range(len(batch)))
+            batch_router = None
+            batch_pairs = None
+
+            # Add the paths to the layout in a deterministic order
+            blockage_count = self.blockages.count
+            via_count = self.vias.count
+            for (pin_name, source, target), (centers, region) in zip(batch, results):
+                if centers is None or \
+                   self.blockages.overlapping(region, blockage_count) or \
+                   self.vias.overlapping(region, via_count):
+                    debug.info(3, "Rerouting from {} to {} serially.".format(source, target))
+                    self.route_pair(pin_name, source, target)
+                else:
+                    path = [graph_node(center) for center in centers]
+                    self.route_pair(pin_name, source, target, path)
+
+
+    def get_region(self, pair):
+        """
+        Estimate the routing region of a pair the same way the graph does.
+        """
+
+        _, source, target = pair
+        region = deepcopy(source)
+        region.bbox([target])
+        region = region.inflated_pin(spacing=self.track_width + self.track_space)
+        region.bbox(self.blockages.overlapping(region.rect))
+        return region
+
+
+    def get_batch(self, pending):
+        """
+        Remove and return the next batch of pairs from the pending (pair,
+        region) tuples. A pair joins the batch if its routing region doesn't
+        overlap the regions of the pairs in the batch or the pairs skipped
+        before it.
+        """
+
+        batch = []
+        skipped = []
+        regions = shape_index(self.track_width * 10)
+        for pair, region in pending:
+            if regions.overlapping(region.rect):
+                skipped.append((pair, region))
+            else:
+                batch.append(pair)
+            regions.append(region)
+        pending[:] = skipped
+        return batch
 
 
     def add_side_pin(self, pin_name, side, num_vias=3, num_fake_pins=4):
@@ -257,3 +358,25 @@ class supply_router(router):
         """ Return the new supply pins added by this router. """
 
         return self.new_pins[name]
+
+
+# The router and the pairs of the batch that is being routed. Forked worker
+# processes inherit these.
+batch_router = None
+batch_pairs = None
+
+
+def find_batch_path(index):
+    """
+    Find the path of a pair in the current batch. Return the node centers of
+    the path and the final routing region of the graph.
+    """
+
+    _, source, target = batch_pairs[index]
+    g = graph(batch_router)
+    g.create_graph(source, target)
+    path = g.find_shortest_path()
+    if path is None:
+        return None, None
+    centers = [(node.center.x, node.center.y, node.center.z) for node in path]
+    return centers, g.region.rect
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os, re
+import unittest
+from testutils import *
+
+import openram
+from openram import debug
+from openram import OPTS
+
+
+class gds_reader_test(openram_test):
+    """ Check that the memory-mapped reader matches the original reader. """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        from openram.gdsMill import gdsMill
+        from openram.tech import GDS
+
+        gds_dir = OPTS.openram_tech + "/gds_lib"
+        nametest = re.compile("\.gds$", re.IGNORECASE)
+        gds_files = list(filter(nametest.search, os.listdir(gds_dir)))
+        debug.info(1, "Reading: " + ", ".join(gds_files))
+
+        for f in gds_files:
+            gds_name = "{0}/{1}".format(gds_dir, f)
+            layout = gdsMill.VlsiLayout(units=GDS["unit"])
+            gdsMill.Gds2reader(layout).loadFromFile(gds_name)
+            mmap_layout = gdsMill.VlsiLayout(units=GDS["unit"])
+            gdsMill.Gds2mmapReader(mmap_layout).loadFromFile(gds_name)
+
+            self.assertEqual(layout.info, mmap_layout.info)
+            self.assertEqual(layout.layerNumbersInUse, mmap_layout.layerNumbersInUse)
+            self.assertEqual(layout.rootStructureName, mmap_layout.rootStructureName)
+            self.assertEqual(layout.pins, mmap_layout.pins)
+            self.assertEqual(list(layout.structures.keys()), list(mmap_layout.structures.keys()))
+            for (name, structure) in layout.structures.items():
+                mmap_structure = mmap_layout.structures[name]
+                for elements in ["boundaries", "paths", "srefs", "arefs", "texts", "nodes", "boxes"]:
+                    self.assertEqual([vars(x) for x in getattr(structure, elements)],
+                                     [vars(x) for x in getattr(mmap_structure, elements)])
+
+        openram.end_openram()
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
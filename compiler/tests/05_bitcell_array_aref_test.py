@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from testutils import *
+
+import openram
+from openram import debug
+from openram.sram_factory import factory
+from openram import OPTS
+
+
+class bitcell_array_aref_test(openram_test):
+    """ Check that the cells of a bitcell array are written as AREFs. """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        from openram.base import vector
+        from openram.gdsMill import gdsMill
+        from openram.tech import GDS
+        from openram.tech import layer as tech_layer
+
+        debug.info(2, "Testing AREFs of a 4x4 array")
+        a = factory.create(module_type="bitcell_array", cols=4, rows=4)
+        gds_name = OPTS.openram_temp + "bitcell_array_aref.gds"
+        a.gds_write(gds_name)
+
+        for reader in [gdsMill.Gds2reader, gdsMill.Gds2mmapReader]:
+            layout = gdsMill.VlsiLayout(units=GDS["unit"])
+            reader(layout).loadFromFile(gds_name)
+            structure = layout.structures[a.name]
+            # One AREF for each combination of row and column mirroring
+            self.assertEqual(len(structure.arefs), (1 + a.cell.mirror.x) * (1 + a.cell.mirror.y))
+            self.assertEqual(len(structure.srefs), 0)
+
+            # The AREFs must have the shapes of every cell at its placement
+            shapes = layout.getAllShapes(tech_layer["m1"])
+            self.assertEqual(self.normalize(shapes), self.normalize(self.get_shapes(a, tech_layer["m1"])))
+
+        debug.info(2, "Testing a moved element of a 4x4 array")
+        inst = a.insts[0]
+        inst.place(inst.offset + vector(1, 0), inst.mirror, inst.rotate)
+        self.assertEqual(a.cell_array.get_transforms()[0][4], inst.offset.x)
+        a.gds_write(gds_name)
+
+        # The cells are written one by one at the placement of their instances
+        layout = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.Gds2mmapReader(layout).loadFromFile(gds_name)
+        structure = layout.structures[a.name]
+        self.assertEqual(len(structure.arefs), 0)
+        self.assertEqual(len(structure.srefs), len(a.insts))
+        shapes = layout.getAllShapes(tech_layer["m1"])
+        self.assertEqual(self.normalize(shapes), self.normalize(self.get_shapes(a, tech_layer["m1"])))
+
+        openram.end_openram()
+
+    def get_shapes(self, a, lpp):
+        """ Return the shapes of the cells at the placement of their instances and the pins. """
+        shapes = []
+        for inst in a.insts:
+            (u0, u1, v0, v1, x, y) = inst.get_transform()
+            for (left, bottom, right, top) in inst.mod.gds.getAllShapes(lpp):
+                xs = [left * u0 + bottom * v0 + x, right * u0 + top * v0 + x]
+                ys = [left * u1 + bottom * v1 + y, right * u1 + top * v1 + y]
+                shapes.append([min(xs), min(ys), max(xs), max(ys)])
+        for pin_name in a.pins:
+            for pin in a.get_pins(pin_name):
+                if pin.lpp == lpp:
+                    shapes.append([pin.lx(), pin.by(), pin.rx(), pin.uy()])
+        return shapes
+
+    def normalize(self, shapes):
+        """
+        Return the shapes as a set of rounded coordinates since the shapes
+        of overlapping cells are only kept once.
+        """
+        return set(tuple(round(x, 4) for x in shape) for shape in shapes)
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from testutils import *
+
+import openram
+from openram import debug
+from openram.sram_factory import factory
+from openram import OPTS
+
+
+class layout_extractor_test(openram_test):
+    """ Check that the extracted shapes match the shapes of the written GDS. """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        from openram.gdsMill import gdsMill
+        from openram.router.layout_extractor import layout_extractor
+        from openram.tech import GDS
+        from openram.tech import layer as tech_layer
+
+        debug.info(2, "Testing pinv, bitcell_array and hierarchical_decoder")
+        designs = [factory.create(module_type="pinv", size=1),
+                   factory.create(module_type="bitcell_array", cols=4, rows=4),
+                   factory.create(module_type="hierarchical_decoder", num_outputs=16)]
+
+        lpps = set((lpp[0], lpp[1]) for lpp in tech_layer.values())
+        for d in designs:
+            gds_name = OPTS.openram_temp + "{}.gds".format(d.name)
+            d.gds_write(gds_name)
+            layout = gdsMill.VlsiLayout(units=GDS["unit"])
+            gdsMill.Gds2reader(layout).loadFromFile(gds_name)
+            extractor = layout_extractor(d)
+
+            for lpp in lpps:
+                self.assertEqual(self.normalize(extractor.getAllShapes(lpp)),
+                                 self.normalize(layout.getAllShapes(lpp)),
+                                 "{0} shapes on {1}".format(d.name, lpp))
+            for pin_name in d.pins:
+                self.assertEqual(self.normalize_pins(extractor.getAllPinShapes(pin_name)),
+                                 self.normalize_pins(layout.getAllPinShapes(pin_name)),
+                                 "{0} pin {1}".format(d.name, pin_name))
+
+        openram.end_openram()
+
+    def normalize(self, shapes):
+        """ Return the shapes as a set of rounded coordinates. """
+        return set(tuple(round(x, 4) for x in shape) for shape in shapes)
+
+    def normalize_pins(self, pins):
+        """ Return the pin shapes as a sorted list of layers and rounded boundaries. """
+        return sorted((tuple(lpp), tuple(round(x, 4) for x in boundary)) for (lpp, boundary) in pins)
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
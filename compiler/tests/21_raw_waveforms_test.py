@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from testutils import *
+import numpy as np
+
+import openram
+from openram import debug
+from openram import OPTS
+
+
+class raw_waveforms_test(openram_test):
+    """ Compute measurements from binary and ASCII raw files. """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        from openram.characterizer import raw_waveforms
+        from openram.characterizer import stimuli, spice_results
+        from openram.characterizer import delay_measure, slew_measure, power_measure
+        from openram.characterizer import voltage_when_measure, voltage_at_measure
+
+        # a rises between 1ns and 2ns, b falls between 3ns and 5ns and the
+        # supply draws 1mA
+        time = np.linspace(0, 10e-9, 1001)
+        a = np.interp(time, [1e-9, 2e-9], [0, 5])
+        b = np.interp(time, [3e-9, 5e-9], [5, 0])
+        vdd = np.full(len(time), 5.0)
+        current = np.full(len(time), -1e-3)
+        values = np.column_stack((time, a, b, vdd, current))
+        names = ["time", "v(a)", "v(b)", "v(vdd)", "vvdd#branch"]
+
+        binary_file = OPTS.openram_temp + "binary.raw"
+        self.write_raw(binary_file, names, values, True)
+        ascii_file = OPTS.openram_temp + "ascii.raw"
+        self.write_raw(ascii_file, names, values, False)
+
+        # The measurements are registered by writing them to a stimulus like
+        # the characterizer does
+        sf = open(OPTS.openram_temp + "raw_stim.sp", "w")
+        mf = open(OPTS.openram_temp + "raw_meas.sp", "w")
+        stim = stimuli(sf, mf, (OPTS.process_corners[0], 5, 25))
+        delay = delay_measure("delay", "a", "b", "RISE", "FALL", measure_scale=1e9, has_port=False)
+        delay.write_measure(stim, (0, 0, 5))
+        slew = slew_measure("slew", "b", "FALL", measure_scale=1e9, has_port=False)
+        slew.write_measure(stim, (0, 0, 5))
+        power = power_measure("power", has_port=False)
+        power.write_measure(stim, (1, 9))
+        when = voltage_when_measure("when", "a", "b", "RISE", 0.5, has_port=False)
+        when.write_measure(stim, (0, 5))
+        at = voltage_at_measure("at", "b", has_port=False)
+        at.write_measure(stim, (4,))
+        stim.gen_meas_power("leakage_power", 1, 9)
+        stim.gen_meas_find_voltage_at_time("late_value", "a", 20)
+        # The crossings must be after the delay
+        stim.gen_meas_delay("late_delay", "a", "b", 2.5, 2.5, "RISE", "FALL", 3, 0)
+        sf.close()
+        mf.close()
+
+        for filename in [binary_file, ascii_file]:
+            measures = stim.get_waveform_measures(raw_waveforms(filename))
+            self.assertAlmostEqual(measures["delay"] * 1e9, 2.5)
+            self.assertAlmostEqual(measures["slew"] * 1e9, 1.6)
+            self.assertAlmostEqual(measures["power"] * 1e3, 5)
+            self.assertAlmostEqual(measures["when"], 5)
+            self.assertAlmostEqual(measures["at"], 2.5)
+            self.assertAlmostEqual(measures["leakage_power"] * 1e3, 5)
+            # Failed measurements are left out
+            self.assertNotIn("late_value", measures)
+            self.assertNotIn("late_delay", measures)
+
+            # The measurements are retrieved like the ones of the simulators
+            results = spice_results(values=measures)
+            self.assertAlmostEqual(delay.retrieve_measure(results=results), 2.5)
+            self.assertAlmostEqual(slew.retrieve_measure(results=results), 1.6)
+
+        openram.end_openram()
+
+    def write_raw(self, filename, names, values, binary):
+        """ Write the values to a SPICE3 raw file like ngspice. """
+        with open(filename, "wb") as f:
+            header = "Title: raw waveforms test\n"
+            header += "Plotname: Transient Analysis\n"
+            header += "Flags: real\n"
+            header += "No. Variables: {}\n".format(len(names))
+            header += "No. Points: {}\n".format(len(values))
+            header += "Variables:\n"
+            for (i, name) in enumerate(names):
+                header += "\t{}\t{}\tvoltage\n".format(i, name)
+            if binary:
+                f.write((header + "Binary:\n").encode())
+                f.write(values.astype(np.float64).tobytes())
+            else:
+                f.write((header + "Values:\n").encode())
+                for (i, point) in enumerate(values):
+                    f.write(" {}\t{}\n".format(i, "\n\t".join(repr(v) for v in point)).encode())
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
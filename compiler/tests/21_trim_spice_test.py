@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from testutils import *
+
+import openram
+from openram import debug
+from openram import OPTS
+
+
+class trim_spice_test(openram_test):
+    """ Trim a netlist for two addresses after parsing it once. """
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        from openram.characterizer.trim_spice import trim_spice
+
+        # A 4x4 array with one word per row
+        lines = ["* trim_spice test netlist",
+                 ".SUBCKT cell bl br wl vdd gnd",
+                 "M0 bl wl q gnd nmos_vtg w=0.1u l=0.05u",
+                 ".ENDS cell",
+                 ".SUBCKT bitcell_array bl0_0 br0_0 bl0_1 br0_1 bl0_2 br0_2 bl0_3 br0_3",
+                 "+ bl0_20 br0_20 wl0_0 wl0_1 wl0_2 wl0_3 vdd gnd"]
+        for row in range(4):
+            for col in range(4):
+                if (row, col) == (2, 1):
+                    # An instance with a continuation line
+                    lines.append("Xbit_r{0}_c{1} bl0_{1} br0_{1}".format(row, col))
+                    lines.append("+ wl0_{0} vdd gnd cell".format(row))
+                else:
+                    lines.append("Xbit_r{0}_c{1} bl0_{1} br0_{1} wl0_{0} vdd gnd cell".format(row, col))
+        # The bit line pattern of column 2 must not match bl0_20
+        lines.append("Xbit_r3_c20 bl0_20 br0_20 wl0_3 vdd gnd cell")
+        lines.append(".ENDS bitcell_array")
+        lines.append(".SUBCKT sense_amp_array bl_0 br_0 bl_1 br_1 bl_2 br_2 bl_3 br_3 en vdd gnd")
+        for col in range(4):
+            lines.append("Xsa{0} bl_{0} br_{0} data_{0} en vdd gnd sense_amp".format(col))
+        lines.append(".ENDS sense_amp_array")
+
+        sp_file = OPTS.openram_temp + "trim.sp"
+        with open(sp_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        trimmer = trim_spice(sp_file, OPTS.openram_temp + "reduced.sp")
+        trimmer.set_configuration(1, 4, 4, 4)
+
+        debug.info(2, "Trimming for word line 2 and bit line 2")
+        trimmer.trim("10", 2)
+        (header, insts) = self.read_netlist(OPTS.openram_temp + "reduced.sp")
+        self.assertEqual(insts["bitcell_array"],
+                         ["Xbit_r0_c2", "Xbit_r1_c2", "Xbit_r2_c0", "Xbit_r2_c1", "Xbit_r2_c2", "Xbit_r2_c3", "Xbit_r3_c2"])
+        self.assertEqual(insts["sense_amp_array"], ["Xsa2"])
+        self.assertEqual(insts["cell"], ["M0"])
+        self.assertEqual(len([x for x in header if "TRIMMED NETLIST" in x]), 1)
+        # The continuation line is kept with its instance
+        with open(OPTS.openram_temp + "reduced.sp", "r") as f:
+            self.assertIn("Xbit_r2_c1 bl0_1 br0_1\n+ wl0_2 vdd gnd cell\n", f.read())
+
+        debug.info(2, "Trimming the same netlist for word line 1 and bit line 1")
+        trimmer.trim("01", 1, OPTS.openram_temp + "reduced1.sp")
+        (header, insts) = self.read_netlist(OPTS.openram_temp + "reduced1.sp")
+        self.assertEqual(insts["bitcell_array"],
+                         ["Xbit_r0_c1", "Xbit_r1_c0", "Xbit_r1_c1", "Xbit_r1_c2", "Xbit_r1_c3", "Xbit_r2_c1", "Xbit_r3_c1"])
+        self.assertEqual(insts["sense_amp_array"], ["Xsa1"])
+        self.assertEqual(len([x for x in header if "TRIMMED NETLIST" in x]), 1)
+        self.assertEqual([x for x in header if x.startswith("* Keeping wl")], ["* Keeping wl_1 (trimming other WLs)"])
+
+        openram.end_openram()
+
+    def read_netlist(self, filename):
+        """ Return the comments before the first subcircuit and the instances of each subcircuit. """
+        header = []
+        insts = {}
+        subckt = None
+        with open(filename, "r") as f:
+            for line in f:
+                words = line.split()
+                if not words or words[0] == "+":
+                    continue
+                if words[0].upper() == ".SUBCKT":
+                    subckt = words[1]
+                    insts[subckt] = []
+                elif words[0].upper() == ".ENDS":
+                    subckt = None
+                elif subckt:
+                    insts[subckt].append(words[0])
+                elif not insts:
+                    header.append(line.strip())
+        for subckt in insts:
+            insts[subckt].sort()
+        return (header, insts)
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
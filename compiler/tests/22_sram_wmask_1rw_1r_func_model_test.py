@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from testutils import *
+
+import openram
+from openram import debug
+from openram.sram_factory import factory
+from openram import OPTS
+
+
+class sram_wmask_1rw_1r_func_model_test(openram_test):
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        OPTS.netlist_only = True
+        OPTS.trim_netlist = False
+
+        OPTS.num_rw_ports = 1
+        OPTS.num_w_ports = 0
+        OPTS.num_r_ports = 1
+        openram.setup_bitcell()
+
+        from openram.characterizer import functional
+        from openram import sram_config
+        c = sram_config(word_size=8,
+                        num_words=32,
+                        write_size=2,
+                        num_banks=1,
+                        num_spare_cols=1,
+                        num_spare_rows=0)
+        c.words_per_row = 2
+        c.recompute_sizes()
+        debug.info(1,
+                   "Behavioral functional test for sram with {} bit words, {} words, {} words per row, {} bit writes, {} banks".format(
+                       c.word_size,
+                       c.num_words,
+                       c.words_per_row,
+                       c.write_size,
+                       c.num_banks))
+        s = factory.create(module_type="sram", sram_config=c)
+        f = functional(s.s, cycles=500)
+        (fail, error) = f.run_behavioral()
+        self.assertTrue(fail, error)
+
+        # A wrong expected value must be found
+        (word, dout_port, eo_period, cycle) = f.read_check[-1]
+        f.read_check[-1][0] = word[:-1] + str(1 - int(word[-1]))
+        (fail, error) = f.run_behavioral()
+        self.assertFalse(fail, error)
+
+        openram.end_openram()
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
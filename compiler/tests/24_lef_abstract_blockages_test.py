@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from testutils import *
+
+import openram
+from openram import debug
+from openram import OPTS
+
+
+class lef_abstract_blockages_test(openram_test):
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        from openram.base import lef
+
+        debug.info(2, "Testing the blockage minus the inflated pins")
+        l = lef(["m1"])
+        block = [0, 0, 100, 100]
+        # Pins on the edges, one that only touches the block and two that overlap
+        cuts = [[-5, 40, 10, 60], [90, 40, 110, 60], [40, 100, 60, 110], [20, 20, 35, 30], [30, 25, 45, 35]]
+        rects = l.subtract_rects(block, cuts)
+
+        # Each cell of the grid is covered once unless it is in a cut
+        for x in range(100):
+            for y in range(100):
+                covered = sum(x1 <= x < x2 and y1 <= y < y2 for (x1, y1, x2, y2) in rects)
+                cut = any(x1 <= x < x2 and y1 <= y < y2 for (x1, y1, x2, y2) in cuts)
+                self.assertEqual(covered, 0 if cut else 1)
+
+        # Free intervals that are the same in consecutive slabs are merged
+        self.assertEqual(len(rects), 8)
+
+        openram.end_openram()
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# See LICENSE for licensing information.
+#
+# Copyright (c) 2016-2024 Regents of the University of California and The Board
+# of Regents for the Oklahoma Agricultural and Mechanical College
+# (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+#
+import sys, os
+import unittest
+from testutils import *
+
+import openram
+from openram import debug
+from openram.sram_factory import factory
+from openram import OPTS
+
+
+class lef_blockages_test(openram_test):
+
+    def runTest(self):
+        config_file = "{}/tests/configs/config".format(os.getenv("OPENRAM_HOME"))
+        openram.init_openram(config_file, is_unit_test=True)
+        from openram.base import vector
+        from openram.tech import layer as tech_layer
+
+        debug.info(2, "Testing detailed LEF blockages of a 4x4 array")
+        a = factory.create(module_type="bitcell_array", cols=4, rows=4)
+
+        # Every placement of the cell must have the transformed cell blockages
+        expected = []
+        for inst in a.insts:
+            expected.extend(inst.get_blockages(tech_layer["m1"]))
+        blockages = a.get_blockages("m1", True)
+        self.assertEqual(self.normalize(blockages), self.normalize(expected))
+        self.assertEqual(len(blockages), len(a.insts) * len(a.cell.gds.getBlockages(tech_layer["m1"])))
+
+        # The cached blockages are used until an instance moves
+        self.assertIs(a.get_blockage_arrays(tech_layer["m1"], True), a.get_blockage_arrays(tech_layer["m1"], True))
+        inst = a.insts[0]
+        inst.place(inst.offset + vector(1, 0), inst.mirror, inst.rotate)
+        moved = a.get_blockages("m1", True)
+        self.assertNotEqual(self.normalize(moved), self.normalize(blockages))
+
+        # The cached blockages are also recomputed when a shape moves
+        inv = factory.create(module_type="pinv")
+        cached = inv.get_blockage_arrays(tech_layer["m1"], True)
+        self.assertIs(inv.get_blockage_arrays(tech_layer["m1"], True), cached)
+        rect = inv.objs[0]
+        rect.offset = vector(rect.offset + vector(1, 0))
+        self.assertIsNot(inv.get_blockage_arrays(tech_layer["m1"], True), cached)
+
+        openram.end_openram()
+
+    def normalize(self, blockages):
+        """ Return the blockages as sorted tuples of rounded coordinates. """
+        return sorted(tuple(round(x, 4) for point in b for x in point) for b in blockages)
+
+
+# run the test from the command line
+if __name__ == "__main__":
+    (OPTS, args) = openram.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main(testRunner=debugTestRunner())